@@ -1,17 +1,44 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from config import Config
+from config import Config, config
 
 # Initialize extensions
 db = SQLAlchemy()
 
 def create_app(config_class=Config):
+    if isinstance(config_class, str):
+        config_class = config[config_class]
     app = Flask(__name__)
     app.config.from_object(config_class)
     
     # Initialize extensions with app
     db.init_app(app)
     
+    from app.utils.cache import cache
+    cache.init_app(app)
+    
+    from app.utils.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    from app.utils.image_handler import image_processor, rendition_cache
+    image_processor.init_app(app)
+    rendition_cache.init_app(app)
+    
+    from app.services.outbox_service import outbox_dispatcher
+    outbox_dispatcher.init_app(app)
+    
+    from app.utils.streams import notification_hub
+    notification_hub.init_app(app)
+    
+    from app.services.email_service import mail_queue
+    mail_queue.init_app(app)
+    
+    from app.services.answer_service import vote_buffer
+    vote_buffer.init_app(app)
+    
+    from app.services.tag_service import tag_suggestions
+    tag_suggestions.init_app(app)
+    
     # Register middleware
     from app.middleware import register_middleware
     register_middleware(app)
@@ -20,8 +47,16 @@ def create_app(config_class=Config):
     from app.routes import register_blueprints
     register_blueprints(app)
     
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Create all tables if they don't exist
     with app.app_context():
         db.create_all()
+        
+        # Full-text search index (SQLite FTS5) and its sync triggers
+        from app.services.search_service import init_search_index
+        init_search_index(app)
     
     return app
\ No newline at end of file
@@ -0,0 +1,111 @@
+import click
+
+def register_commands(app):
+    """
+    Register maintenance CLI commands with the Flask application
+    """
+    @app.cli.command('reconcile-votes')
+    def reconcile_votes():
+        """Recompute answer vote counters from the votes table"""
+        from app.services.answer_service import reconcile_vote_counts
+        
+        updated = reconcile_vote_counts()
+        click.echo(f"Reconciled vote counters for {updated} answer(s)")
+    
+    @app.cli.command('reconcile-question-stats')
+    def reconcile_question_stats():
+        """Recompute questions' answer counts and scores from their answers"""
+        from app.services.question_service import reconcile_question_stats as reconcile
+        
+        updated = reconcile()
+        click.echo(f"Reconciled answer counts and scores for {updated} question(s)")
+    
+    @app.cli.command('reconcile-tag-counts')
+    def reconcile_tag_counts():
+        """Recompute tags' question counts from question_tags"""
+        from app.services.tag_service import reconcile_tag_counts as reconcile
+        
+        updated = reconcile()
+        click.echo(f"Reconciled question counts for {updated} tag(s)")
+    
+    @app.cli.command('reconcile-notification-counts')
+    def reconcile_notification_counts():
+        """Recompute users' unread notification counters"""
+        from app.services.notification_service import reconcile_unread_counts
+        
+        updated = reconcile_unread_counts()
+        click.echo(f"Reconciled unread notification counters for {updated} user(s)")
+    
+    @app.cli.command('archive-notifications')
+    @click.option('--days', type=int, default=None, help='Archive read notifications older than this many days')
+    def archive_old_notifications(days):
+        """Move old read notifications into the archive table"""
+        from app.services.notification_service import archive_notifications
+        
+        archived = archive_notifications(older_than_days=days)
+        click.echo(f"Archived {archived} notification(s)")
+    
+    @app.cli.command('deliver-mail')
+    def deliver_mail():
+        """Deliver all queued emails that are due"""
+        from app.services.email_service import deliver_pending, mail_queue
+        
+        if mail_queue.pool is None:
+            click.echo("MAIL_SERVER is not configured")
+            return
+        
+        total = 0
+        while True:
+            attempted = deliver_pending(mail_queue.pool)
+            if not attempted:
+                break
+            total += attempted
+        click.echo(f"Attempted delivery of {total} email(s)")
+    
+    @app.cli.command('send-digests')
+    def send_digests():
+        """Queue notification digest emails for users with unread notifications"""
+        from app.services.email_service import send_notification_digests
+        
+        if not app.config.get('MAIL_SERVER'):
+            click.echo("MAIL_SERVER is not configured")
+            return
+        
+        stats = send_notification_digests()
+        click.echo(
+            f"Queued {stats['emails']} digest(s) for {stats['users']} user(s) "
+            f"in {stats['seconds']}s ({stats['users_per_second']} users/s)"
+        )
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search():
+        """Rebuild the question full-text search index"""
+        from app.services.search_service import rebuild_search_index, search_enabled
+        
+        if not search_enabled():
+            click.echo("Full-text search is not available on this database")
+            return
+        
+        rebuild_search_index()
+        click.echo("Rebuilt question search index")
+    
+    @app.cli.command('dispatch-outbox')
+    def dispatch_outbox():
+        """Process all pending outbox events"""
+        from app.services.outbox_service import dispatch_pending
+        
+        total = 0
+        while True:
+            processed = dispatch_pending()
+            if not processed:
+                break
+            total += processed
+        click.echo(f"Dispatched {total} outbox event(s)")
+    
+    @app.cli.command('rebuild-question-text')
+    def rebuild_text():
+        """Recompute questions' sanitized descriptions, plain text and excerpts"""
+        from app.services.question_service import rebuild_question_text
+        
+        updated = rebuild_question_text()
+        click.echo(f"Rebuilt text for {updated} question(s)")
@@ -1,31 +1,77 @@
-from flask import request, g, jsonify, abort
+from flask import request, g, jsonify
 import jwt
+from app import db
 from app.models import User
+from app.services.auth_service import UserCache, get_user_principal
+# Kept importable from here for routes that use it
+from app.utils.decorators import login_required
 from flask import current_app
-from functools import wraps
+
+class CurrentUser:
+    """
+    The authenticated user for the current request
+    
+    Carries the cached id, role and banned flag, which is all most routes
+    need. Any other attribute loads the full User row on first access and
+    is read from (or written to) it.
+    """
+    __slots__ = ('id', 'role', 'banned', '_user')
+    
+    def __init__(self, principal):
+        object.__setattr__(self, 'id', principal.id)
+        object.__setattr__(self, 'role', principal.role)
+        object.__setattr__(self, 'banned', principal.banned)
+        object.__setattr__(self, '_user', None)
+    
+    def is_admin(self):
+        return self.role == 'admin'
+    
+    def _load(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return self._user
+    
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
 
 def register_auth_middleware(app):
     """
     Register authentication middleware to extract user from JWT
+    
+    This is the only place a token is decoded. The outcome is left on g:
+    g.user for an authenticated user, otherwise g.auth_error explaining
+    why, which login_required reports.
     """
+    app.extensions['user_cache'] = UserCache(app.config.get('AUTH_USER_CACHE_TTL', 30))
+    
     @app.before_request
     def authenticate_request():
+        g.user = None
+        g.auth_error = "Authorization required"
+        
         # Skip auth for OPTIONS requests (CORS preflight)
         if request.method == 'OPTIONS':
             return None
-            
+        
         # Skip auth for public endpoints
         public_endpoints = [
-            'auth.register', 
+            'auth.register',
             'auth.login',
             'questions.list_questions',
             'questions.get_question',
+            'images.get_image',
+            'images.get_rendition',
+            'tags.list_tags',
+            'tags.suggest_tags',
             'static'
         ]
         
         if request.endpoint in public_endpoints:
             return None
-            
+        
         # Get token from Authorization header
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
@@ -40,32 +86,22 @@ def register_auth_middleware(app):
                 current_app.config['SECRET_KEY'],
                 algorithms=['HS256']
             )
-            
-            # Get user from database
-            user = User.query.get(payload['user_id'])
-            
-            if not user:
-                return None
-                
-            if user.banned:
-                return jsonify({"error": "Your account has been banned"}), 403
-            
-            # Set current user in Flask's g object
-            g.user = user
-            
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
-            # Continue without authenticated user
+        except jwt.ExpiredSignatureError:
+            g.auth_error = "Token expired"
             return None
-
-# Add the missing login_required decorator function
-def login_required(f):
-    """
-    Decorator to require authentication for a route.
-    Must be used after the authenticate_request middleware runs.
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not g.get('user'):
-            return jsonify({"error": "Authentication required"}), 401
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+        except jwt.InvalidTokenError:
+            g.auth_error = "Invalid token"
+            return None
+        
+        # Get user through the per-process principal cache
+        principal = get_user_principal(payload['user_id'])
+        
+        if not principal:
+            g.auth_error = "User not found"
+            return None
+        
+        if principal.banned:
+            return jsonify({"error": "Your account has been banned"}), 403
+        
+        # Set current user in Flask's g object
+        g.user = CurrentUser(principal)
\ No newline at end of file
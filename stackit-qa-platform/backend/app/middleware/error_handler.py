@@ -39,6 +39,13 @@ def register_error_handlers(app):
             "message": str(error.description) if hasattr(error, 'description') else "The method is not allowed for the requested URL"
         }), 405
     
+    @app.errorhandler(413)
+    def request_entity_too_large(error):
+        return jsonify({
+            "error": "Request Entity Too Large",
+            "message": str(error.description) if hasattr(error, 'description') else "The request is too large"
+        }), 413
+    
     @app.errorhandler(429)
     def too_many_requests(error):
         return jsonify({
@@ -46,6 +53,13 @@ def register_error_handlers(app):
             "message": str(error.description) if hasattr(error, 'description') else "Rate limit exceeded"
         }), 429
     
+    @app.errorhandler(503)
+    def service_unavailable(error):
+        return jsonify({
+            "error": "Service Unavailable",
+            "message": str(error.description) if hasattr(error, 'description') else "The service is temporarily unavailable"
+        }), 503
+    
     @app.errorhandler(500)
     def server_error(error):
         return jsonify({
@@ -5,4 +5,6 @@ from .answer import Answer
 from .tag import Tag, question_tags
 from .vote import Vote
 from .comment import Comment
-from .notification import Notification
\ No newline at end of file
+from .notification import Notification, ArchivedNotification
+from .outbox import OutboxEvent
+from .email import EmailMessage
\ No newline at end of file
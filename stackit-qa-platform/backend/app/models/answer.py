@@ -9,31 +9,40 @@ class Answer(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     accepted = db.Column(db.Boolean, default=False)
+    # Denormalized vote counters, kept in step with the votes table
+    upvotes = db.Column(db.Integer, default=0, nullable=False)
+    downvotes = db.Column(db.Integer, default=0, nullable=False)
+    score = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_answers_question_created', 'question_id', 'created_at'),
+        db.Index('idx_answers_user_created', 'user_id', 'created_at'),
+    )
+    
     # Relationships
     votes = db.relationship('Vote', backref='answer', lazy=True, cascade="all, delete-orphan")
     comments = db.relationship('Comment', backref='answer', lazy=True, cascade="all, delete-orphan")
     
-    def to_dict(self, include_votes=True, include_comments=False):
-        data = {
-            'id': self.id,
-            'question_id': self.question_id,
-            'user_id': self.user_id,
-            'author': self.author.username,
-            'content': self.content,
-            'accepted': self.accepted,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    def to_dict(self, include_votes=True, include_comments=False, fields=None):
+        """
+        Serialize the answer
         
-        if include_votes:
-            upvotes = sum(1 for vote in self.votes if vote.vote_type == 'up')
-            downvotes = sum(1 for vote in self.votes if vote.vote_type == 'down')
-            data['score'] = upvotes - downvotes
-            data['upvotes'] = upvotes
-            data['downvotes'] = downvotes
+        fields narrows the result to those keys (see app.utils.loaders
+        FIELDSETS); attributes behind other keys are never touched.
+        """
+        if fields is None:
+            fields = ['id', 'question_id', 'user_id', 'author', 'content', 'accepted', 'created_at', 'updated_at']
+            if include_votes:
+                fields.extend(['score', 'upvotes', 'downvotes'])
+        
+        serializers = {
+            'author': lambda: self.author.username,
+            'created_at': lambda: self.created_at.isoformat(),
+            'updated_at': lambda: self.updated_at.isoformat()
+        }
+        data = {field: serializers[field]() if field in serializers else getattr(self, field) for field in fields}
             
         if include_comments:
             data['comments'] = [comment.to_dict() for comment in self.comments]
@@ -10,6 +10,16 @@ class Notification(db.Model):
     source_id = db.Column(db.Integer, nullable=False)  # ID of answer/comment that triggered notification
     read = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Unread notifications sharing a group key (e.g. answers to one question)
+    # are coalesced into one row: count of events and time of the latest
+    group_key = db.Column(db.String(100), nullable=True)
+    count = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_notifications_user_created', 'user_id', 'created_at'),
+        db.Index('idx_notifications_user_group', 'user_id', 'group_key'),
+    )
     
     def to_dict(self):
         return {
@@ -18,5 +28,26 @@ class Notification(db.Model):
             'type': self.type,
             'source_id': self.source_id,
             'read': self.read,
-            'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+            'count': self.count,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ArchivedNotification(db.Model):
+    # Read notifications moved out of the hot table by archive_notifications()
+    __tablename__ = 'notifications_archive'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    type = db.Column(db.Enum('answer', 'comment', 'mention', name='notification_types'), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    read = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime)
+    group_key = db.Column(db.String(100), nullable=True)
+    count = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_notifications_archive_user_created', 'user_id', 'created_at'),
+    )
\ No newline at end of file
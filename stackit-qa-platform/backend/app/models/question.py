@@ -7,30 +7,69 @@ class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(255), nullable=False)
+    # Sanitized HTML, with its plain text and listing excerpt derived on write
     description = db.Column(db.Text, nullable=False)
+    body_text = db.Column(db.Text)
+    excerpt = db.Column(db.String(255))
+    # The accepted answer, if any. Being a single column it holds at most
+    # one per question; answers.accepted mirrors it.
+    accepted_answer_id = db.Column(
+        db.Integer,
+        db.ForeignKey('answers.id', ondelete='SET NULL', use_alter=True, name='fk_questions_accepted_answer'),
+        nullable=True
+    )
+    # Denormalized from the answers: how many there are and the sum of
+    # their vote scores (questions themselves aren't voted on)
+    answer_count = db.Column(db.Integer, default=0, nullable=False)
+    score = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Asked, answered or had an answer accepted
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Newest-first listings and keyset pagination on (created_at, id)
+        db.Index('idx_questions_created_at', 'created_at'),
+        db.Index('idx_questions_user_created', 'user_id', 'created_at'),
+        # An answer is accepted for at most one question
+        db.Index('idx_questions_accepted_answer', 'accepted_answer_id', unique=True),
+        # Keyset pagination for the other listing orders, see QUESTION_SORTS
+        db.Index('idx_questions_last_activity', 'last_activity_at'),
+        db.Index('idx_questions_score', 'score'),
+        db.Index('idx_questions_unanswered', 'answer_count', 'created_at'),
+    )
     
     # Relationships
-    answers = db.relationship('Answer', backref='question', lazy=True, cascade="all, delete-orphan")
+    answers = db.relationship('Answer', backref='question', lazy=True, cascade="all, delete-orphan",
+                              foreign_keys='Answer.question_id')
     tags = db.relationship('Tag', secondary='question_tags', backref=db.backref('questions', lazy=True))
     
-    def to_dict(self, include_answers=False, include_tags=True):
-        data = {
-            'id': self.id,
-            'user_id': self.user_id,
-            'author': self.author.username,
-            'title': self.title,
-            'description': self.description,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    def to_dict(self, include_answers=False, include_tags=True, include_description=True, fields=None):
+        """
+        Serialize the question
         
-        if include_tags:
-            data['tags'] = [tag.name for tag in self.tags]
+        fields narrows the result to those keys (see app.utils.loaders
+        FIELDSETS); attributes behind other keys are never touched, so
+        columns that were not loaded stay unloaded.
+        """
+        if fields is None:
+            fields = ['id', 'user_id', 'author', 'title', 'excerpt', 'accepted_answer_id', 'answer_count', 'score',
+                      'created_at', 'updated_at', 'last_activity_at']
+            if include_description:
+                fields.append('description')
+            if include_tags:
+                fields.append('tags')
+        
+        serializers = {
+            'author': lambda: self.author.username,
+            'tags': lambda: [tag.name for tag in self.tags],
+            'created_at': lambda: self.created_at.isoformat(),
+            'updated_at': lambda: self.updated_at.isoformat(),
+            'last_activity_at': lambda: self.last_activity_at.isoformat()
+        }
+        data = {field: serializers[field]() if field in serializers else getattr(self, field) for field in fields}
             
         if include_answers:
             data['answers'] = [answer.to_dict() for answer in self.answers]
-            data['answer_count'] = len(self.answers)
             
         return data
\ No newline at end of file
@@ -11,10 +11,17 @@ class Tag(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
+    # Maintained as questions are tagged and deleted, see tag_service
+    question_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        # Popular tags and the tag directory, most used first
+        db.Index('idx_tags_question_count', 'question_count'),
+    )
     
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
-            'question_count': len(self.questions)
+            'question_count': self.question_count
         }
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.utils.passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,6 +12,10 @@ class User(db.Model):
     role = db.Column(db.Enum('user', 'admin', name='user_roles'), default='user', nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     banned = db.Column(db.Boolean, default=False)
+    # Maintained alongside notification writes; see notification_service
+    unread_notification_count = db.Column(db.Integer, default=0, nullable=False)
+    # Notifications updated since then go into the next digest email
+    last_digest_at = db.Column(db.DateTime, nullable=True)
     
     # Relationships
     questions = db.relationship('Question', backref='author', lazy=True, cascade="all, delete-orphan")
@@ -21,22 +25,26 @@ class User(db.Model):
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade="all, delete-orphan")
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def is_admin(self):
         return self.role == 'admin'
     
-    def to_dict(self, include_email=False):
-        data = {
-            'id': self.id,
-            'username': self.username,
-            'role': self.role,
-            'created_at': self.created_at.isoformat(),
-            'banned': self.banned
-        }
-        if include_email:
-            data['email'] = self.email
+    def to_dict(self, include_email=False, fields=None):
+        """
+        Serialize the user
+        
+        fields narrows the result to those keys (see app.utils.loaders
+        FIELDSETS); attributes behind other keys are never touched.
+        """
+        if fields is None:
+            fields = ['id', 'username', 'role', 'created_at', 'banned']
+            if include_email:
+                fields.append('email')
+        
+        data = {field: self.created_at.isoformat() if field == 'created_at' else getattr(self, field)
+                for field in fields}
         return data
\ No newline at end of file
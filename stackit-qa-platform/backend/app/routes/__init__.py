@@ -5,6 +5,8 @@ from .answers import answers_bp
 from .users import users_bp
 from .notifications import notifications_bp
 from .admin import admin_bp
+from .images import images_bp
+from .tags import tags_bp
 
 # Add a root route for easier testing and documentation
 def register_root_route(app):
@@ -25,6 +27,8 @@ def register_blueprints(app):
     app.register_blueprint(users_bp)
     app.register_blueprint(notifications_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(images_bp)
+    app.register_blueprint(tags_bp)
 
 
 
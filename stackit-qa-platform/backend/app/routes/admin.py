@@ -1,19 +1,30 @@
 from flask import Blueprint, request, jsonify, g, abort
 from app import db
-from app.models import User, Question, Answer, Tag
+from app.models import User, Question, Answer, Tag, EmailMessage
 from app.utils.decorators import admin_required
+from app.utils.loaders import load_view, load_fields, get_fields_arg
+from app.utils.cache import cache, invalidate_question
+from app.services.auth_service import invalidate_user_principal
+from app.utils.passwords import password_hasher
+from app.utils.streams import notification_hub
+from app.utils.image_handler import image_processor, rendition_cache
+from app.services.email_service import get_mail_queue_stats
+from app.services.answer_service import vote_buffer, remove_answer
+from app.services.question_service import QuestionService
+from app.services.tag_service import get_popular_tags, tag_suggestions
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_users():
-    """Get all users (admin only)"""
+    """Get all users, optionally only some ?fields= (admin only)"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     search = request.args.get('search', '')
+    fields = get_fields_arg('user_list')
     
-    query = User.query
+    query = load_fields(User.query, 'user_list', fields)
     
     if search:
         query = query.filter(User.username.ilike(f'%{search}%') | User.email.ilike(f'%{search}%'))
@@ -21,7 +32,7 @@ def get_users():
     users_page = query.order_by(User.created_at.desc()).paginate(page=page, per_page=per_page)
     
     return jsonify({
-        "users": [u.to_dict(include_email=True) for u in users_page.items],
+        "users": [u.to_dict(include_email=True, fields=fields) for u in users_page.items],
         "total": users_page.total,
         "page": page,
         "pages": users_page.pages,
@@ -49,6 +60,9 @@ def ban_user(user_id):
     
     try:
         db.session.commit()
+        
+        # Applies to the user's very next request
+        invalidate_user_principal(user.id)
         action = "banned" if ban_status else "unbanned"
         return jsonify({"message": f"User {action} successfully", "user": user.to_dict()})
     except Exception as e:
@@ -68,20 +82,10 @@ def get_platform_stats():
     recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
     
     # Get recently asked questions
-    recent_questions = Question.query.order_by(Question.created_at.desc()).limit(5).all()
+    recent_questions = load_view(Question.query, 'question_list').order_by(Question.created_at.desc()).limit(5).all()
     
     # Get tags with most questions
-    popular_tags_query = db.session.query(
-        Tag, db.func.count(question_tags.c.question_id).label('question_count')
-    ).join(
-        question_tags, Tag.id == question_tags.c.tag_id
-    ).group_by(
-        Tag.id
-    ).order_by(
-        db.desc('question_count')
-    ).limit(10)
-    
-    popular_tags = [{"name": tag.name, "count": count} for tag, count in popular_tags_query]
+    popular_tags = [{"name": tag.name, "count": tag.question_count} for tag in get_popular_tags(10)]
     
     return jsonify({
         "stats": {
@@ -92,10 +96,59 @@ def get_platform_stats():
             "answer_ratio": round(total_answers / total_questions, 2) if total_questions > 0 else 0
         },
         "recent_users": [u.to_dict() for u in recent_users],
-        "recent_questions": [q.to_dict() for q in recent_questions],
+        "recent_questions": [q.to_dict(include_description=False) for q in recent_questions],
         "popular_tags": popular_tags
     })
 
+@admin_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get response cache counters for this worker (admin only)"""
+    return jsonify(cache.stats())
+
+@admin_bp.route('/password-hashing', methods=['GET'])
+@admin_required
+def get_password_hashing_stats():
+    """Get password hashing timings for this worker (admin only)"""
+    return jsonify(password_hasher.stats())
+
+@admin_bp.route('/image-processing', methods=['GET'])
+@admin_required
+def get_image_processing_stats():
+    """Get image processing counters for this worker (admin only)"""
+    return jsonify(dict(image_processor.stats(), renditions=rendition_cache.stats()))
+
+@admin_bp.route('/notification-streams', methods=['GET'])
+@admin_required
+def get_notification_stream_stats():
+    """Get live notification stream counters for this worker (admin only)"""
+    return jsonify(notification_hub.stats())
+
+@admin_bp.route('/vote-buffer', methods=['GET'])
+@admin_required
+def get_vote_buffer_stats():
+    """Get vote counter buffer statistics for this worker (admin only)"""
+    return jsonify(vote_buffer.stats())
+
+@admin_bp.route('/tag-suggestions', methods=['GET'])
+@admin_required
+def get_tag_suggestion_stats():
+    """Get tag autocomplete index statistics for this worker (admin only)"""
+    return jsonify(tag_suggestions.stats())
+
+@admin_bp.route('/mail-queue', methods=['GET'])
+@admin_required
+def get_mail_queue():
+    """Get email queue counts and SMTP session counters (admin only)"""
+    return jsonify(get_mail_queue_stats())
+
+@admin_bp.route('/emails/<int:message_id>', methods=['GET'])
+@admin_required
+def get_email_message(message_id):
+    """Get the delivery status of a queued email (admin only)"""
+    message = EmailMessage.query.get_or_404(message_id)
+    return jsonify(message.to_dict())
+
 @admin_bp.route('/questions/<int:question_id>', methods=['DELETE'])
 @admin_required
 def delete_question(question_id):
@@ -103,8 +156,8 @@ def delete_question(question_id):
     question = Question.query.get_or_404(question_id)
     
     try:
-        db.session.delete(question)
-        db.session.commit()
+        tag_names = QuestionService.delete_question(question)
+        invalidate_question(question_id, tag_names=tag_names)
         return '', 204
     except Exception as e:
         db.session.rollback()
@@ -115,10 +168,11 @@ def delete_question(question_id):
 def delete_answer(answer_id):
     """Delete an answer (admin only)"""
     answer = Answer.query.get_or_404(answer_id)
+    question_id = answer.question_id
     
     try:
-        db.session.delete(answer)
-        db.session.commit()
+        tag_names = remove_answer(answer)
+        invalidate_question(question_id, tag_names=tag_names)
         return '', 204
     except Exception as e:
         db.session.rollback()
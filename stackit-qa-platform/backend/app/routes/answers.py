@@ -3,8 +3,10 @@ from app import db
 from app.models import Answer, Question, Notification
 from app.utils.validators import validate_answer
 from app.utils.decorators import login_required
-from app.services.notification_service import create_notification
+from app.services.answer_service import create_answer, vote_on_answer, mark_accepted, remove_answer
+from app.services.tag_service import question_tag_names
 from app.utils.helpers import sanitize_html
+from app.utils.cache import invalidate_question
 
 answers_bp = Blueprint('answers', __name__, url_prefix='/api/answers')
 
@@ -19,29 +21,12 @@ def post_answer():
     if errors:
         return jsonify({"errors": errors}), 400
     
-    question_id = data.get('question_id')
-    question = Question.query.get_or_404(question_id)
-    
-    # Sanitize HTML content
-    content = sanitize_html(data['content'])
+    question = Question.query.get_or_404(data.get('question_id'))
     
     try:
-        # Create new answer
-        answer = Answer(
-            question_id=question_id,
-            user_id=g.user.id,
-            content=content
-        )
-        db.session.add(answer)
-        db.session.commit()
-        
-        # Create notification for question author
-        if question.user_id != g.user.id:
-            create_notification(
-                user_id=question.user_id,
-                notification_type='answer',
-                source_id=answer.id
-            )
+        # Create the answer and notify the question author and any
+        # @mentioned users in one batch
+        answer = create_answer(g.user.id, question.id, data['content'])
         
         return jsonify(answer.to_dict()), 201
     except Exception as e:
@@ -69,6 +54,7 @@ def update_answer(answer_id):
     try:
         answer.content = content
         db.session.commit()
+        invalidate_question(answer.question_id)
         return jsonify(answer.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -84,9 +70,11 @@ def delete_answer(answer_id):
     if answer.user_id != g.user.id and not g.user.is_admin():
         abort(403, description="Permission denied")
     
+    question_id = answer.question_id
+    
     try:
-        db.session.delete(answer)
-        db.session.commit()
+        tag_names = remove_answer(answer)
+        invalidate_question(question_id, tag_names=tag_names)
         return '', 204
     except Exception as e:
         db.session.rollback()
@@ -96,37 +84,26 @@ def delete_answer(answer_id):
 @login_required
 def accept_answer(answer_id):
     """Mark an answer as accepted"""
-    answer = Answer.query.get_or_404(answer_id)
-    question = Question.query.get_or_404(answer.question_id)
-    
-    # Only the question author can accept an answer
-    if question.user_id != g.user.id:
-        abort(403, description="Only the question author can accept an answer")
-    
     try:
-        # Reset any previously accepted answer for this question
-        previously_accepted = Answer.query.filter_by(
-            question_id=question.id, accepted=True
-        ).first()
-        
-        if previously_accepted:
-            previously_accepted.accepted = False
-        
-        # Mark this answer as accepted
-        answer.accepted = True
-        db.session.commit()
-        
-        return jsonify(answer.to_dict())
+        # Only matches if the current user asked the question
+        question_id = mark_accepted(g.user.id, answer_id)
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+    
+    if question_id is None:
+        Answer.query.get_or_404(answer_id)
+        # Only the question author can accept an answer
+        abort(403, description="Only the question author can accept an answer")
+    
+    # Listings show which questions are solved
+    invalidate_question(question_id, tag_names=question_tag_names(question_id))
+    return jsonify({'id': answer_id, 'question_id': question_id, 'accepted': True})
 
 @answers_bp.route('/<int:answer_id>/vote', methods=['POST'])
 @login_required
 def vote_answer(answer_id):
     """Vote on an answer (upvote or downvote)"""
-    from app.models import Vote
-    
     answer = Answer.query.get_or_404(answer_id)
     data = request.get_json()
     
@@ -136,32 +113,12 @@ def vote_answer(answer_id):
     vote_type = data['vote_type']
     
     try:
-        # Check if user already voted on this answer
-        existing_vote = Vote.query.filter_by(
-            answer_id=answer_id,
-            user_id=g.user.id
-        ).first()
-        
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                # If voting the same way, remove the vote
-                db.session.delete(existing_vote)
-            else:
-                # If voting differently, update the vote
-                existing_vote.vote_type = vote_type
-        else:
-            # Create new vote
-            vote = Vote(
-                answer_id=answer_id,
-                user_id=g.user.id,
-                vote_type=vote_type
-            )
-            db.session.add(vote)
+        # Records the vote and adjusts the answer's counters in one transaction
+        counts = vote_on_answer(g.user.id, answer.id, vote_type)
+        invalidate_question(answer.question_id)
         
-        db.session.commit()
-        
-        # Return updated answer with vote counts
-        return jsonify(answer.to_dict())
+        # Return the new vote counts and the user's current vote
+        return jsonify({'id': answer.id, **counts})
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
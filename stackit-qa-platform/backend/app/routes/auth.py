@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 import jwt
 from datetime import datetime, timedelta
 from app import db
@@ -41,6 +42,10 @@ def register():
             "user": user.to_dict(),
             "token": token
         }), 201
+    except HTTPException:
+        # e.g. 429 from an overloaded password hasher
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,53 @@
+import re
+from flask import Blueprint, current_app, send_file, abort
+from app.utils.image_handler import find_blob, rendition_cache, RENDITIONS, RENDITION_FORMATS
+
+images_bp = Blueprint('images', __name__, url_prefix='/api/images')
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Content-addressed URLs never change meaning, so they can be cached forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def send_image(path, mimetype, etag):
+    """
+    Send an image file with a strong ETag and immutable caching
+    
+    send_file answers conditional and Range requests, and hands the file
+    to the server's sendfile support (wsgi.file_wrapper, or X-Sendfile
+    when USE_X_SENDFILE is set).
+    """
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def find_original(digest):
+    if not DIGEST_PATTERN.match(digest):
+        abort(404, description="Image not found")
+    
+    path, image_format = find_blob(current_app.config['UPLOAD_FOLDER'], digest)
+    if path is None:
+        abort(404, description="Image not found")
+    return path, image_format
+
+@images_bp.route('/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve a stored image"""
+    path, image_format = find_original(digest)
+    return send_image(path, RENDITION_FORMATS[image_format][1], digest)
+
+@images_bp.route('/<digest>/<rendition>', methods=['GET'])
+def get_rendition(digest, rendition):
+    """Serve a rendition (thumb, medium or webp) of a stored image, generating it on first request"""
+    if rendition not in RENDITIONS:
+        abort(404, description="Unknown rendition")
+    
+    path, image_format = find_original(digest)
+    rendition_path, mimetype = rendition_cache.get(path, image_format, digest, rendition)
+    try:
+        return send_image(rendition_path, mimetype, f"{digest}-{rendition}")
+    except FileNotFoundError:
+        # Evicted by a sweep (possibly in another worker) since the lookup
+        rendition_path, mimetype = rendition_cache.get(path, image_format, digest, rendition)
+        return send_image(rendition_path, mimetype, f"{digest}-{rendition}")
@@ -1,35 +1,34 @@
-from flask import Blueprint, jsonify, g, Response, request, abort
+from flask import Blueprint, jsonify, g, Response, request, abort, current_app
 import json
-import queue
-import threading
-import time
 from app import db
 from app.models import Notification
 from app.utils.decorators import login_required
-from app.services.notification_service import get_user_notifications, mark_notification_as_read
+from app.utils.pagination import get_pagination_args
+from app.utils.streams import notification_hub
+from app.services.notification_service import get_user_notifications, describe_sources, get_unread_count, get_notifications_since, mark_notification_as_read, mark_all_notifications_as_read
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
-# In-memory event sources for SSE
-event_sources = {}
-
 @notifications_bp.route('', methods=['GET'])
 @login_required
 def get_notifications():
-    """Get all notifications for the current user"""
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 10))
+    """
+    Get all notifications for the current user
+    
+    With ?expand=source each notification also describes its source answer
+    or comment, question and actor, so a page renders without follow-up
+    requests.
+    """
     unread_only = request.args.get('unread', 'false').lower() == 'true'
+    expand_source = request.args.get('expand') == 'source'
     
-    notifications, total = get_user_notifications(g.user.id, page, per_page, unread_only)
+    result = get_user_notifications(g.user.id, unread_only=unread_only, **get_pagination_args())
+    result['notifications'] = [n.to_dict() for n in result.pop('items')]
     
-    return jsonify({
-        'notifications': [n.to_dict() for n in notifications],
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page
-    })
+    if expand_source:
+        describe_sources(result['notifications'])
+    
+    return jsonify(result)
 
 @notifications_bp.route('/<int:notification_id>/read', methods=['PUT'])
 @login_required
@@ -45,13 +44,18 @@ def mark_read(notification_id):
     
     return jsonify({"message": "Notification marked as read"})
 
+@notifications_bp.route('/unread-count', methods=['GET'])
+@login_required
+def get_unread_notification_count():
+    """Get the number of unread notifications for the current user"""
+    return jsonify({"unread_count": get_unread_count(g.user.id) or 0})
+
 @notifications_bp.route('/read-all', methods=['PUT'])
 @login_required
 def mark_all_read():
     """Mark all user notifications as read"""
     try:
-        Notification.query.filter_by(user_id=g.user.id, read=False).update({"read": True})
-        db.session.commit()
+        mark_all_notifications_as_read(g.user.id)
         return jsonify({"message": "All notifications marked as read"})
     except Exception as e:
         db.session.rollback()
@@ -60,31 +64,73 @@ def mark_all_read():
 @notifications_bp.route('/stream')
 @login_required
 def notification_stream():
-    """SSE endpoint for real-time notifications"""
+    """
+    SSE endpoint for real-time notifications
+    
+    Each notification is sent with its id as the event id. A client that
+    reconnects with Last-Event-ID (or ?last_event_id=) is first sent what
+    it missed; when that can't be replayed, or a slow connection had to
+    drop messages, it gets a 'resync' event and should refetch the list.
+    """
+    # Subscribe before replaying, so nothing published meanwhile is lost
+    subscription = notification_hub.subscribe(g.user.id)
+    heartbeat = current_app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 30)
+    
+    replay = []
+    resync = False
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id:
+        missed = None
+        if last_event_id.isdigit():
+            missed = get_notifications_since(
+                g.user.id, int(last_event_id), current_app.config.get('NOTIFICATION_REPLAY_LIMIT', 100)
+            )
+        if missed is None:
+            resync = True
+        else:
+            replay = [n.to_dict() for n in missed]
+    
+    # The generator runs after the request context is gone
     def generate():
-        # Create a queue for this user if it doesn't exist
-        if g.user.id not in event_sources:
-            event_sources[g.user.id] = queue.Queue()
+        yield "event: connected\ndata: {\"status\": \"connected\"}\n\n"
         
-        user_queue = event_sources[g.user.id]
+        if resync:
+            yield "event: resync\ndata: {}\n\n"
         
-        # Send headers for SSE
-        yield "event: connected\ndata: {\"status\": \"connected\"}\n\n"
+        for message in replay:
+            yield format_event(message)
+        
+        replayed_ids = {message['id'] for message in replay}
+        dropped = 0
         
         try:
-            while True:
-                try:
-                    # Non-blocking queue get with timeout
-                    message = user_queue.get(timeout=30)
-                    yield f"data: {json.dumps(message)}\n\n"
-                except queue.Empty:
+            while not subscription.closed:
+                # Sleeps until a notification arrives or the heartbeat is due
+                messages = subscription.get(timeout=heartbeat)
+                
+                if subscription.dropped != dropped:
+                    dropped = subscription.dropped
+                    yield "event: resync\ndata: {}\n\n"
+                
+                if not messages:
                     # Send a heartbeat to keep connection alive
                     yield "event: ping\ndata: {}\n\n"
-                    
-                time.sleep(0.1)  # Small delay to prevent CPU overuse
+                    continue
+                
+                for message in messages:
+                    if message['id'] not in replayed_ids:
+                        yield format_event(message)
         finally:
-            # Clean up when client disconnects
-            if g.user.id in event_sources:
-                del event_sources[g.user.id]
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Covers clients that disconnect before the generator starts
+    response.call_on_close(subscription.close)
     
-    return Response(generate(), mimetype='text/event-stream')
\ No newline at end of file
+    return response
+
+def format_event(notification):
+    """Format a serialized notification as an SSE event carrying its id"""
+    return f"id: {notification['id']}\ndata: {json.dumps(notification)}\n\n"
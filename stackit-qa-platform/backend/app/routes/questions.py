@@ -1,11 +1,15 @@
 from flask import Blueprint, request, jsonify, g
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import HTTPException
 
-from ..services.question_service import QuestionService
+from ..services.question_service import QuestionService, QUESTION_SORTS
 from ..utils.image_handler import save_uploaded_image
 from ..middleware.auth_middleware import login_required
 from ..utils.validators import validate_question
+from ..utils.pagination import get_pagination_args
+from ..utils.loaders import get_fields_arg
+from ..utils.cache import cache, question_tag, tag_listing_tag, QUESTION_LISTINGS
 
 # Define the blueprint with a proper URL prefix
 questions_bp = Blueprint('questions', __name__, url_prefix='/api/questions')
@@ -14,19 +18,25 @@ questions_bp = Blueprint('questions', __name__, url_prefix='/api/questions')
 @questions_bp.route('/', methods=['GET'])  # Fixed: added leading slash
 def list_questions():
     """Get a list of questions with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 10, type=int), 50)
+    pagination = get_pagination_args(default_per_page=10, max_per_page=50)
     tag = request.args.get('tag')
     search = request.args.get('search')
+    fields = get_fields_arg('question_list')
+    sort = request.args.get('sort', 'newest')
+    if sort not in QUESTION_SORTS:
+        return jsonify({"error": f"Invalid sort. Must be one of: {', '.join(QUESTION_SORTS)}"}), 400
     
     try:
-        result = QuestionService.get_questions(
-            page=page, 
-            per_page=per_page,
-            tag=tag,
-            search=search
+        result = cache.get_or_set(
+            cache.make_key('questions', tag=tag, search=search, sort=sort,
+                           fields=','.join(fields) if fields else None, **pagination),
+            lambda: QuestionService.get_questions(tag=tag, search=search, fields=fields, sort=sort, **pagination),
+            tags=[tag_listing_tag(tag) if tag else QUESTION_LISTINGS]
         )
         return jsonify(result)
+    except HTTPException:
+        # e.g. 400 for a cursor issued under another sort
+        raise
     except Exception as e:
         current_app.logger.error(f"Error fetching questions: {str(e)}")
         return jsonify({"error": "Failed to fetch questions"}), 500
@@ -34,12 +44,20 @@ def list_questions():
 @questions_bp.route('/<int:question_id>', methods=['GET'])  # Fixed: added leading slash
 def get_question(question_id):
     """Get a specific question by ID"""
-    try:
+    def load_question():
         question = QuestionService.get_question_by_id(question_id)
-        if not question:
+        return question.to_dict(include_answers=True) if question else None
+    
+    try:
+        data = cache.get_or_set(
+            cache.make_key('question', id=question_id),
+            load_question,
+            tags=[question_tag(question_id)]
+        )
+        if data is None:
             return jsonify({"error": "Question not found"}), 404
             
-        return jsonify(question.to_dict(with_answers=True))
+        return jsonify(data)
     except Exception as e:
         current_app.logger.error(f"Error fetching question: {str(e)}")
         return jsonify({"error": "Failed to fetch question"}), 500
@@ -63,7 +81,7 @@ def create_question():
     if 'image' in request.files:
         image = request.files['image']
         if image.filename:
-            image_url = save_uploaded_image(image, 'questions')
+            image_url = save_uploaded_image(image)
     
     try:
         question = QuestionService.create_question(
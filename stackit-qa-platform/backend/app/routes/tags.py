@@ -0,0 +1,31 @@
+from flask import Blueprint, request, jsonify
+from app.models import Tag
+from app.services.tag_service import tag_suggestions
+from app.utils.pagination import get_pagination_args, paginate
+
+tags_bp = Blueprint('tags', __name__, url_prefix='/api/tags')
+
+@tags_bp.route('/', methods=['GET'])
+def list_tags():
+    """Get the tag directory, most used tags first"""
+    result = paginate(
+        Tag.query,
+        Tag,
+        keyset_column=Tag.question_count,
+        **get_pagination_args(default_per_page=50, max_per_page=100)
+    )
+    result['tags'] = [tag.to_dict() for tag in result.pop('items')]
+    
+    return jsonify(result)
+
+@tags_bp.route('/suggest', methods=['GET'])
+def suggest_tags():
+    """
+    Autocomplete tag names: the most used tags starting with ?prefix=
+    
+    Answered from this worker's in-memory index, without a query.
+    """
+    prefix = request.args.get('prefix', '').strip()
+    limit = request.args.get('limit', type=int)
+    
+    return jsonify({'tags': tag_suggestions.suggest(prefix, limit)})
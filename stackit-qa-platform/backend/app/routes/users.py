@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, g, abort
+from werkzeug.exceptions import HTTPException
 from app import db
 from app.models import User, Question, Answer
 from app.utils.decorators import login_required
 from app.utils.validators import validate_user_update
+from app.utils.loaders import load_view, load_fields, get_fields_arg
+from app.utils.pagination import get_pagination_args, paginate
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -36,6 +39,10 @@ def update_profile():
         
         db.session.commit()
         return jsonify({"message": "Profile updated successfully", "user": g.user.to_dict(include_email=True)})
+    except HTTPException:
+        # e.g. 429 or 503 from the password hasher
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -50,11 +57,11 @@ def get_user_profile(username):
     answer_count = Answer.query.filter_by(user_id=user.id).count()
     
     # Get recent activity (last 5 questions and answers)
-    recent_questions = [q.to_dict() for q in Question.query.filter_by(user_id=user.id)
-                        .order_by(Question.created_at.desc()).limit(5).all()]
+    recent_questions = [q.to_dict(include_description=False) for q in load_view(Question.query, 'question_list')
+                        .filter_by(user_id=user.id).order_by(Question.created_at.desc()).limit(5).all()]
     
-    recent_answers = [a.to_dict() for a in Answer.query.filter_by(user_id=user.id)
-                     .order_by(Answer.created_at.desc()).limit(5).all()]
+    recent_answers = [a.to_dict() for a in load_view(Answer.query, 'answer_list')
+                     .filter_by(user_id=user.id).order_by(Answer.created_at.desc()).limit(5).all()]
     
     return jsonify({
         "user": user.to_dict(),
@@ -70,40 +77,30 @@ def get_user_profile(username):
 
 @users_bp.route('/<string:username>/questions', methods=['GET'])
 def get_user_questions(username):
-    """Get all questions asked by a user"""
+    """Get all questions asked by a user, optionally only some ?fields="""
     user = User.query.filter_by(username=username).first_or_404()
+    fields = get_fields_arg('question_list')
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    questions_page = Question.query.filter_by(user_id=user.id)\
-        .order_by(Question.created_at.desc())\
-        .paginate(page=page, per_page=per_page)
+    result = paginate(
+        load_fields(Question.query, 'question_list', fields).filter_by(user_id=user.id),
+        Question,
+        **get_pagination_args()
+    )
+    result['questions'] = [q.to_dict(include_description=False, fields=fields) for q in result.pop('items')]
     
-    return jsonify({
-        "questions": [q.to_dict() for q in questions_page.items],
-        "total": questions_page.total,
-        "page": page,
-        "pages": questions_page.pages,
-        "per_page": per_page
-    })
+    return jsonify(result)
 
 @users_bp.route('/<string:username>/answers', methods=['GET'])
 def get_user_answers(username):
-    """Get all answers provided by a user"""
+    """Get all answers provided by a user, optionally only some ?fields="""
     user = User.query.filter_by(username=username).first_or_404()
+    fields = get_fields_arg('answer_list')
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    answers_page = Answer.query.filter_by(user_id=user.id)\
-        .order_by(Answer.created_at.desc())\
-        .paginate(page=page, per_page=per_page)
+    result = paginate(
+        load_fields(Answer.query, 'answer_list', fields).filter_by(user_id=user.id),
+        Answer,
+        **get_pagination_args()
+    )
+    result['answers'] = [a.to_dict(fields=fields) for a in result.pop('items')]
     
-    return jsonify({
-        "answers": [a.to_dict() for a in answers_page.items],
-        "total": answers_page.total,
-        "page": page,
-        "pages": answers_page.pages,
-        "per_page": per_page
-    })
\ No newline at end of file
+    return jsonify(result)
\ No newline at end of file
@@ -1,8 +1,15 @@
+import threading
+from datetime import datetime
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app import db
-from app.models import Answer, Vote, Comment
-from app.utils.helpers import sanitize_html
-from app.services.notification_service import create_notification
-import re
+from app.models import Answer, Question, Vote, Comment
+from app.utils.helpers import sanitize_html, extract_mentions
+from app.services.notification_service import create_notifications
+from app.services.outbox_service import enqueue_event, outbox_dispatcher
+from app.services.tag_service import question_tag_names
+from app.utils.cache import invalidate_question
 
 def get_answer_by_id(answer_id):
     """
@@ -12,7 +19,12 @@ def get_answer_by_id(answer_id):
 
 def create_answer(user_id, question_id, content):
     """
-    Create a new answer to a question and send notifications
+    Create a new answer to a question and queue its notifications
+    
+    The answer, its question's answer_count and last_activity_at, and an
+    'answer_created' outbox event are committed together; the question
+    author and any @mentioned users are notified by the outbox dispatcher,
+    so a failure there can't lose or half-send notifications.
     """
     # Sanitize content
     clean_content = sanitize_html(content)
@@ -25,22 +37,20 @@ def create_answer(user_id, question_id, content):
     )
     
     db.session.add(answer)
+    db.session.flush()
+    db.session.execute(
+        db.update(Question).where(Question.id == question_id).values(
+            answer_count=Question.answer_count + 1,
+            last_activity_at=datetime.utcnow(),
+            updated_at=Question.updated_at
+        ).execution_options(synchronize_session=False)
+    )
+    enqueue_event('answer_created', answer_id=answer.id, question_id=question_id, author_id=user_id)
     db.session.commit()
     
-    # Get question author for notification
-    from app.models import Question
-    question = Question.query.get(question_id)
-    
-    # Notify question author if different from answer author
-    if question.user_id != user_id:
-        create_notification(
-            user_id=question.user_id,
-            notification_type='answer',
-            source_id=answer.id
-        )
-    
-    # Process mentions to notify users
-    process_mentions(clean_content, answer.id)
+    # The question's answer count and activity show in listings too
+    invalidate_question(question_id, tag_names=question_tag_names(question_id))
+    outbox_dispatcher.wake()
     
     return answer
 
@@ -58,6 +68,7 @@ def update_answer(answer_id, content):
     # Update answer
     answer.content = clean_content
     db.session.commit()
+    invalidate_question(answer.question_id)
     
     return answer
 
@@ -65,34 +76,47 @@ def process_mentions(content, answer_id):
     """
     Extract @username mentions from content and create notifications
     """
-    # Find all @username patterns in the content
-    pattern = r'@([a-zA-Z0-9_]{3,})'
-    mentions = re.findall(pattern, content)
-    
-    if not mentions:
-        return
-    
     # Get the answer to determine who wrote it
-    answer = Answer.query.get(answer_id)
-    if not answer:
+    author_id = db.session.query(Answer.user_id).filter(Answer.id == answer_id).scalar()
+    if author_id is None:
         return
     
-    # Get mentioned users and send notifications
+    create_notifications(mention_notifications([(answer_id, author_id, content)]))
+
+def mention_notifications(answers):
+    """
+    Resolve @username mentions in answers to notification entries
+    
+    The usernames mentioned across all the given answers are looked up in a
+    single IN query; an answer's author is never notified of their own
+    mention.
+    
+    Args:
+        answers: Iterable of (answer_id, author_id, content) tuples
+    
+    Returns:
+        List of (user_id, 'mention', answer_id) entries
+    """
+    mentions = [(answer_id, author_id, extract_mentions(content)) for answer_id, author_id, content in answers]
+    usernames = {username for _, _, names in mentions for username in names}
+    if not usernames:
+        return []
+    
     from app.models import User
-    for username in set(mentions):
-        mentioned_user = User.query.filter_by(username=username).first()
-        
-        # Only notify if user exists and is not the answer author
-        if mentioned_user and mentioned_user.id != answer.user_id:
-            create_notification(
-                user_id=mentioned_user.id,
-                notification_type='mention',
-                source_id=answer_id
-            )
+    user_ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)).all())
+    
+    entries = []
+    for answer_id, author_id, names in mentions:
+        for username in names:
+            user_id = user_ids.get(username)
+            if user_id is not None and user_id != author_id:
+                entries.append((user_id, 'mention', answer_id))
+    
+    return entries
 
 def create_comment(user_id, answer_id, content):
     """
-    Create a comment on an answer and notify the answer author
+    Create a comment on an answer and queue a notification for its author
     """
     # Create comment
     comment = Comment(
@@ -102,61 +126,415 @@ def create_comment(user_id, answer_id, content):
     )
     
     db.session.add(comment)
+    db.session.flush()
+    enqueue_event('comment_created', comment_id=comment.id, answer_id=answer_id, author_id=user_id)
     db.session.commit()
     
-    # Get answer author for notification
-    answer = Answer.query.get(answer_id)
-    
-    # Notify answer author if different from commenter
-    if answer.user_id != user_id:
-        create_notification(
-            user_id=answer.user_id,
-            notification_type='comment',
-            source_id=comment.id
-        )
+    outbox_dispatcher.wake()
     
     return comment
 
+def mark_accepted(user_id, answer_id):
+    """
+    Mark an answer as accepted, on behalf of its question's author
+    
+    One conditional UPDATE points the question's accepted_answer_id at the
+    answer (and bumps its last_activity_at), matching only if user_id asked
+    the question; a second flips
+    answers.accepted for the previously accepted answer and this one in
+    the same transaction. Nothing is read beforehand.
+    
+    Returns:
+        The question's id, or None if there is no such answer or user_id
+        is not its question's author
+    """
+    question_id = db.select(Answer.question_id).where(Answer.id == answer_id).scalar_subquery()
+    claim = db.update(Question).where(Question.id == question_id, Question.user_id == user_id).values(
+        accepted_answer_id=answer_id,
+        last_activity_at=datetime.utcnow(),
+        # Not an edit, so leave the modification time alone
+        updated_at=Question.updated_at
+    ).execution_options(synchronize_session=False)
+    
+    if db.engine.dialect.update_returning:
+        question_id = db.session.execute(claim.returning(Question.id)).scalar()
+    elif db.session.execute(claim).rowcount:
+        question_id = db.session.query(Answer.question_id).filter(Answer.id == answer_id).scalar()
+    else:
+        question_id = None
+    
+    if question_id is None:
+        db.session.rollback()
+        return None
+    
+    db.session.execute(
+        db.update(Answer)
+        .where(Answer.question_id == question_id, db.or_(Answer.accepted == True, Answer.id == answer_id))
+        .values(accepted=Answer.id == answer_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return question_id
+
+def remove_answer(answer):
+    """
+    Delete an answer, keeping its question's denormalized columns in step
+    
+    The question's answer_count and score drop by the answer and, if it
+    was the accepted answer, accepted_answer_id is cleared (ON DELETE SET
+    NULL does that too where the database enforces foreign keys, which
+    SQLite does not by default). The answer's score is read by the UPDATE
+    itself, so votes counted since the answer was loaded are included.
+    
+    Returns:
+        list: Names of the question's tags, for invalidate_question
+    """
+    tag_names = question_tag_names(answer.question_id)
+    db.session.execute(
+        db.update(Question).where(Question.id == answer.question_id).values(
+            answer_count=Question.answer_count - 1,
+            score=Question.score - db.select(Answer.score).where(Answer.id == answer.id).scalar_subquery(),
+            accepted_answer_id=db.case(
+                (Question.accepted_answer_id == answer.id, None),
+                else_=Question.accepted_answer_id
+            ),
+            updated_at=Question.updated_at
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.delete(answer)
+    db.session.commit()
+    return tag_names
+
 def vote_on_answer(user_id, answer_id, vote_type):
     """
     Register a vote (up/down) on an answer
+    
+    Voting the same way again takes the vote back; voting the other way
+    switches it. The user's previous vote is removed and read back by a
+    single DELETE ... RETURNING and the new one written with an INSERT
+    that does nothing on conflict, so there is no read-then-write window
+    for concurrent requests to race through. If a concurrent request by
+    the same user got its vote in first, that vote is taken in turn, so
+    the counters only ever move by the votes actually removed and written.
+    The answer's denormalized counters are adjusted with an in-database
+    increment that returns the new totals, in the same transaction, or
+    coalesced by the vote buffer when it is enabled.
+    
+    Returns:
+        dict: upvotes, downvotes, score and the user's vote (None if taken back)
     """
-    # Check if user already voted
-    existing_vote = Vote.query.filter_by(
-        user_id=user_id,
-        answer_id=answer_id
-    ).first()
-    
-    if existing_vote:
-        if existing_vote.vote_type == vote_type:
-            # Remove vote if same type (toggle off)
-            db.session.delete(existing_vote)
-        else:
-            # Change vote type
-            existing_vote.vote_type = vote_type
+    up_delta = down_delta = 0
+    for _ in range(VOTE_ATTEMPTS):
+        previous_type = take_vote(user_id, answer_id)
+        up_removed, down_removed = vote_deltas(previous_type, None)
+        up_delta, down_delta = up_delta + up_removed, down_delta + down_removed
+        
+        new_type = None if previous_type == vote_type else vote_type
+        if new_type is None or insert_vote(user_id, answer_id, new_type):
+            break
     else:
-        # Create new vote
-        vote = Vote(
-            user_id=user_id,
-            answer_id=answer_id,
-            vote_type=vote_type
-        )
-        db.session.add(vote)
+        db.session.rollback()
+        raise RuntimeError(f"Vote on answer {answer_id} kept conflicting with concurrent votes")
     
-    db.session.commit()
+    up_added, down_added = vote_deltas(None, new_type)
+    up_delta, down_delta = up_delta + up_added, down_delta + down_added
+    if vote_buffer.enabled:
+        db.session.commit()
+        vote_buffer.add(answer_id, up_delta, down_delta)
+        counts = get_vote_counts(answer_id)
+    else:
+        counts = adjust_vote_counts(answer_id, up_delta, down_delta)
+        db.session.commit()
+    
+    counts['user_vote'] = new_type
+    return counts
+
+def take_vote(user_id, answer_id):
+    """
+    Delete a user's vote on an answer
+    
+    Returns:
+        The deleted vote's type, or None if there was no vote
+    """
+    delete = db.delete(Vote).where(
+        Vote.answer_id == answer_id, Vote.user_id == user_id
+    ).execution_options(synchronize_session=False)
+    
+    if db.engine.dialect.delete_returning:
+        return db.session.execute(delete.returning(Vote.vote_type)).scalar()
     
-    # Return updated vote counts
-    return get_vote_counts(answer_id)
+    # Without RETURNING, lock the row while it is read
+    previous_type = db.session.execute(
+        db.select(Vote.vote_type).where(Vote.answer_id == answer_id, Vote.user_id == user_id).with_for_update()
+    ).scalar()
+    if previous_type is not None:
+        db.session.execute(delete)
+    return previous_type
+
+# Rounds of take-and-insert a vote gets against concurrent votes by the same user
+VOTE_ATTEMPTS = 3
+
+def insert_vote(user_id, answer_id, vote_type):
+    """
+    INSERT a vote unless the user already has one on the answer (cast
+    concurrently since it was taken), instead of failing on unique_vote
+    
+    Returns:
+        Whether the vote was inserted
+    """
+    if db.engine.dialect.name == 'mysql':
+        statement = mysql_insert(Vote).prefix_with('IGNORE')
+    else:
+        insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+        statement = insert(Vote).on_conflict_do_nothing(index_elements=[Vote.answer_id, Vote.user_id])
+    
+    result = db.session.execute(statement.values(answer_id=answer_id, user_id=user_id, vote_type=vote_type))
+    return result.rowcount == 1
+
+def vote_deltas(previous_type, new_type):
+    """
+    Changes to an answer's (upvotes, downvotes) for a vote going from
+    previous_type to new_type (either may be None for "no vote")
+    """
+    return (new_type == 'up') - (previous_type == 'up'), (new_type == 'down') - (previous_type == 'down')
+
+def adjust_vote_counts(answer_id, up_delta, down_delta):
+    """
+    Add to an answer's vote counters, and its question's score
+    
+    Returns:
+        dict: the answer's new upvotes, downvotes and score, or None if
+        there is no such answer
+    """
+    if not up_delta and not down_delta:
+        return get_vote_counts(answer_id)
+    
+    db.session.execute(
+        db.update(Question).where(
+            Question.id == db.select(Answer.question_id).where(Answer.id == answer_id).scalar_subquery()
+        ).values(
+            score=Question.score + (up_delta - down_delta),
+            updated_at=Question.updated_at
+        ).execution_options(synchronize_session=False)
+    )
+    
+    update = db.update(Answer).where(Answer.id == answer_id).values(
+        upvotes=Answer.upvotes + up_delta,
+        downvotes=Answer.downvotes + down_delta,
+        score=Answer.score + (up_delta - down_delta)
+    ).execution_options(synchronize_session=False)
+    
+    if not db.engine.dialect.update_returning:
+        db.session.execute(update)
+        return get_vote_counts(answer_id)
+    
+    counts = db.session.execute(update.returning(Answer.upvotes, Answer.downvotes, Answer.score)).first()
+    if not counts:
+        return None
+    
+    return {
+        'upvotes': counts.upvotes,
+        'downvotes': counts.downvotes,
+        'score': counts.score
+    }
 
 def get_vote_counts(answer_id):
     """
     Get upvote and downvote counts for an answer
+    
+    Deltas this process's vote buffer has yet to write are included.
     """
-    upvotes = Vote.query.filter_by(answer_id=answer_id, vote_type='up').count()
-    downvotes = Vote.query.filter_by(answer_id=answer_id, vote_type='down').count()
+    counts = db.session.query(
+        Answer.upvotes, Answer.downvotes, Answer.score
+    ).filter(Answer.id == answer_id).first()
+    
+    if not counts:
+        return None
     
+    up_pending, down_pending = vote_buffer.pending(answer_id)
     return {
-        'upvotes': upvotes,
-        'downvotes': downvotes,
-        'score': upvotes - downvotes
-    }
\ No newline at end of file
+        'upvotes': counts.upvotes + up_pending,
+        'downvotes': counts.downvotes + down_pending,
+        'score': counts.score + up_pending - down_pending
+    }
+
+def reconcile_vote_counts():
+    """
+    Recompute every answer's vote counters from the votes table
+    
+    Runs as a single bulk UPDATE with correlated counts and only touches
+    answers whose stored counters have drifted. Used to backfill the
+    columns on existing databases and to repair drift.
+    
+    Returns:
+        Number of answers whose counters were corrected
+    """
+    upvotes = db.select(db.func.count(Vote.id)).where(
+        Vote.answer_id == Answer.id, Vote.vote_type == 'up'
+    ).scalar_subquery()
+    downvotes = db.select(db.func.count(Vote.id)).where(
+        Vote.answer_id == Answer.id, Vote.vote_type == 'down'
+    ).scalar_subquery()
+    
+    result = db.session.execute(
+        db.update(Answer)
+        .where(db.or_(Answer.upvotes != upvotes, Answer.downvotes != downvotes,
+                      Answer.score != upvotes - downvotes))
+        .values(upvotes=upvotes, downvotes=downvotes, score=upvotes - downvotes)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return result.rowcount
+
+class VoteBuffer:
+    """
+    Coalesces vote counter updates for hot answers
+    
+    Every vote on an answer increments the same answers row, so a burst of
+    votes on a popular answer queues each request behind that row's lock.
+    In buffered mode the vote rows are still written immediately, but the
+    counter deltas are summed per answer in memory and applied by a
+    background thread every VOTE_BUFFER_FLUSH_INTERVAL seconds, or as soon
+    as VOTE_BUFFER_MAX_ANSWERS answers are pending, as one batched UPDATE
+    in one transaction. Deltas lost with a crashed process are restored by
+    `flask reconcile-votes`. The thread is started lazily, from the first
+    vote in a process.
+    """
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.interval = 1
+        self.max_answers = 500
+        self.buffered = 0
+        self.flushed = 0
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('VOTE_BUFFER_ENABLED', False)
+        self.interval = app.config.get('VOTE_BUFFER_FLUSH_INTERVAL', 1)
+        self.max_answers = app.config.get('VOTE_BUFFER_MAX_ANSWERS', 500)
+        with self._lock:
+            self._pending = {}
+        self.buffered = 0
+        self.flushed = 0
+    
+    def add(self, answer_id, up_delta, down_delta):
+        """Queue a change to an answer's counters"""
+        with self._lock:
+            deltas = self._pending.setdefault(answer_id, [0, 0])
+            deltas[0] += up_delta
+            deltas[1] += down_delta
+            self.buffered += 1
+            full = len(self._pending) >= self.max_answers
+        
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+    
+    def pending(self, answer_id):
+        """(upvotes, downvotes) changes queued for an answer but not yet written"""
+        with self._lock:
+            return tuple(self._pending.get(answer_id, (0, 0)))
+    
+    def flush(self):
+        """
+        Write every queued delta, to the answers and their questions'
+        scores, in one transaction
+        
+        Returns:
+            Number of answers updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        
+        rows = [{'answer_id': answer_id, 'up': up, 'down': down}
+                for answer_id, (up, down) in pending.items() if up or down]
+        if not rows:
+            return 0
+        
+        table = Answer.__table__
+        questions = Question.__table__
+        try:
+            db.session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('answer_id'))
+                .values(
+                    upvotes=table.c.upvotes + db.bindparam('up'),
+                    downvotes=table.c.downvotes + db.bindparam('down'),
+                    score=table.c.score + db.bindparam('up') - db.bindparam('down')
+                ),
+                rows
+            )
+            
+            question_deltas = {}
+            answer_questions = dict(db.session.query(Answer.id, Answer.question_id).filter(
+                Answer.id.in_([row['answer_id'] for row in rows])
+            ))
+            for row in rows:
+                question_id = answer_questions.get(row['answer_id'])
+                if question_id is not None:
+                    question_deltas[question_id] = question_deltas.get(question_id, 0) + row['up'] - row['down']
+            question_ids = list(question_deltas)
+            
+            score_rows = [{'question_id': question_id, 'delta': delta}
+                          for question_id, delta in question_deltas.items() if delta]
+            if score_rows:
+                db.session.execute(
+                    questions.update()
+                    .where(questions.c.id == db.bindparam('question_id'))
+                    .values(score=questions.c.score + db.bindparam('delta'), updated_at=questions.c.updated_at),
+                    score_rows
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keep the deltas for the next flush
+            with self._lock:
+                for row in rows:
+                    deltas = self._pending.setdefault(row['answer_id'], [0, 0])
+                    deltas[0] += row['up']
+                    deltas[1] += row['down']
+            raise
+        
+        for question_id in question_ids:
+            invalidate_question(question_id)
+        
+        self.flushed += len(rows)
+        return len(rows)
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='vote-buffer', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.app.logger.error(f"Vote buffer flush error: {str(e)}")
+    
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        
+        return {
+            'enabled': self.enabled,
+            'pending_answers': pending,
+            'buffered_votes': self.buffered,
+            'flushed_answers': self.flushed
+        }
+
+# Shared instance, configured by create_app()
+vote_buffer = VoteBuffer()
@@ -1,5 +1,77 @@
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
 from app import db
 from app.models import User
+from app.utils.passwords import password_hasher
+from app.utils.cache import cache, user_principal_tag
+
+# What the auth pipeline needs to know about a user on every request
+UserPrincipal = namedtuple('UserPrincipal', ['id', 'role', 'banned'])
+
+class UserCache:
+    """
+    Short-lived per-process cache of user principals
+    
+    Saves a database round-trip on every authenticated request. Entries
+    expire after ttl seconds, and each remembers the user's version in the
+    cache backend: a ban or role change bumps that version, so a worker
+    sharing the backend reloads the principal on its next read. Only a
+    shared backend ('redis') reaches every worker; with the default
+    per-process 'memory' backend, other workers keep the old principal
+    until their entry's ttl runs out.
+    """
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        """
+        Get the principal for a user, loading it on a miss
+        
+        Returns:
+            UserPrincipal, or None if the user doesn't exist
+        """
+        now = time.monotonic()
+        version = cache.backend.get_versions([user_principal_tag(user_id)])[0]
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry and entry[0] > now and entry[1] == version:
+            return entry[2]
+        
+        row = db.session.query(User.id, User.role, User.banned).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        
+        principal = UserPrincipal(row.id, row.role, bool(row.banned))
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, version, principal)
+        return principal
+    
+    def invalidate(self, user_id):
+        """
+        Drop a user's cached principal, e.g. after a ban or role change:
+        here at once, and in the other workers at once with a shared cache
+        backend or within ttl seconds otherwise
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        cache.invalidate(user_principal_tag(user_id))
+
+def get_user_principal(user_id):
+    """
+    Get the (id, role, banned) principal for a user through the app's cache
+    """
+    return current_app.extensions['user_cache'].get(user_id)
+
+def invalidate_user_principal(user_id):
+    """
+    Invalidate a user's cached principal so the change applies to their
+    next request
+    """
+    current_app.extensions['user_cache'].invalidate(user_id)
 
 def authenticate_user(username, password):
     """
@@ -15,6 +87,10 @@ def authenticate_user(username, password):
     user = User.query.filter_by(username=username).first()
     
     if user and user.check_password(password):
+        # Upgrade hashes made with older parameters while we have the password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.set_password(password)
+            db.session.commit()
         return user
     
     return None
@@ -1,84 +1,302 @@
 from flask import current_app, render_template
 import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import groupby
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from app import db
+from app.models import EmailMessage
+from app.utils.mail import SMTPConnectionPool
 
 def send_email(recipient, subject, template, **kwargs):
     """
-    Send an email using SMTP
+    Queue an email for background delivery over SMTP
+    
+    The template is rendered now and the message added to email_messages
+    as part of the caller's transaction, without committing: it is sent
+    only if the caller commits. The mail queue workers deliver it on their
+    next poll, or right away if the caller calls mail_queue.wake() after
+    committing.
     
     Args:
         recipient: Email address of the recipient
         subject: Email subject
         template: HTML template to use for email body
         **kwargs: Variables to pass to the template
+        
+    Returns:
+        Id of the queued message, or None if it was not queued
     """
-    # Skip sending if SMTP is not configured or in testing mode
-    if not current_app.config.get('MAIL_SERVER') or current_app.testing:
+    # Skip sending if SMTP is not configured
+    if not current_app.config.get('MAIL_SERVER'):
         current_app.logger.info(f"Email sending skipped: {subject} to {recipient}")
-        return True
+        return None
     
     try:
         # Render template
         html_content = render_template(template, **kwargs)
+    except Exception as e:
+        current_app.logger.error(f"Failed to render email: {str(e)}")
+        return None
+    
+    return enqueue_email(recipient, subject, html_content).id
+
+def enqueue_email(recipient, subject, html_body):
+    """
+    Add an email to the delivery queue as part of the current transaction,
+    without committing
+    """
+    message = EmailMessage(recipient=recipient, subject=subject, html_body=html_body)
+    db.session.add(message)
+    db.session.flush()
+    return message
+
+def claim_messages(batch_size):
+    """
+    Claim up to batch_size due messages for this worker
+    
+    Due messages are pending ones whose retry time has come, and ones left
+    'sending' for longer than MAIL_CLAIM_TIMEOUT by a worker that died. The
+    claim is a conditional UPDATE tagging the rows with a fresh token, so
+    concurrent workers never claim the same message.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config.get('MAIL_CLAIM_TIMEOUT', 300))
+    due = db.or_(
+        db.and_(EmailMessage.status == 'pending', EmailMessage.next_attempt_at <= now),
+        db.and_(EmailMessage.status == 'sending', EmailMessage.claimed_at < stale)
+    )
+    
+    ids = db.session.scalars(
+        db.select(EmailMessage.id).where(due).order_by(EmailMessage.id).limit(batch_size)
+    ).all()
+    if not ids:
+        db.session.rollback()
+        return []
+    
+    token = uuid.uuid4().hex
+    db.session.execute(
+        db.update(EmailMessage)
+        .where(EmailMessage.id.in_(ids), due)
+        .values(status='sending', claim_token=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return EmailMessage.query.filter_by(claim_token=token).order_by(EmailMessage.id).all()
+
+def deliver_pending(pool, batch_size=None):
+    """
+    Deliver one batch of queued emails over a pooled SMTP session
+    
+    The whole batch goes over one session, replaced only if it breaks. A
+    pooled session the server has dropped in the meantime is replaced and
+    the message retried once, without counting as a delivery attempt.
+    Failed messages are retried with exponential backoff (MAIL_RETRY_BACKOFF
+    seconds, doubling per attempt) until MAIL_MAX_ATTEMPTS; permanent (5xx)
+    rejections fail at once.
+    
+    Returns:
+        Number of messages attempted
+    """
+    batch_size = batch_size or current_app.config.get('MAIL_QUEUE_BATCH_SIZE', 20)
+    messages = claim_messages(batch_size)
+    if not messages:
+        return 0
+    
+    sender = current_app.config['MAIL_DEFAULT_SENDER']
+    connection = None
+    
+    try:
+        for message in messages:
+            try:
+                data = build_mime_message(message, sender).as_string()
+                if connection is None:
+                    connection = pool.acquire()
+                try:
+                    connection.sendmail(sender, message.recipient, data)
+                except smtplib.SMTPServerDisconnected:
+                    pool.release(connection, broken=True)
+                    connection = None
+                    connection = pool.acquire(fresh=True)
+                    connection.sendmail(sender, message.recipient, data)
+            except Exception as e:
+                record_failure(message, e)
+                if connection is not None and not isinstance(e, MESSAGE_ERRORS):
+                    # The session itself may be unusable
+                    pool.release(connection, broken=True)
+                    connection = None
+                continue
+            
+            message.status = 'sent'
+            message.sent_at = datetime.utcnow()
+            message.claim_token = None
+            message.last_error = None
+    finally:
+        if connection is not None:
+            pool.release(connection)
+        db.session.commit()
+    
+    return len(messages)
+
+# Errors that reject one message but leave the SMTP session usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+def build_mime_message(message, sender):
+    mime = MIMEMultipart('alternative')
+    mime['Subject'] = message.subject
+    mime['From'] = sender
+    mime['To'] = message.recipient
+    mime.attach(MIMEText(message.html_body, 'html'))
+    return mime
+
+def record_failure(message, error):
+    """Schedule a retry for a failed message, or give up on it"""
+    message.attempts += 1
+    message.last_error = str(error)
+    message.claim_token = None
+    
+    if is_permanent_failure(error) or message.attempts >= current_app.config.get('MAIL_MAX_ATTEMPTS', 5):
+        message.status = 'failed'
+        current_app.logger.error(f"Failed to send email {message.id}: {str(error)}")
+        return
+    
+    backoff = current_app.config.get('MAIL_RETRY_BACKOFF', 30) * 2 ** (message.attempts - 1)
+    message.status = 'pending'
+    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+
+def is_permanent_failure(error):
+    """Whether retrying can't help: the server rejected the message with a 5xx"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # A configuration problem, not the message's
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+def get_mail_queue_stats():
+    """Message counts by status, and this process's SMTP session counters"""
+    counts = dict(db.session.query(EmailMessage.status, db.func.count(EmailMessage.id)).group_by(EmailMessage.status))
+    return {
+        'messages': {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')},
+        'workers': mail_queue.workers,
+        'connections': mail_queue.pool.stats() if mail_queue.pool else None
+    }
+
+class MailQueue:
+    """
+    Worker threads delivering queued email
+    
+    Workers are woken when a message is queued and also poll every
+    MAIL_QUEUE_POLL_INTERVAL seconds for retries that have come due. They
+    are started lazily, from the first wake() in a process, and share one
+    pool of SMTP sessions.
+    """
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self.interval = 10
+        self.pool = None
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.close()
+        self.app = app
+        self.interval = app.config.get('MAIL_QUEUE_POLL_INTERVAL', 10)
         
-        # Create message
-        message = MIMEMultipart('alternative')
-        message['Subject'] = subject
-        message['From'] = current_app.config['MAIL_DEFAULT_SENDER']
-        message['To'] = recipient
-        
-        # Attach HTML content
-        message.attach(MIMEText(html_content, 'html'))
+        if not app.config.get('MAIL_SERVER'):
+            self.workers = 0
+            self.pool = None
+            return
         
-        # Connect to SMTP server
-        with smtplib.SMTP(
-            current_app.config['MAIL_SERVER'], 
-            current_app.config['MAIL_PORT']
-        ) as server:
-            
-            # Use TLS if configured
-            if current_app.config.get('MAIL_USE_TLS'):
-                server.starttls()
-            
-            # Login if username and password provided
-            if current_app.config.get('MAIL_USERNAME') and current_app.config.get('MAIL_PASSWORD'):
-                server.login(
-                    current_app.config['MAIL_USERNAME'],
-                    current_app.config['MAIL_PASSWORD']
-                )
+        self.workers = app.config.get('MAIL_QUEUE_WORKERS', 2)
+        self.pool = SMTPConnectionPool(
+            app.config['MAIL_SERVER'],
+            app.config.get('MAIL_PORT', 587),
+            use_tls=app.config.get('MAIL_USE_TLS', False),
+            username=app.config.get('MAIL_USERNAME'),
+            password=app.config.get('MAIL_PASSWORD'),
+            size=max(self.workers, 1),
+            max_idle=app.config.get('MAIL_CONNECTION_MAX_IDLE', 60),
+            timeout=app.config.get('MAIL_SMTP_TIMEOUT', 30)
+        )
+    
+    def wake(self):
+        """Signal that new messages were queued"""
+        if not self.workers:
+            return
+        self._ensure_started()
+        self._wakeup.set()
+    
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name='mail-queue', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
             
-            # Send email
-            server.sendmail(
-                current_app.config['MAIL_DEFAULT_SENDER'],
-                recipient,
-                message.as_string()
-            )
-        
-        current_app.logger.info(f"Email sent successfully: {subject} to {recipient}")
-        return True
+            with self.app.app_context():
+                try:
+                    batch_size = self.app.config.get('MAIL_QUEUE_BATCH_SIZE', 20)
+                    while deliver_pending(self.pool, batch_size) == batch_size:
+                        pass
+                except Exception as e:
+                    self.app.logger.error(f"Mail queue error: {str(e)}")
     
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
-        return False
+    def close(self):
+        """Close idle SMTP sessions"""
+        if self.pool is not None:
+            self.pool.close_all()
+
+# Shared instance, configured by create_app()
+mail_queue = MailQueue()
+
+def send_email_now(recipient, subject, template, **kwargs):
+    """
+    Queue an email in a transaction of its own and wake the mail queue
+    
+    For one-off emails not tied to another write. This commits the
+    session, so call it once the caller's own changes are committed (or
+    use send_email to join them).
+    
+    Returns:
+        Id of the queued message, or None if it was not queued
+    """
+    message_id = send_email(recipient, subject, template, **kwargs)
+    if message_id is not None:
+        db.session.commit()
+        mail_queue.wake()
+    return message_id
 
 def send_welcome_email(user):
-    """Send welcome email to new user"""
-    return send_email(
+    """Send welcome email to new user, committing it to the mail queue"""
+    return send_email_now(
         recipient=user.email,
         subject="Welcome to StackIt!",
         template="emails/welcome.html",
-        user=user
+        user=user,
+        base_url=current_app.config.get('FRONTEND_URL', '')
     )
 
 def send_password_reset_email(user, reset_token):
-    """Send password reset email"""
-    return send_email(
+    """Send password reset email, committing it to the mail queue"""
+    return send_email_now(
         recipient=user.email,
         subject="Password Reset Request",
         template="emails/password_reset.html",
         user=user,
-        reset_token=reset_token
+        reset_token=reset_token,
+        base_url=current_app.config.get('FRONTEND_URL', '')
     )
 
 def send_notification_digest(user, notifications):
@@ -88,5 +306,112 @@ def send_notification_digest(user, notifications):
         subject="Your StackIt Notifications",
         template="emails/notification_digest.html",
         user=user,
-        notifications=notifications
-    )
\ No newline at end of file
+        notifications=notifications,
+        more=0,
+        base_url=current_app.config.get('FRONTEND_URL', '')
+    )
+
+def send_notification_digests(chunk_size=None, max_items=None):
+    """
+    Queue a digest email for every user with unread notifications they
+    haven't had a digest for yet
+    
+    Users are streamed in id order, chunk_size at a time. Each chunk takes
+    a fixed number of statements (users, their latest notifications ranked
+    per user, two to describe the sources, one bulk insert of the emails
+    and the digest marker)
+    and is committed before the next; only one chunk's rows are referenced
+    at a time, so memory and per-user cost stay flat however many users
+    there are. The digest template is compiled once per run.
+    
+    Returns:
+        dict: users scanned, emails queued, elapsed seconds and users per second
+    """
+    from app.models import Notification, User
+    from app.services.notification_service import describe_sources
+    
+    chunk_size = chunk_size or current_app.config.get('DIGEST_CHUNK_SIZE', 500)
+    max_items = max_items or current_app.config.get('DIGEST_MAX_ITEMS', 20)
+    template = current_app.jinja_env.get_template('emails/notification_digest.html')
+    base_url = current_app.config.get('FRONTEND_URL', '')
+    
+    started = time.monotonic()
+    run_at = datetime.utcnow()
+    scanned = queued = 0
+    last_id = 0
+    
+    while True:
+        users = db.session.query(
+            User.id, User.username, User.email, User.unread_notification_count
+        ).filter(
+            User.id > last_id,
+            User.unread_notification_count > 0,
+            User.banned.isnot(True)
+        ).order_by(User.id).limit(chunk_size).all()
+        if not users:
+            break
+        last_id = users[-1].id
+        scanned += len(users)
+        
+        # Each user's newest notifications since their last digest
+        ranked = db.session.query(
+            Notification.id,
+            db.func.row_number().over(
+                partition_by=Notification.user_id,
+                order_by=(Notification.updated_at.desc(), Notification.id.desc())
+            ).label('position')
+        ).join(User, User.id == Notification.user_id).filter(
+            Notification.user_id.in_([user.id for user in users]),
+            Notification.read == False,
+            Notification.updated_at > db.func.coalesce(User.last_digest_at, datetime.min)
+        ).subquery()
+        
+        notifications = Notification.query.join(ranked, ranked.c.id == Notification.id).filter(
+            ranked.c.position <= max_items
+        ).order_by(Notification.user_id, ranked.c.position).all()
+        payloads = describe_sources([notification.to_dict() for notification in notifications])
+        
+        # Grouped in one pass over the user-ordered rows
+        by_user = {user_id: list(items) for user_id, items in groupby(payloads, key=lambda p: p['user_id'])}
+        
+        emails = []
+        for user in users:
+            items = by_user.get(user.id)
+            if not items:
+                continue
+            emails.append({
+                'recipient': user.email,
+                'subject': "Your StackIt Notifications",
+                'html_body': template.render(
+                    user=user,
+                    notifications=items,
+                    more=max(user.unread_notification_count - len(items), 0),
+                    base_url=base_url
+                )
+            })
+        
+        if emails:
+            db.session.execute(db.insert(EmailMessage), emails)
+            queued += len(emails)
+        
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(list(by_user)))
+            .values(last_digest_at=run_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        
+        if len(users) < chunk_size:
+            break
+    
+    if queued:
+        mail_queue.wake()
+    
+    elapsed = time.monotonic() - started
+    return {
+        'users': scanned,
+        'emails': queued,
+        'seconds': round(elapsed, 3),
+        'users_per_second': round(scanned / elapsed, 1) if elapsed else None
+    }
@@ -1,76 +1,419 @@
+from collections import Counter
+from datetime import datetime, timedelta
 from app import db
 from app.models import Notification, User
 from flask import current_app
+from app.utils.cache import cache, unread_count_tag
+from app.utils.pagination import paginate
+from app.utils.streams import notification_hub
 
-def get_user_notifications(user_id, page=1, per_page=10, unread_only=False):
+def get_user_notifications(user_id, page=None, per_page=10, unread_only=False, cursor=None,
+                           include_total=False):
     """
-    Get notifications for a specific user with pagination
+    Get notifications for a specific user, most recent first
+    
+    Pages by cursor unless a page number is given, see
+    app.utils.pagination.paginate.
+    
+    Returns:
+        dict: items, per_page and next_cursor, plus total when counted
     """
     query = Notification.query.filter_by(user_id=user_id)
     
     if unread_only:
         query = query.filter_by(read=False)
     
-    # Order by most recent
-    query = query.order_by(Notification.created_at.desc())
+    return paginate(query, Notification, per_page, page=page, cursor=cursor,
+                    include_total=include_total)
+
+def describe_sources(payloads):
+    """
+    Add what a client needs to render each notification, in two grouped
+    queries however many notifications there are
+    
+    Sets 'source' on each serialized notification to the answer it refers
+    to (directly, or through the comment), that answer's question id and
+    title, and the actor who wrote the answer or comment. Notifications
+    whose source has since been deleted get a source of None.
+    
+    Args:
+        payloads: List of serialized notifications, updated in place
+        
+    Returns:
+        The same list
+    """
+    from app.models import Answer, Comment, Question
+    
+    comment_ids = {p['source_id'] for p in payloads if p['type'] == 'comment'}
+    answer_ids = {p['source_id'] for p in payloads if p['type'] != 'comment'}
+    
+    comments = {}
+    if comment_ids:
+        rows = db.session.query(Comment.id, Comment.answer_id, User.id, User.username).join(
+            User, User.id == Comment.user_id
+        ).filter(Comment.id.in_(comment_ids)).all()
+        comments = {comment_id: (answer_id, {'id': user_id, 'username': username})
+                    for comment_id, answer_id, user_id, username in rows}
+        answer_ids.update(answer_id for answer_id, _ in comments.values())
+    
+    answers = {}
+    if answer_ids:
+        rows = db.session.query(Answer.id, Question.id, Question.title, User.id, User.username).join(
+            Question, Question.id == Answer.question_id
+        ).join(User, User.id == Answer.user_id).filter(Answer.id.in_(answer_ids)).all()
+        answers = {answer_id: {'answer_id': answer_id, 'question_id': question_id, 'question_title': title,
+                               'actor': {'id': user_id, 'username': username}}
+                   for answer_id, question_id, title, user_id, username in rows}
+    
+    for payload in payloads:
+        if payload['type'] == 'comment':
+            answer_id, actor = comments.get(payload['source_id'], (None, None))
+            answer = answers.get(answer_id)
+            payload['source'] = dict(answer, comment_id=payload['source_id'], actor=actor) if answer else None
+        else:
+            payload['source'] = answers.get(payload['source_id'])
+    
+    return payloads
+
+def get_unread_count(user_id):
+    """
+    Get a user's unread notification count from their counter column
     
-    # Get total count before pagination
-    total = query.count()
+    Cached per user for NOTIFICATION_COUNT_CACHE_TTL seconds. Changes made
+    through this module invalidate the cached value once committed.
+    """
+    return cache.get_or_set(
+        cache.make_key('unread_count', user_id=user_id),
+        lambda: db.session.query(User.unread_notification_count).filter(User.id == user_id).scalar(),
+        tags=[unread_count_tag(user_id)],
+        ttl=current_app.config.get('NOTIFICATION_COUNT_CACHE_TTL', 10)
+    )
+
+def get_notifications_since(user_id, last_id, limit):
+    """
+    Get the notifications a reconnecting stream missed, oldest first
     
-    # Apply pagination
-    notifications = query.paginate(page=page, per_page=per_page).items
+    Seeks forward from the last notification the client received along the
+    (user_id, created_at) index.
     
-    return notifications, total
+    Returns:
+        List of notifications, or None if the client can't be caught up this
+        way (the last notification is unknown, or more than limit arrived
+        since) and should refetch its notification list instead
+    """
+    anchor = db.session.query(Notification.created_at).filter(
+        Notification.id == last_id,
+        Notification.user_id == user_id
+    ).first()
+    if anchor is None:
+        return None
+    
+    missed = Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.created_at >= anchor.created_at,
+        Notification.id > last_id
+    ).order_by(Notification.created_at, Notification.id).limit(limit + 1).all()
+    
+    if len(missed) > limit:
+        return None
+    return missed
 
 def create_notification(user_id, notification_type, source_id):
     """
     Create a new notification and push to real-time stream if available
     """
+    payloads = create_notifications([(user_id, notification_type, source_id)])
+    return db.session.get(Notification, payloads[0]['id']) if payloads else None
+
+def create_notifications(entries):
+    """
+    Create several notifications in a single transaction
+    
+    Real-time pushes go out only after the commit succeeds.
+    
+    Args:
+        entries: Iterable of (user_id, notification_type, source_id)
+        
+    Returns:
+        List of serialized notifications (empty on failure)
+    """
     try:
-        # Create notification in database
-        notification = Notification(
-            user_id=user_id,
-            type=notification_type,
-            source_id=source_id
-        )
-        db.session.add(notification)
+        payloads = add_notifications(entries)
         db.session.commit()
-        
-        # Send to real-time stream if user is connected
-        push_notification_to_stream(notification)
-        
-        return notification
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error creating notification: {str(e)}")
-        return None
+        current_app.logger.error(f"Error creating notifications: {str(e)}")
+        return []
+    
+    push_notifications(payloads)
+    return payloads
+
+def add_notifications(entries):
+    """
+    Insert notifications as part of the current transaction, without committing
+    
+    Entries with a group key are coalesced: with each other within the
+    batch, and with the recipient's unread notification with the same key
+    if there is one. That notification is replaced by a new row carrying
+    the combined count, so it gets a fresh id and created_at: it moves to
+    the top of the listing and is replayed to reconnecting streams. Its
+    payload names the notification it replaces. All rows go to the
+    database in one multi-row INSERT ... RETURNING where the database
+    supports it.
+    
+    Args:
+        entries: Iterable of (user_id, notification_type, source_id) or
+            (user_id, notification_type, source_id, group_key), oldest first
+        
+    Returns:
+        List of serialized new and replacing notifications, to push once the
+        caller commits
+    """
+    now = datetime.utcnow()
+    rows = []
+    grouped = {}
+    for entry in entries:
+        user_id, notification_type, source_id = entry[:3]
+        key = entry[3] if len(entry) > 3 else None
+        
+        row = grouped.get((user_id, key)) if key is not None else None
+        if row is not None:
+            row['count'] += 1
+            row['source_id'] = source_id
+            continue
+        
+        row = {'user_id': user_id, 'type': notification_type, 'source_id': source_id,
+               'group_key': key, 'count': 1, 'created_at': now, 'updated_at': now}
+        rows.append(row)
+        if key is not None:
+            grouped[(user_id, key)] = row
+    
+    if not rows:
+        return []
+    
+    replaces = coalesce_notifications(rows)
+    
+    if db.engine.dialect.insert_executemany_returning:
+        notifications = db.session.scalars(
+            db.insert(Notification).returning(Notification), rows
+        ).all()
+    else:
+        notifications = [Notification(**row) for row in rows]
+        db.session.add_all(notifications)
+        db.session.flush()
+    
+    # Deleted only now, so no replacement can reuse the id it replaces
+    if replaces:
+        db.session.execute(
+            db.delete(Notification)
+            .where(Notification.id.in_(list(replaces.values())))
+            .execution_options(synchronize_session=False)
+        )
+    
+    # A replacement takes over its predecessor's place in the unread count
+    unread = Counter(row['user_id'] for row in rows)
+    unread.subtract(user_id for user_id, _ in replaces)
+    adjust_unread_counts(unread)
+    
+    # Serialize now; committing expires the objects
+    payloads = []
+    for notification in notifications:
+        payload = notification.to_dict()
+        old_id = replaces.get((notification.user_id, notification.group_key))
+        if old_id is not None:
+            payload['replaces'] = old_id
+        payloads.append(payload)
+    return payloads
+
+def coalesce_notifications(rows):
+    """
+    Fold grouped rows into their recipients' existing unread notifications
+    
+    Existing notifications are found with one query and their counts
+    added to the rows replacing them; the caller deletes them.
+    
+    Returns:
+        Mapping of (user_id, group_key) to the id of the notification the
+        row with that key replaces
+    """
+    replaces = {}
+    grouped = {(row['user_id'], row['group_key']): row for row in rows if row['group_key'] is not None}
+    if not grouped:
+        return replaces
+    
+    existing = db.session.query(
+        Notification.id, Notification.user_id, Notification.group_key, Notification.count
+    ).filter(
+        Notification.user_id.in_({user_id for user_id, _ in grouped}),
+        Notification.group_key.in_({key for _, key in grouped}),
+        Notification.read == False
+    ).all()
+    
+    for notification_id, user_id, key, count in existing:
+        row = grouped.get((user_id, key))
+        if row is not None and (user_id, key) not in replaces:
+            replaces[(user_id, key)] = notification_id
+            row['count'] += count
+    
+    return replaces
+
+def group_key(notification_type, parent_id):
+    """
+    Group key under which notifications of a type about the same parent
+    (the question for answers and mentions, the answer for comments) are
+    coalesced
+    """
+    return f"{notification_type}:{parent_id}"
+
+def archive_notifications(older_than_days=None, chunk_size=None):
+    """
+    Move read notifications older than the given age into the archive table
+    
+    Works in chunks of chunk_size rows, each copied and deleted in its own
+    short transaction, so the job never holds long locks on the hot table.
+    
+    Returns:
+        Number of notifications archived
+    """
+    from app.models import ArchivedNotification
+    
+    if older_than_days is None:
+        older_than_days = current_app.config.get('NOTIFICATION_ARCHIVE_AFTER_DAYS', 30)
+    chunk_size = chunk_size or current_app.config.get('NOTIFICATION_ARCHIVE_CHUNK_SIZE', 500)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    columns = ['id', 'user_id', 'type', 'source_id', 'read', 'created_at', 'group_key', 'count', 'updated_at']
+    
+    archived = 0
+    while True:
+        ids = [notification_id for notification_id, in db.session.query(Notification.id).filter(
+            Notification.read == True,
+            Notification.created_at < cutoff
+        ).order_by(Notification.id).limit(chunk_size)]
+        if not ids:
+            break
+        
+        db.session.execute(
+            db.insert(ArchivedNotification).from_select(
+                columns,
+                db.select(*[getattr(Notification, column) for column in columns]).where(Notification.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            db.delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        archived += len(ids)
+        
+        if len(ids) < chunk_size:
+            break
+    
+    return archived
+
+def adjust_unread_counts(deltas):
+    """
+    Add to users' unread notification counters in one UPDATE, as part of
+    the current transaction
+    
+    Args:
+        deltas: Mapping of user_id to the amount to add (may be negative)
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    
+    db.session.execute(
+        db.update(User)
+        .where(User.id.in_(deltas))
+        .values(unread_notification_count=User.unread_notification_count + db.case(deltas, value=User.id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+def push_notifications(payloads):
+    """
+    Send committed notifications to the real-time streams of connected
+    users, and drop their recipients' cached unread counts
+    """
+    cache.invalidate(*{unread_count_tag(payload['user_id']) for payload in payloads})
+    
+    for payload in payloads:
+        push_notification_to_stream(payload)
 
 def mark_notification_as_read(notification_id):
     """
     Mark a notification as read
+    
+    Only a notification that was still unread decrements its owner's
+    unread counter, so repeated calls can't drive it below the real count.
     """
     try:
         notification = Notification.query.get(notification_id)
-        if notification:
-            notification.read = True
-            db.session.commit()
-            return True
-        return False
+        if not notification:
+            return False
+        
+        user_id = notification.user_id
+        updated = Notification.query.filter_by(id=notification_id, read=False).update(
+            {'read': True}, synchronize_session=False
+        )
+        adjust_unread_counts({user_id: -updated})
+        db.session.commit()
+        
+        cache.invalidate(unread_count_tag(user_id))
+        return True
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error marking notification as read: {str(e)}")
         return False
 
-def push_notification_to_stream(notification):
+def mark_all_notifications_as_read(user_id):
     """
-    Push a notification to the user's SSE stream if they're connected
+    Mark all of a user's notifications as read
+    
+    Returns:
+        Number of notifications that were unread
     """
-    from app.routes.notifications import event_sources
+    updated = Notification.query.filter_by(user_id=user_id, read=False).update(
+        {'read': True}, synchronize_session=False
+    )
+    adjust_unread_counts({user_id: -updated})
+    db.session.commit()
     
-    user_id = notification.user_id
-    if user_id in event_sources:
-        try:
-            # Add the notification to the user's queue (non-async approach)
-            event_sources[user_id].put(notification.to_dict())
-        except Exception as e:
-            current_app.logger.error(f"Error pushing to notification stream: {str(e)}")
\ No newline at end of file
+    cache.invalidate(unread_count_tag(user_id))
+    return updated
+
+def reconcile_unread_counts():
+    """
+    Recompute unread notification counters from the notifications table
+    
+    Only users whose stored counter has drifted are updated, in a single
+    bulk UPDATE with a correlated count. Used to backfill the column on
+    existing databases and to repair drift.
+    
+    Returns:
+        Number of users whose counters were corrected
+    """
+    unread = db.select(db.func.count(Notification.id)).where(
+        Notification.user_id == User.id, Notification.read == False
+    ).scalar_subquery()
+    
+    drifted = [user_id for user_id, in db.session.query(User.id).filter(User.unread_notification_count != unread)]
+    if drifted:
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(drifted))
+            .values(unread_notification_count=unread)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    
+    cache.invalidate(*[unread_count_tag(user_id) for user_id in drifted])
+    return len(drifted)
+
+def push_notification_to_stream(payload):
+    """
+    Push a serialized notification to the user's live SSE connections,
+    in this and every other worker process
+    """
+    try:
+        notification_hub.publish(payload['user_id'], payload)
+    except Exception as e:
+        current_app.logger.error(f"Error pushing to notification stream: {str(e)}")
@@ -0,0 +1,220 @@
+import threading
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import OutboxEvent
+
+def enqueue_event(event_type, **payload):
+    """
+    Record a side effect to run after the current transaction commits
+    
+    The event is added to the session without committing, so it is
+    written atomically with the content that caused it; the dispatcher
+    picks it up once committed.
+    """
+    event = OutboxEvent(event_type=event_type, payload=payload)
+    db.session.add(event)
+    return event
+
+def dispatch_pending(batch_size=None):
+    """
+    Process one batch of pending outbox events
+    
+    The notifications for every event in the batch are inserted, and the
+    events marked processed, in a single transaction; real-time pushes are
+    sent after it commits. If the batch fails it is rolled back and its
+    events retried one at a time, so a single bad event can't hold up the
+    rest. Only events that fail on their own have their attempt counter
+    bumped, up to OUTBOX_MAX_ATTEMPTS.
+    
+    Emails don't go through the outbox: email_messages is their outbox.
+    enqueue_email adds a message to the caller's transaction, and the mail
+    queue workers drain it.
+    
+    Returns:
+        Number of events processed
+    """
+    from app.services.notification_service import push_notifications
+    
+    batch_size = batch_size or current_app.config.get('OUTBOX_BATCH_SIZE', 100)
+    max_attempts = current_app.config.get('OUTBOX_MAX_ATTEMPTS', 5)
+    
+    events = claim_events(max_attempts, batch_size)
+    if not events:
+        db.session.rollback()
+        return 0
+    
+    event_ids = [event.id for event in events]
+    
+    try:
+        notifications = process_events(events)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Error dispatching outbox events {event_ids}, retrying one at a time: {str(e)}")
+    else:
+        push_notifications(notifications)
+        return len(events)
+    
+    processed = 0
+    for event_id in event_ids:
+        # Re-claimed, as the rollback released the batch's row locks
+        events = claim_events(max_attempts, 1, event_id=event_id)
+        if not events:
+            db.session.rollback()
+            continue
+        
+        try:
+            notifications = process_events(events)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error dispatching outbox event {event_id}: {str(e)}")
+            OutboxEvent.query.filter(OutboxEvent.id == event_id).update(
+                {OutboxEvent.attempts: OutboxEvent.attempts + 1}, synchronize_session=False
+            )
+            db.session.commit()
+            continue
+        
+        push_notifications(notifications)
+        processed += 1
+    
+    return processed
+
+def claim_events(max_attempts, limit, event_id=None):
+    """Lock up to limit pending events, oldest first, skipping those other dispatchers hold"""
+    query = OutboxEvent.query.filter(
+        OutboxEvent.processed_at.is_(None),
+        OutboxEvent.attempts < max_attempts
+    )
+    if event_id is not None:
+        query = query.filter(OutboxEvent.id == event_id)
+    
+    return query.order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+
+def process_events(events):
+    """
+    Insert the notifications for a list of events and mark them processed,
+    without committing
+    
+    Returns:
+        Serialized notifications to push once the caller commits
+    """
+    from app.services.notification_service import add_notifications
+    
+    entries = []
+    for event_type, handler in EVENT_HANDLERS.items():
+        payloads = [event.payload for event in events if event.event_type == event_type]
+        if payloads:
+            entries.extend(handler(payloads))
+    
+    notifications = add_notifications(entries)
+    
+    OutboxEvent.query.filter(OutboxEvent.id.in_([event.id for event in events])).update(
+        {OutboxEvent.processed_at: datetime.utcnow()}, synchronize_session=False
+    )
+    return notifications
+
+def answer_created_notifications(payloads):
+    """
+    Notification entries for new answers: the question author, and any
+    users @mentioned in the answer
+    """
+    from app.models import Answer, Question
+    from app.services.answer_service import mention_notifications
+    from app.services.notification_service import group_key
+    
+    answer_ids = [payload['answer_id'] for payload in payloads]
+    rows = db.session.query(
+        Answer.id, Answer.user_id, Answer.content, Answer.question_id,
+        Question.user_id.label('question_author_id')
+    ).join(Question, Question.id == Answer.question_id).filter(Answer.id.in_(answer_ids)).order_by(Answer.id).all()
+    question_ids = {row.id: row.question_id for row in rows}
+    
+    entries = [
+        (row.question_author_id, 'answer', row.id)
+        for row in rows if row.question_author_id != row.user_id
+    ]
+    entries.extend(mention_notifications([(row.id, row.user_id, row.content) for row in rows]))
+    
+    # Answers and mentions on the same question coalesce per recipient
+    return [
+        (user_id, notification_type, answer_id, group_key(notification_type, question_ids[answer_id]))
+        for user_id, notification_type, answer_id in entries
+    ]
+
+def comment_created_notifications(payloads):
+    """
+    Notification entries for new comments: the author of the answer,
+    coalesced per answer
+    """
+    from app.models import Answer, Comment
+    from app.services.notification_service import group_key
+    
+    comment_ids = [payload['comment_id'] for payload in payloads]
+    rows = db.session.query(
+        Comment.id, Comment.user_id, Comment.answer_id, Answer.user_id.label('answer_author_id')
+    ).join(Answer, Answer.id == Comment.answer_id).filter(Comment.id.in_(comment_ids)).order_by(Comment.id).all()
+    
+    return [
+        (row.answer_author_id, 'comment', row.id, group_key('comment', row.answer_id))
+        for row in rows if row.answer_author_id != row.user_id
+    ]
+
+# Event type -> function turning a batch of payloads into notification entries
+EVENT_HANDLERS = {
+    'answer_created': answer_created_notifications,
+    'comment_created': comment_created_notifications,
+}
+
+class OutboxDispatcher:
+    """
+    Background thread draining the outbox
+    
+    Writers call wake() after committing so events are usually handled
+    within moments; the thread also polls every OUTBOX_POLL_INTERVAL
+    seconds to pick up events left by other processes or earlier failures.
+    The thread is started lazily, from the first wake() in a process, so it
+    lives in the worker processes rather than a pre-fork parent.
+    """
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.interval = 5
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('OUTBOX_DISPATCHER_ENABLED', True)
+        self.interval = app.config.get('OUTBOX_POLL_INTERVAL', 5)
+    
+    def wake(self):
+        """Signal that new events were committed"""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        self._wakeup.set()
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            
+            with self.app.app_context():
+                try:
+                    batch_size = self.app.config.get('OUTBOX_BATCH_SIZE', 100)
+                    while dispatch_pending(batch_size) == batch_size:
+                        pass
+                except Exception as e:
+                    self.app.logger.error(f"Outbox dispatcher error: {str(e)}")
+
+# Shared instance, configured by create_app()
+outbox_dispatcher = OutboxDispatcher()
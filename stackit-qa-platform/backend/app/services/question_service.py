@@ -1,6 +1,22 @@
 from app import db
-from app.models import Question, Tag
+from app.models import Question, Answer, Tag
 from sqlalchemy import or_
+from app.utils.loaders import load_view, load_fields
+from app.utils.pagination import paginate
+from app.utils.cache import invalidate_question
+from app.utils.helpers import process_content
+from app.services.search_service import search_enabled, build_match_query, ranked_matches
+from app.services.tag_service import adjust_tag_counts, tag_suggestions
+
+# Listing orders and the column each pages by, highest first: every one
+# is served by an index on that column (idx_questions_unanswered covers
+# the answer_count filter too)
+QUESTION_SORTS = {
+    'newest': Question.created_at,
+    'active': Question.last_activity_at,
+    'votes': Question.score,
+    'unanswered': Question.created_at,
+}
 
 class QuestionService:
     """
@@ -8,57 +24,81 @@ class QuestionService:
     """
     
     @staticmethod
-    def get_questions(page=1, per_page=10, tag=None, search=None):
+    def get_questions(page=None, per_page=10, tag=None, search=None, cursor=None, include_total=False, fields=None,
+                      sort='newest'):
         """
         Get questions with optional filtering by tag and search terms
+        
+        Pages by cursor unless a page number is given, see
+        app.utils.pagination.paginate. sort is a key of QUESTION_SORTS.
+        Searches use the full-text index when available and are then
+        ordered by relevance, paged by number. fields is a sparse fieldset
+        from app.utils.loaders.get_fields_arg.
         """
-        query = Question.query
+        keyset_column = QUESTION_SORTS[sort]
+        query = load_fields(Question.query, 'question_list', fields, keyset_column=keyset_column)
+        
+        if sort == 'unanswered':
+            query = query.filter(Question.answer_count == 0)
         
         # Filter by tag if provided
         if tag:
             query = query.join(Question.tags).filter(Tag.name == tag)
         
         # Filter by search terms if provided
+        order_by = None
         if search:
-            search_terms = f"%{search}%"
-            query = query.filter(
-                or_(
-                    Question.title.ilike(search_terms),
-                    Question.description.ilike(search_terms)
+            if search_enabled():
+                match = build_match_query(search)
+                if match is None:
+                    query = query.filter(db.false())
+                else:
+                    # Best BM25 matches first
+                    ranked = ranked_matches(match)
+                    query = query.join(ranked, ranked.c.question_id == Question.id)
+                    order_by = (ranked.c.rank, Question.id.desc())
+            else:
+                search_terms = f"%{search}%"
+                query = query.filter(
+                    or_(
+                        Question.title.ilike(search_terms),
+                        Question.body_text.ilike(search_terms)
+                    )
                 )
-            )
-        
-        # Order by most recent
-        query = query.order_by(Question.created_at.desc())
         
-        # Paginate results
-        questions_page = query.paginate(page=page, per_page=per_page)
+        # Most recent first, unless ranked by relevance
+        result = paginate(query, Question, per_page, page=page, cursor=cursor,
+                          include_total=include_total, order_by=order_by, keyset_column=keyset_column)
+        result['questions'] = [q.to_dict(include_description=False, fields=fields) for q in result.pop('items')]
         
-        return {
-            'questions': [q.to_dict() for q in questions_page.items],
-            'total': questions_page.total,
-            'page': page,
-            'per_page': per_page,
-            'pages': questions_page.pages
-        }
+        return result
 
     @staticmethod
     def get_question_by_id(question_id):
         """
-        Get a specific question by its ID
+        Get a specific question by its ID, with its answers loaded
         """
-        return Question.query.get(question_id)
+        return load_view(Question.query, 'question_detail').filter(
+            Question.id == question_id
+        ).first()
 
     @staticmethod
     def create_question(user_id, title, description, tags=None):
         """
         Create a new question with optional tags
+        
+        The description is sanitized here, and its plain text and excerpt
+        stored alongside it.
         """
+        html, body_text, excerpt = process_content(description)
+        
         # Create new question
         question = Question(
             user_id=user_id,
             title=title,
-            description=description
+            description=html,
+            body_text=body_text,
+            excerpt=excerpt
         )
         db.session.add(question)
         
@@ -71,6 +111,98 @@ class QuestionService:
                     tag = Tag(name=tag_name)
                     db.session.add(tag)
                 question.tags.append(tag)
+            
+            db.session.flush()
+            adjust_tag_counts([tag.id for tag in question.tags], 1)
+        
+        db.session.commit()
         
+        tag_names = [tag.name for tag in question.tags]
+        tag_suggestions.adjust(tag_names, 1)
+        invalidate_question(question.id, tag_names=tag_names)
+        return question
+    
+    @staticmethod
+    def delete_question(question):
+        """
+        Delete a question, taking it out of its tags' question counts
+        
+        Returns:
+            Names of the question's tags, whose listings it leaves
+        """
+        tag_names = [tag.name for tag in question.tags]
+        adjust_tag_counts([tag.id for tag in question.tags], -1)
+        db.session.delete(question)
         db.session.commit()
-        return question
\ No newline at end of file
+        
+        tag_suggestions.adjust(tag_names, -1)
+        return tag_names
+
+def rebuild_question_text(chunk_size=500):
+    """
+    Recompute the sanitized description, plain text and excerpt of every
+    question, in chunks of chunk_size rows each committed on its own
+    
+    Returns:
+        Number of questions updated
+    """
+    table = Question.__table__
+    statement = (
+        table.update()
+        .where(table.c.id == db.bindparam('question_id'))
+        .values(
+            description=db.bindparam('html'),
+            body_text=db.bindparam('text'),
+            excerpt=db.bindparam('summary'),
+            # Not an edit, so leave the modification time alone
+            updated_at=table.c.updated_at
+        )
+    )
+    
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Question.id, Question.description).filter(
+            Question.id > last_id
+        ).order_by(Question.id).limit(chunk_size).all()
+        if not rows:
+            break
+        
+        values = []
+        for question_id, description in rows:
+            html, body_text, excerpt = process_content(description)
+            values.append({'question_id': question_id, 'html': html, 'text': body_text, 'summary': excerpt})
+        db.session.execute(statement, values)
+        db.session.commit()
+        
+        updated += len(rows)
+        last_id = rows[-1][0]
+    
+    return updated
+
+def reconcile_question_stats():
+    """
+    Recompute every question's answer_count and score from its answers
+    
+    Runs as a single bulk UPDATE with correlated aggregates and only
+    touches questions whose stored values have drifted.
+    
+    Returns:
+        Number of questions whose columns were corrected
+    """
+    answer_count = db.select(db.func.count(Answer.id)).where(
+        Answer.question_id == Question.id
+    ).scalar_subquery()
+    score = db.select(db.func.coalesce(db.func.sum(Answer.score), 0)).where(
+        Answer.question_id == Question.id
+    ).scalar_subquery()
+    
+    result = db.session.execute(
+        db.update(Question)
+        .where(db.or_(Question.answer_count != answer_count, Question.score != score))
+        .values(answer_count=answer_count, score=score, updated_at=Question.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return result.rowcount
\ No newline at end of file
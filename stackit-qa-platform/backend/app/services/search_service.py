@@ -0,0 +1,133 @@
+import re
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from app import db
+
+# SQLite FTS5 index over question titles and the plain text of their
+# descriptions (body_text, so markup isn't searchable). It is an
+# external-content table, so it stores only the index and reads the text
+# back from `questions`; triggers keep it in sync on insert/update/delete.
+FTS_TABLE = 'questions_fts'
+
+# Title matches weigh more than description matches in BM25 ranking
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body_text,
+        content='questions', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body_text)
+        VALUES (new.id, new.title, new.body_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body_text)
+        VALUES ('delete', old.id, old.title, old.body_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, body_text ON questions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body_text)
+        VALUES ('delete', old.id, old.title, old.body_text);
+        INSERT INTO {FTS_TABLE}(rowid, title, body_text)
+        VALUES (new.id, new.title, new.body_text);
+    END""",
+]
+
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+TERM_PATTERN = re.compile(r'\w+\*?')
+
+def init_search_index(app):
+    """
+    Create the full-text index and its sync triggers if they don't exist
+    
+    Only SQLite with FTS5 is supported; on other databases (or SQLite builds
+    without FTS5) searching falls back to substring matching. A newly created
+    index is populated from the existing questions. An index built over
+    the HTML description by an earlier version is replaced.
+    """
+    app.extensions['question_search'] = False
+    
+    if db.engine.dialect.name != 'sqlite':
+        return
+    
+    try:
+        exists = db.session.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first()
+        
+        if exists and 'body_text' not in {
+            row[1] for row in db.session.execute(db.text(f"PRAGMA table_info({FTS_TABLE})"))
+        }:
+            for suffix in ('ai', 'ad', 'au'):
+                db.session.execute(db.text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"))
+            db.session.execute(db.text(f"DROP TABLE {FTS_TABLE}"))
+            exists = None
+        
+        if not exists:
+            for statement in FTS_SCHEMA:
+                db.session.execute(db.text(statement))
+            rebuild_search_index()
+        else:
+            # Triggers are dropped along with the questions table
+            for statement in FTS_SCHEMA[1:]:
+                db.session.execute(db.text(statement))
+            db.session.commit()
+        
+        app.extensions['question_search'] = True
+    except OperationalError as e:
+        db.session.rollback()
+        app.logger.warning(f"Full-text search unavailable, using substring search: {str(e)}")
+
+def search_enabled():
+    """Whether the full-text index is available for the current app"""
+    return current_app.extensions.get('question_search', False)
+
+def rebuild_search_index():
+    """
+    Rebuild the full-text index from the titles and body_text of the
+    questions table
+    """
+    db.session.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    db.session.commit()
+
+def build_match_query(search):
+    """
+    Translate user search input into an FTS5 MATCH expression
+    
+    "quoted text" becomes a phrase query and a trailing * a prefix query;
+    all terms must match. Every term is quoted so FTS5 operators and
+    punctuation in the input are treated as plain text.
+    
+    Returns:
+        str: The MATCH expression, or None if the input has no terms
+    """
+    terms = []
+    
+    for phrase in PHRASE_PATTERN.findall(search):
+        words = TERM_PATTERN.findall(phrase.replace('*', ' '))
+        if words:
+            terms.append('"' + ' '.join(words) + '"')
+    
+    for word in TERM_PATTERN.findall(PHRASE_PATTERN.sub(' ', search)):
+        if word.endswith('*'):
+            terms.append(f'"{word[:-1]}"*')
+        else:
+            terms.append(f'"{word}"')
+    
+    return ' '.join(terms) or None
+
+def ranked_matches(match):
+    """
+    Subquery of (question_id, rank) for questions matching an FTS5 expression
+    
+    Lower rank is a better match (FTS5 bm25() returns negated scores).
+    """
+    fts = db.literal_column(FTS_TABLE)
+    
+    return db.select(
+        db.literal_column('rowid').label('question_id'),
+        db.func.bm25(fts, TITLE_WEIGHT, BODY_WEIGHT).label('rank')
+    ).select_from(db.table(FTS_TABLE)).where(fts.match(match)).subquery()
@@ -0,0 +1,207 @@
+import bisect
+import heapq
+import threading
+import time
+from app import db
+from app.models import Tag
+from app.models.tag import question_tags
+
+def adjust_tag_counts(tag_ids, delta):
+    """
+    Add delta to the question_count of each of the given tags, in one
+    UPDATE as part of the caller's transaction
+    """
+    if not tag_ids:
+        return
+    
+    db.session.execute(
+        db.update(Tag)
+        .where(Tag.id.in_(tag_ids))
+        .values(question_count=Tag.question_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+def question_tag_names(question_id):
+    """
+    Names of a question's tags, for invalidating the listings it appears in
+    """
+    return [name for (name,) in db.session.query(Tag.name)
+            .join(question_tags, question_tags.c.tag_id == Tag.id)
+            .filter(question_tags.c.question_id == question_id)]
+
+def get_popular_tags(limit=10):
+    """
+    The tags with the most questions, read off idx_tags_question_count
+    """
+    return Tag.query.order_by(Tag.question_count.desc(), Tag.id.desc()).limit(limit).all()
+
+def reconcile_tag_counts():
+    """
+    Recompute every tag's question_count from question_tags
+    
+    Runs as a single bulk UPDATE with a correlated count and only touches
+    tags whose stored count has drifted, e.g. after questions were removed
+    along with their author.
+    
+    Returns:
+        Number of tags whose count was corrected
+    """
+    question_count = db.select(db.func.count(question_tags.c.question_id)).where(
+        question_tags.c.tag_id == Tag.id
+    ).scalar_subquery()
+    
+    result = db.session.execute(
+        db.update(Tag)
+        .where(Tag.question_count != question_count)
+        .values(question_count=question_count)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return result.rowcount
+
+# Prefixes up to this long have their suggestions ranked ahead of time;
+# longer ones match few enough names to rank them on each lookup
+SHORT_PREFIX = 3
+
+class TagSuggestIndex:
+    """
+    Per-process prefix index of tag names for autocomplete
+    
+    Names are kept in a sorted array, lowercased for matching, so the tags
+    under a prefix are one contiguous slice found by bisection. The slices
+    of prefixes up to SHORT_PREFIX characters are the long ones, so their
+    best few tags are ranked ahead of time. The index loads from the tags
+    table on first use and follows this process's own question writes;
+    it reloads every refresh_interval seconds to pick up other workers'.
+    Only one request runs a reload; the rest keep being answered from the
+    current arrays until it swaps the new ones in.
+    """
+    def __init__(self):
+        self.max_results = 10
+        self.refresh_interval = 300
+        self.lookups = 0
+        self.loads = 0
+        self._keys = None
+        self._counts = {}
+        self._top = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.max_results = app.config.get('TAG_SUGGEST_MAX_RESULTS', 10)
+        self.refresh_interval = app.config.get('TAG_SUGGEST_REFRESH_INTERVAL', 300)
+        self.lookups = 0
+        self.loads = 0
+        with self._lock:
+            self._keys = None
+            self._counts = {}
+            self._top = {}
+            self._loaded_at = None
+    
+    def suggest(self, prefix, limit=None):
+        """
+        The most used tags whose names start with prefix, ignoring case
+        
+        Returns:
+            List of {'name', 'question_count'} dicts, most used first
+        """
+        limit = min(limit, self.max_results) if limit and limit > 0 else self.max_results
+        prefix = prefix.lower()
+        self._ensure_loaded()
+        
+        with self._lock:
+            self.lookups += 1
+            if len(prefix) <= SHORT_PREFIX:
+                keys = self._top.get(prefix, ())
+            else:
+                lo = bisect.bisect_left(self._keys, (prefix,))
+                hi = bisect.bisect_left(self._keys, (prefix + '\U0010ffff',))
+                keys = self._rank(self._keys[lo:hi])
+            return [{'name': name, 'question_count': self._counts[name]} for _, name in keys[:limit]]
+    
+    def adjust(self, tag_names, delta):
+        """
+        Add delta to the given tags' counts, adding tags not seen before
+        
+        Called once the question write has committed. Does nothing until
+        the index has been loaded, as loading reads the new counts anyway.
+        """
+        with self._lock:
+            if self._keys is None:
+                return
+            
+            for name in tag_names:
+                key = (name.lower(), name)
+                if name not in self._counts:
+                    bisect.insort(self._keys, key)
+                    self._counts[name] = 0
+                self._counts[name] = max(self._counts[name] + delta, 0)
+                
+                for length in range(min(len(name), SHORT_PREFIX) + 1):
+                    prefix = key[0][:length]
+                    top = self._top.get(prefix, ())
+                    if delta < 0 and key in top and len(top) == self.max_results:
+                        # Something outside the list may now outrank it
+                        lo = bisect.bisect_left(self._keys, (prefix,))
+                        hi = bisect.bisect_left(self._keys, (prefix + '\U0010ffff',))
+                        self._top[prefix] = self._rank(self._keys[lo:hi])
+                    else:
+                        self._top[prefix] = self._rank(set(top) | {key})
+    
+    def _is_fresh(self):
+        return self._keys is not None and (
+            not self.refresh_interval or time.monotonic() - self._loaded_at < self.refresh_interval
+        )
+    
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        
+        # A stale index still answers while another request reloads it;
+        # only the first load has nothing to serve and waits
+        if not self._reload_lock.acquire(blocking=self._keys is None):
+            return
+        try:
+            if not self._is_fresh():
+                self._load()
+        finally:
+            self._reload_lock.release()
+    
+    def _load(self):
+        now = time.monotonic()
+        counts = dict(db.session.query(Tag.name, Tag.question_count))
+        keys = sorted((name.lower(), name) for name in counts)
+        matches = {}
+        for key in keys:
+            for length in range(min(len(key[0]), SHORT_PREFIX) + 1):
+                matches.setdefault(key[0][:length], []).append(key)
+        
+        with self._lock:
+            self._counts = counts
+            self._keys = keys
+            self._top = {prefix: self._rank(prefix_keys) for prefix, prefix_keys in matches.items()}
+            self._loaded_at = now
+            self.loads += 1
+    
+    def _rank(self, keys):
+        return tuple(heapq.nsmallest(
+            self.max_results, keys, key=lambda key: (-self._counts[key[1]], key)
+        ))
+    
+    def stats(self):
+        """Size and usage counters for this process's index"""
+        with self._lock:
+            loaded = self._keys is not None
+            return {
+                'loaded': loaded,
+                'tags': len(self._keys) if loaded else 0,
+                'ranked_prefixes': len(self._top),
+                'age': round(time.monotonic() - self._loaded_at, 1) if loaded else None,
+                'loads': self.loads,
+                'lookups': self.lookups
+            }
+
+# Shared instance, configured by create_app()
+tag_suggestions = TagSuggestIndex()
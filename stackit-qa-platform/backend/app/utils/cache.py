@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+class MemoryBackend:
+    """
+    In-process LRU cache with per-entry expiry
+    
+    Entries are evicted least-recently-used once max_entries is reached;
+    expired entries are dropped when read.
+    """
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def get_versions(self, names):
+        with self._lock:
+            return [self._versions.get(name, 0) for name in names]
+    
+    def bump_version(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+    
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """
+    Shared cache in Redis, so every worker process sees the same entries
+    and invalidations. Requires the optional `redis` package.
+    """
+    def __init__(self, url, prefix='stackit:cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' requires the redis package")
+        
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+    
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+    
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+    
+    def get_versions(self, names):
+        values = self.client.mget([self.prefix + 'version:' + name for name in names])
+        return [int(value or 0) for value in values]
+    
+    def bump_version(self, name):
+        self.client.incr(self.prefix + 'version:' + name)
+    
+    def size(self):
+        return None
+
+class NullBackend:
+    """Backend that stores nothing, used to disable caching"""
+    evictions = 0
+    
+    def get(self, key):
+        return None
+    
+    def set(self, key, value, ttl):
+        pass
+    
+    def get_versions(self, names):
+        return [0] * len(names)
+    
+    def bump_version(self, name):
+        pass
+    
+    def size(self):
+        return 0
+
+class ResponseCache:
+    """
+    Cache for serialized responses of public read endpoints
+    
+    Every entry is filed under one or more invalidation tags (e.g. a
+    question id). Each tag has a version number that is folded into the
+    entry's key, so invalidating a tag is a single version bump and the
+    stale entries simply age out of the backend.
+    """
+    def __init__(self):
+        self.backend = NullBackend()
+        self.default_ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 2048))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = NullBackend()
+        
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(namespace, **params):
+        """
+        Build a cache key from normalized request parameters
+        
+        None values are dropped and the rest sorted, so equivalent
+        requests share an entry regardless of argument order.
+        """
+        params = sorted((name, value) for name, value in params.items() if value is not None)
+        return f"{namespace}?{urlencode(params)}"
+    
+    def get_or_set(self, key, producer, tags=(), ttl=None):
+        """
+        Return the cached value for key, or compute, store and return it
+        
+        Args:
+            key: Cache key from make_key
+            producer: Callable computing the value on a miss; a None result
+                is returned but not cached
+            tags: Invalidation tags the entry depends on
+            ttl: Lifetime in seconds (defaults to CACHE_DEFAULT_TTL)
+        """
+        tags = sorted(tags)
+        versions = self.backend.get_versions(tags)
+        versioned_key = key + '#' + ','.join(f"{tag}:{version}" for tag, version in zip(tags, versions))
+        
+        value = self.backend.get(versioned_key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None:
+            return value
+        
+        value = producer()
+        if value is not None:
+            self.backend.set(versioned_key, value, ttl or self.default_ttl)
+        return value
+    
+    def invalidate(self, *tags):
+        """Invalidate every entry filed under any of the given tags"""
+        for tag in set(tags):
+            self.backend.bump_version(tag)
+    
+    def stats(self):
+        """Hit, miss and eviction counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.backend.evictions,
+            'entries': self.backend.size()
+        }
+
+# Shared instance, configured by create_app()
+cache = ResponseCache()
+
+# Invalidation tags used by the question endpoints
+QUESTION_LISTINGS = 'questions'
+
+def question_tag(question_id):
+    """Tag for cached data derived from a single question"""
+    return f'question:{question_id}'
+
+def tag_listing_tag(tag_name):
+    """Tag for cached listings filtered by a question tag"""
+    return f'tag:{tag_name}'
+
+def unread_count_tag(user_id):
+    """Tag for a user's cached unread notification count"""
+    return f'unread:{user_id}'
+
+def user_principal_tag(user_id):
+    """Tag whose version changes when a user's role or ban status does"""
+    return f'principal:{user_id}'
+
+def invalidate_question(question_id, tag_names=None):
+    """
+    Invalidate a question's cached detail view
+    
+    Pass tag_names when the change also affects listings (the question
+    was created or removed, or an answer to it was posted, removed or
+    accepted): unfiltered listings and the listings of each of its tags
+    are then invalidated too.
+    """
+    tags = [question_tag(question_id)]
+    if tag_names is not None:
+        tags.append(QUESTION_LISTINGS)
+        tags.extend(tag_listing_tag(name) for name in tag_names)
+    cache.invalidate(*tags)
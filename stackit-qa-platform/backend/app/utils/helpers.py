@@ -1,37 +1,57 @@
-import bleach
 import re
+import threading
+from bleach.sanitizer import Cleaner
 from html.parser import HTMLParser
 
+ALLOWED_TAGS = [
+    'b', 'i', 's', 'u', 'em', 'strong', 'p', 'br', 'hr',
+    'ul', 'ol', 'li', 'a', 'img', 'blockquote', 'code', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'span'
+]
+
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title', 'target'],
+    'img': ['src', 'alt', 'width', 'height'],
+    'div': ['class', 'align'],
+    'span': ['class', 'style'],
+    'p': ['align'],
+    'code': ['class'],
+    'pre': ['class']
+}
+
+# Length of the plain-text excerpt shown in listings
+EXCERPT_LENGTH = 200
+
+# Building a bleach Cleaner sets up its parser, tokenizer and serializer,
+# so one is built per thread and reused (a Cleaner is not thread-safe)
+_cleaners = threading.local()
+
+def get_cleaner():
+    cleaner = getattr(_cleaners, 'cleaner', None)
+    if cleaner is None:
+        cleaner = Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+        _cleaners.cleaner = cleaner
+    return cleaner
+
 def sanitize_html(content):
     """
     Sanitize HTML content to prevent XSS attacks while preserving
     allowed formatting elements for the rich text editor
     """
-    allowed_tags = [
-        'b', 'i', 's', 'u', 'em', 'strong', 'p', 'br', 'hr',
-        'ul', 'ol', 'li', 'a', 'img', 'blockquote', 'code', 'pre',
-        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'span'
-    ]
-    
-    allowed_attributes = {
-        'a': ['href', 'title', 'target'],
-        'img': ['src', 'alt', 'width', 'height'],
-        'div': ['class', 'align'],
-        'span': ['class', 'style'],
-        'p': ['align'],
-        'code': ['class'],
-        'pre': ['class']
-    }
+    return get_cleaner().clean(content)
+
+def process_content(content, excerpt_length=EXCERPT_LENGTH):
+    """
+    Prepare user-submitted rich text for storage
     
-    # Sanitize the HTML content
-    cleaned_content = bleach.clean(
-        content,
-        tags=allowed_tags,
-        attributes=allowed_attributes,
-        strip=True
-    )
+    Run once when content is written, so reads never sanitize or strip.
     
-    return cleaned_content
+    Returns:
+        Tuple of (sanitized HTML, plain text, excerpt)
+    """
+    html = sanitize_html(content)
+    text = ' '.join(strip_html(html).split())
+    return html, text, truncate_text(text, excerpt_length)
 
 def extract_mentions(content):
     """
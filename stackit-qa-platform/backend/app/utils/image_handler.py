@@ -1,12 +1,39 @@
+import hashlib
 import os
+import tempfile
+import threading
+import time
 import uuid
-from werkzeug.utils import secure_filename
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, TooManyRequests
+from PIL import Image, ImageOps
 from flask import current_app
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
+# Formats Pillow may identify an upload as, and the extension it is saved with
+ALLOWED_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif'}
+
+# Pillow reports JPEGs carrying multi-picture (MPF) data, as many phone
+# cameras write them, as MPO; they are accepted and stored as JPEGs
+FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+# Bytes read from the upload stream at a time
+CHUNK_SIZE = 64 * 1024
+
+class InvalidImage(BadRequest):
+    """Raised when an upload is not an acceptable image"""
+    description = "Invalid image"
+
+class ImageTooLarge(RequestEntityTooLarge):
+    """Raised when an upload exceeds the size limit"""
+    description = f"File too large. Maximum size: {MAX_FILE_SIZE // 1024 // 1024}MB"
+
+class ImageProcessorBusy(TooManyRequests):
+    """Raised when too many images are already waiting to be processed"""
+    description = "Too many image uploads in progress, please retry shortly"
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -16,9 +43,12 @@ def validate_image(file):
     """
     Validate an uploaded image file
     
+    Only the name is checked here; the size limit is enforced while the
+    upload is read, since content_length is supplied by the client.
+    
     Args:
         file: File object from request.files
-        
+    
     Returns:
         dict: Empty if valid, or containing error message
     """
@@ -28,75 +58,476 @@ def validate_image(file):
     if not allowed_file(file.filename):
         return {"error": f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"}
     
-    if file.content_length and file.content_length > MAX_FILE_SIZE:
-        return {"error": f"File too large. Maximum size: {MAX_FILE_SIZE // 1024 // 1024}MB"}
-    
     return {}
 
-def save_image(file, subfolder="uploads"):
+def receive_upload(file, directory, max_size):
     """
-    Save an uploaded image with a unique filename
+    Copy an upload to a temporary file in directory, chunk by chunk,
+    hashing it on the way
+    
+    Raises:
+        ImageTooLarge: as soon as more than max_size bytes have been read
+    
+    Returns:
+        tuple: Path of the temporary file, SHA-256 hex digest of its bytes
+    """
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+    digest = hashlib.sha256()
+    received = 0
+    
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > max_size:
+                    raise ImageTooLarge(f"File too large. Maximum size: {max_size // 1024 // 1024}MB")
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    
+    return temp_path, digest.hexdigest()
+
+def inspect_image(path, max_pixels):
+    """
+    Identify an image from its header, without decoding it
+    
+    Raises:
+        InvalidImage: if it isn't a JPEG, PNG or GIF, or its dimensions
+            exceed max_pixels (a decompression bomb)
+    
+    Returns:
+        str: Pillow format name
+    """
+    try:
+        with Image.open(path) as img:
+            image_format = FORMAT_ALIASES.get(img.format, img.format)
+            width, height = img.size
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise InvalidImage("File is not a readable image")
+    
+    if image_format not in ALLOWED_FORMATS:
+        raise InvalidImage(f"Unsupported image format: {image_format}")
+    
+    if width * height > max_pixels:
+        raise InvalidImage("Image dimensions are too large")
+    
+    return image_format
+
+def blob_path(upload_folder, digest, extension):
+    """Location of a stored image, fanned out over two directory levels"""
+    return os.path.join(upload_folder, 'blobs', digest[:2], digest[2:4], digest + extension)
+
+def find_blob(upload_folder, digest):
+    """
+    Path of the stored image with the given content address, or None
+    
+    Returns:
+        tuple: (path, Pillow format name), or (None, None)
+    """
+    for image_format, extension in ALLOWED_FORMATS.items():
+        path = blob_path(upload_folder, digest, extension)
+        if os.path.exists(path):
+            return path, image_format
+    return None, None
+
+def image_url(digest, rendition=None):
+    """URL the images blueprint serves a stored image or rendition at"""
+    return f"/api/images/{digest}/{rendition}" if rendition else f"/api/images/{digest}"
+
+def save_image(file):
+    """
+    Save an uploaded image under the address of its content
+    
+    The upload is streamed to disk under the size limit and hashed as it
+    is read. An image that was uploaded before is not stored again.
+    Otherwise its header is checked here and decoding, downscaling and
+    re-encoding run on the image worker pool; the stored image is moved
+    into place atomically once ready.
     
     Args:
         file: File object from request.files
-        subfolder: Directory within UPLOAD_FOLDER to save the file
-        
+    
+    Raises:
+        InvalidImage, ImageTooLarge, ImageProcessorBusy
+    
     Returns:
-        str: Path to the saved file (relative to static directory)
+        str: URL of the stored image
     """
+    errors = validate_image(file)
+    if errors:
+        raise InvalidImage(errors['error'])
+    
+    config = current_app.config
+    upload_folder = config['UPLOAD_FOLDER']
+    
+    # Uploads are received next to the blobs so the final rename stays on one filesystem
+    incoming_dir = os.path.join(upload_folder, 'incoming')
+    os.makedirs(incoming_dir, exist_ok=True)
+    
+    temp_path, digest = receive_upload(file, incoming_dir, config.get('IMAGE_MAX_UPLOAD_SIZE', MAX_FILE_SIZE))
+    
     try:
-        # Create a unique filename
-        filename = secure_filename(file.filename)
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{uuid.uuid4().hex}{ext}"
-        
-        # Ensure upload directory exists
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file path
-        file_path = os.path.join(upload_dir, unique_filename)
+        if find_blob(upload_folder, digest)[0] is not None:
+            os.unlink(temp_path)
+            return image_url(digest)
         
-        # Save the file
-        file.save(file_path)
+        image_format = inspect_image(temp_path, config.get('IMAGE_MAX_PIXELS', 40_000_000))
         
-        # Optimize image if it's not a GIF
-        if ext.lower() != '.gif':
-            optimize_image(file_path)
+        file_path = blob_path(upload_folder, digest, ALLOWED_FORMATS[image_format])
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
-        # Return the path relative to static directory
-        return os.path.join(subfolder, unique_filename)
+        if image_format == 'GIF':
+            # Kept as uploaded, so animations survive
+            os.replace(temp_path, file_path)
+        else:
+            image_processor.submit(process_upload, temp_path, file_path, config.get('IMAGE_MAX_WIDTH', 1200))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
     
-    except Exception as e:
-        current_app.logger.error(f"Image save error: {str(e)}")
-        return None
+    return image_url(digest)
 
-def optimize_image(file_path, max_width=1200):
+def process_upload(temp_path, file_path, max_width):
+    """Optimize a received upload into its final location, removing the temporary file"""
+    try:
+        optimize_image(temp_path, max_width, output_path=file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def optimize_image(file_path, max_width=1200, output_path=None, output_format=None):
     """
     Optimize an image by resizing and compressing
     
+    JPEGs are decoded in draft mode, which lets the decoder scale down by
+    up to 8x as it reads, so a large photo never exists in memory at full
+    resolution. The result is written next to its destination and renamed
+    into place.
+    
     Args:
         file_path: Path to the image file
         max_width: Maximum width to resize to
+        output_path: Where to write the result (defaults to file_path)
+        output_format: Pillow format to write (defaults to the input's)
     """
-    try:
-        img = Image.open(file_path)
+    output_path = output_path or file_path
+    
+    with Image.open(file_path) as img:
+        source_format = FORMAT_ALIASES.get(img.format, img.format)
+        image_format = output_format or source_format
+        
+        if img.width > max_width:
+            target = (max_width, max(int(img.height * max_width / img.width), 1))
+            if source_format == 'JPEG':
+                img.draft('RGB', target)
+        
+        # Apply the camera orientation before the metadata is dropped
+        img = ImageOps.exif_transpose(img)
         
         # Resize if width exceeds max_width
         if img.width > max_width:
             ratio = max_width / img.width
-            new_height = int(img.height * ratio)
-            img = img.resize((max_width, new_height), Image.LANCZOS)
+            new_height = max(int(img.height * ratio), 1)
+            img = img.resize((max_width, new_height), Image.LANCZOS, reducing_gap=2.0)
         
         # Save with optimized quality
-        img.save(file_path, optimize=True, quality=85)
+        partial_path = f"{output_path}.{uuid.uuid4().hex}.part"
+        img.save(partial_path, format=image_format, optimize=True, quality=85)
+    
+    os.replace(partial_path, output_path)
+
+class ImageProcessor:
+    """
+    Runs image processing on a bounded thread pool
+    
+    Pillow releases the GIL while decoding, resizing and encoding, so
+    threads give real parallelism here. At most workers + queue_depth
+    images may be queued or in progress; beyond that uploads are refused
+    with a 429 instead of piling up. With workers set to 0 processing runs
+    inline on the calling thread.
+    """
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self._executor = None
+        self._slots = None
+        self._executor_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+    
+    def init_app(self, app):
+        self.shutdown()
+        
+        self.app = app
+        self.workers = app.config.get('IMAGE_PROCESSING_WORKERS', 0)
+        queue_depth = app.config.get('IMAGE_PROCESSING_QUEUE_DEPTH', 16)
+        self._slots = threading.BoundedSemaphore(self.workers + queue_depth) if self.workers else None
+        self._reset_metrics()
+    
+    def shutdown(self):
+        """Stop the worker threads, if started, after the queued images"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+    
+    def submit(self, func, *args):
+        """
+        Run func(*args) on the pool, or inline when there are no workers
+        
+        Raises:
+            ImageProcessorBusy: if the queue is full
+        """
+        if self._slots is None:
+            self._run(func, *args)
+            return
+        
+        if not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self._rejected += 1
+            raise ImageProcessorBusy()
+        
+        try:
+            self._get_executor().submit(self._run_pooled, func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def stats(self):
+        """Processed, failed and rejected counts, and timings in milliseconds"""
+        with self._metrics_lock:
+            return {
+                'workers': self.workers,
+                'processed': self._processed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_ms': round(self._total / self._processed * 1000, 2) if self._processed else 0,
+                'max_ms': round(self._slowest * 1000, 2)
+            }
+    
+    def _reset_metrics(self):
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total = 0.0
+        self._slowest = 0.0
+    
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-processor')
+            return self._executor
+    
+    def _run_pooled(self, func, *args):
+        try:
+            self._run(func, *args)
+        finally:
+            self._slots.release()
+    
+    def _run(self, func, *args):
+        started = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            with self._metrics_lock:
+                self._failed += 1
+            if self.app is not None:
+                self.app.logger.error(f"Image processing error: {str(e)}")
+            return
+        
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self._processed += 1
+            self._total += elapsed
+            self._slowest = max(self._slowest, elapsed)
+
+# Shared instance, configured by create_app()
+image_processor = ImageProcessor()
+
+# Rendition name -> (maximum width, Pillow format or None to keep the original's)
+RENDITIONS = {
+    'thumb': (200, None),
+    'medium': (800, None),
+    'webp': (1200, 'WEBP'),
+}
+
+# Pillow format -> (file extension, MIME type) of renditions
+RENDITION_FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'PNG': ('.png', 'image/png'),
+    'GIF': ('.gif', 'image/gif'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+class RenditionCache:
+    """
+    Renditions of stored images, generated on first request and kept on
+    disk within a size quota
+    
+    Each rendition is generated once (concurrent requests for the same one
+    wait for a single generation) and its file's modification time is
+    bumped whenever it is served. A background thread sweeps the cache
+    directory every sweep_interval seconds, or sooner once this process
+    has added a tenth of the quota: it measures what every worker has
+    stored and, past max_bytes, deletes the least recently used
+    renditions. They are regenerated if asked for again. Stored originals
+    are never evicted.
+    """
+    def __init__(self):
+        self.app = None
+        self.directory = None
+        self.max_bytes = 0
+        self.sweep_interval = 60
+        self.generated = 0
+        self.evicted = 0
+        self.sweeps = 0
+        self._size = None
+        self._added_bytes = 0
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._generating = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+    
+    def init_app(self, app):
+        self.app = app
+        self.directory = os.path.join(app.config['UPLOAD_FOLDER'], 'renditions')
+        self.max_bytes = app.config.get('IMAGE_RENDITION_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        self.sweep_interval = app.config.get('IMAGE_RENDITION_SWEEP_INTERVAL', 60)
+        self.generated = 0
+        self.evicted = 0
+        self.sweeps = 0
+        self._size = None
+        self._added_bytes = 0
+    
+    def get(self, source_path, source_format, digest, name):
+        """
+        Path and MIME type of a rendition, generating it if needed
+        
+        Args:
+            source_path: Path of the stored original
+            source_format: Pillow format of the original
+            digest: Content address of the original
+            name: Rendition name, a key of RENDITIONS
+        """
+        max_width, output_format = RENDITIONS[name]
+        output_format = output_format or source_format
+        extension, mimetype = RENDITION_FORMATS[output_format]
+        path = os.path.join(self.directory, digest[:2], f"{digest}-{name}{extension}")
+        
+        if os.path.exists(path):
+            self._touch(path)
+            return path, mimetype
+        
+        with self._lock:
+            key_lock = self._generating.setdefault(path, threading.Lock())
+        
+        with key_lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                optimize_image(source_path, max_width, output_path=path, output_format=output_format)
+                self._added(path)
         
-    except Exception as e:
-        current_app.logger.error(f"Image optimization error: {str(e)}")
+        with self._lock:
+            self._generating.pop(path, None)
+        
+        return path, mimetype
+    
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+    
+    def _added(self, new_path):
+        with self._lock:
+            self.generated += 1
+            self._added_bytes += os.path.getsize(new_path)
+            due = self._added_bytes > self.max_bytes * 0.1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='rendition-sweeper', daemon=True)
+                self._thread.start()
+        
+        if due:
+            self._wakeup.set()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.sweep_interval)
+            self._wakeup.clear()
+            try:
+                self.sweep()
+            except Exception as e:
+                if self.app is not None:
+                    self.app.logger.error(f"Rendition cache sweep error: {str(e)}")
+    
+    def sweep(self):
+        """
+        Measure the renditions on disk and, past the quota, evict the least
+        recently used ones down to 90% of it
+        
+        Runs without holding the lock rendition requests take. A rendition
+        evicted just as it is looked up is regenerated by the route.
+        
+        Returns:
+            Number of renditions evicted
+        """
+        with self._sweep_lock:
+            files = sorted(self._files())
+            size = sum(file_size for _, file_size, _ in files)
+            evicted = 0
+            
+            if size > self.max_bytes:
+                target = self.max_bytes * 0.9
+                for _, file_size, path in files:
+                    if size <= target:
+                        break
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        continue
+                    size -= file_size
+                    evicted += 1
+            
+            with self._lock:
+                self._size = size
+                self._added_bytes = 0
+                self.evicted += evicted
+                self.sweeps += 1
+        
+        return evicted
+    
+    def stats(self):
+        return {
+            'generated': self.generated,
+            'evicted': self.evicted,
+            'sweeps': self.sweeps,
+            'bytes': self._size + self._added_bytes if self._size is not None else None,
+            'max_bytes': self.max_bytes
+        }
+
+# Shared instance, configured by create_app()
+rendition_cache = RenditionCache()
 
 # Add this function to fix the import error in questions.py
-def save_uploaded_image(file, subfolder="uploads"):
+def save_uploaded_image(file):
     """
     Alias for save_image function to maintain backward compatibility
     """
-    return save_image(file, subfolder)
\ No newline at end of file
+    return save_image(file)
@@ -0,0 +1,150 @@
+from flask import request, abort
+from sqlalchemy.orm import joinedload, selectinload, defer, load_only
+from app.models import User, Question, Answer
+
+# Relationships each serialized view touches, loaded up front so that
+# serializing a page costs a fixed number of queries regardless of its size.
+# Many-to-one relationships are joined into the main query; collections are
+# fetched with one extra SELECT ... IN per relationship.
+VIEWS = {
+    # Question.to_dict(include_description=False): author and tags, and
+    # the stored excerpt in place of the full body
+    'question_list': lambda: (
+        joinedload(Question.author),
+        selectinload(Question.tags),
+        defer(Question.description),
+        defer(Question.body_text),
+    ),
+    # Question.to_dict(include_answers=True): plus every answer and its author
+    'question_detail': lambda: (
+        joinedload(Question.author),
+        selectinload(Question.tags),
+        selectinload(Question.answers).joinedload(Answer.author),
+    ),
+    # Answer.to_dict(): author only, vote counts are stored on the row
+    'answer_list': lambda: (
+        joinedload(Answer.author),
+    ),
+    # User.to_dict(): columns only
+    'user_list': lambda: (),
+}
+
+def load_view(query, view):
+    """
+    Apply the eager-loading options declared for a serialized view
+    
+    Args:
+        query: Query to apply the loader options to
+        view: Name of the view in VIEWS
+        
+    Returns:
+        The query with loader options applied
+    """
+    return query.options(*VIEWS[view]())
+
+class Field:
+    """
+    A field a client can select with ?fields=: the columns serializing it
+    reads, and the loader for the relationship it needs, if any
+    """
+    def __init__(self, *columns, loader=None):
+        self.columns = columns
+        self.loader = loader
+
+# Sparse fieldsets for list endpoints, keyed like VIEWS. The keys are the
+# names to_dict() gives the fields.
+FIELDSETS = {
+    'question_list': {
+        'id': Field(Question.id),
+        'user_id': Field(Question.user_id),
+        'author': Field(Question.user_id, loader=lambda: joinedload(Question.author)),
+        'title': Field(Question.title),
+        'excerpt': Field(Question.excerpt),
+        'accepted_answer_id': Field(Question.accepted_answer_id),
+        'answer_count': Field(Question.answer_count),
+        'score': Field(Question.score),
+        'description': Field(Question.description),
+        'tags': Field(loader=lambda: selectinload(Question.tags)),
+        'created_at': Field(Question.created_at),
+        'updated_at': Field(Question.updated_at),
+        'last_activity_at': Field(Question.last_activity_at),
+    },
+    'answer_list': {
+        'id': Field(Answer.id),
+        'question_id': Field(Answer.question_id),
+        'user_id': Field(Answer.user_id),
+        'author': Field(Answer.user_id, loader=lambda: joinedload(Answer.author)),
+        'content': Field(Answer.content),
+        'accepted': Field(Answer.accepted),
+        'score': Field(Answer.score),
+        'upvotes': Field(Answer.upvotes),
+        'downvotes': Field(Answer.downvotes),
+        'created_at': Field(Answer.created_at),
+        'updated_at': Field(Answer.updated_at),
+    },
+    'user_list': {
+        'id': Field(User.id),
+        'username': Field(User.username),
+        'email': Field(User.email),
+        'role': Field(User.role),
+        'banned': Field(User.banned),
+        'created_at': Field(User.created_at),
+    },
+}
+
+def get_fields_arg(view):
+    """
+    Read a sparse fieldset from ?fields=a,b,c
+    
+    Args:
+        view: Name of the fieldset in FIELDSETS
+        
+    Returns:
+        List of field names, or None when no fieldset was asked for
+    """
+    value = request.args.get('fields')
+    if value is None:
+        return None
+    
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    if not fields:
+        abort(400, description="No fields requested")
+    
+    unknown = [name for name in fields if name not in FIELDSETS[view]]
+    if unknown:
+        abort(400, description=f"Unknown field(s): {', '.join(unknown)}")
+    
+    return fields
+
+def load_fields(query, view, fields, keyset_column=None):
+    """
+    Load only what a sparse fieldset serializes
+    
+    Columns no requested field reads are left out of the SELECT, and only
+    the requested fields' relationships are loaded. The id and created_at
+    columns (or keyset_column) are always loaded, as pagination orders and
+    seeks by them. Without a fieldset this is load_view().
+    
+    Args:
+        query: Query to apply the loader options to
+        view: Name of the view in FIELDSETS
+        fields: Field names from get_fields_arg, or None
+        keyset_column: Column pagination orders by, if not created_at
+        
+    Returns:
+        The query with loader options applied
+    """
+    if fields is None:
+        return load_view(query, view)
+    
+    fieldset = FIELDSETS[view]
+    columns = list(fieldset['id'].columns + fieldset['created_at'].columns)
+    if keyset_column is not None:
+        columns.append(keyset_column)
+    loaders = []
+    for name in fields:
+        columns.extend(fieldset[name].columns)
+        if fieldset[name].loader is not None:
+            loaders.append(fieldset[name].loader())
+    
+    return query.options(load_only(*dict.fromkeys(columns)), *loaders)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import queue
+import smtplib
+import threading
+import time
+
+class SMTPConnectionPool:
+    """
+    Reusable, authenticated SMTP sessions shared by the mail workers
+    
+    Connecting, STARTTLS and login cost several round trips, so sessions
+    are kept open between batches and handed out again. A session idle for
+    longer than max_idle seconds, or one returned as broken, is closed
+    instead of reused. At most size idle sessions are kept.
+    """
+    def __init__(self, host, port, use_tls=False, username=None, password=None,
+                 size=2, max_idle=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.opened = 0
+        self.reused = 0
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+    
+    def acquire(self, fresh=False):
+        """
+        Return an open session, reusing an idle one when possible, or a
+        newly opened one if fresh is set
+        """
+        while not fresh:
+            try:
+                connection, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            
+            if time.monotonic() - released_at <= self.max_idle:
+                with self._lock:
+                    self.reused += 1
+                return connection
+            self._close(connection)
+        
+        return self._connect()
+    
+    def release(self, connection, broken=False):
+        """Hand a session back; broken sessions are closed"""
+        if broken:
+            self._close(connection)
+            return
+        try:
+            self._idle.put_nowait((connection, time.monotonic()))
+        except queue.Full:
+            self._close(connection)
+    
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+    
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                connection.starttls()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            self._close(connection)
+            raise
+        
+        with self._lock:
+            self.opened += 1
+        return connection
+    
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+    
+    def stats(self):
+        return {
+            'opened': self.opened,
+            'reused': self.reused,
+            'idle': self._idle.qsize()
+        }
@@ -0,0 +1,141 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, abort, current_app
+from sqlalchemy import and_, or_
+
+def encode_cursor(column, value, item_id):
+    """
+    Encode a (sort value, id) position as an opaque URL-safe cursor
+    
+    The sort value is a datetime (such as created_at) or an integer, and
+    the name of the column it was read from is kept with it so a cursor
+    can't be used to seek along a different order.
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([column, value, item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Returns:
+        tuple: (sort column name, sort value, id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        column, value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(column, str):
+            raise ValueError("Invalid cursor")
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("Invalid cursor")
+        return column, value, int(item_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def get_pagination_args(default_per_page=None, max_per_page=None):
+    """
+    Read pagination parameters from the query string
+    
+    A request without a page number gets cursor (keyset) pagination: pass
+    the previous response's next_cursor as ?cursor= to fetch the next page.
+    ?page= keeps the legacy offset behaviour. Exact totals cost a COUNT, so
+    they are only computed when asked for with ?total=true.
+    
+    Returns:
+        dict: page, cursor, per_page and include_total
+    """
+    default_per_page = default_per_page or current_app.config.get('DEFAULT_PAGE_SIZE', 10)
+    max_per_page = max_per_page or current_app.config.get('MAX_PAGE_SIZE', 100)
+    
+    per_page = request.args.get('per_page', default_per_page, type=int)
+    cursor = request.args.get('cursor') or None
+    
+    # Reject tampered cursors up front rather than failing mid-query
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            abort(400, description="Invalid cursor")
+    
+    return {
+        'page': request.args.get('page', type=int),
+        'cursor': cursor,
+        'per_page': max(1, min(per_page, max_per_page)),
+        'include_total': request.args.get('total', 'false').lower() == 'true'
+    }
+
+def paginate(query, model, per_page, page=None, cursor=None, include_total=False, order_by=None,
+             keyset_column=None):
+    """
+    Paginate a query newest-first, by cursor or by page number
+    
+    Cursor pagination orders by (created_at, id) and seeks past the last
+    row of the previous page, so every page reads only per_page + 1 rows
+    off the (..., created_at) indexes no matter how deep it is. Another
+    indexed column can take created_at's place with keyset_column; a
+    cursor issued for one column is rejected with a 400 on another.
+    
+    Args:
+        query: Filtered query to paginate (without ordering)
+        model: Model with created_at and id columns
+        per_page: Page size
+        page: Page number for legacy offset pagination
+        cursor: Opaque cursor from a previous page's next_cursor
+        include_total: Whether to run a COUNT for the exact total
+        order_by: Explicit ordering (e.g. search relevance) to use instead
+            of newest-first; cursors don't apply, so this pages by number
+        keyset_column: Column to order by, highest first, in place of
+            created_at (e.g. a score); ties are broken by id
+        
+    Returns:
+        dict: items, per_page and next_cursor, plus total (and page/pages
+        in page mode) when counted
+    """
+    keyset_column = keyset_column if keyset_column is not None else model.created_at
+    
+    if order_by is not None:
+        page = page or 1
+    else:
+        order_by = (keyset_column.desc(), model.id.desc())
+    
+    if page is not None:
+        page_obj = query.order_by(*order_by)\
+            .paginate(page=page, per_page=per_page, error_out=False)
+        return {
+            'items': page_obj.items,
+            'total': page_obj.total,
+            'page': page,
+            'pages': page_obj.pages,
+            'per_page': per_page
+        }
+    
+    result = {'per_page': per_page}
+    
+    if include_total:
+        result['total'] = query.order_by(None).count()
+    
+    if cursor:
+        column, value, item_id = decode_cursor(cursor)
+        if column != keyset_column.key:
+            abort(400, description="Cursor is from a different sort order")
+        query = query.filter(or_(
+            keyset_column < value,
+            and_(keyset_column == value, model.id < item_id)
+        ))
+    
+    rows = query.order_by(*order_by).limit(per_page + 1).all()
+    items = rows[:per_page]
+    
+    result['items'] = items
+    result['next_cursor'] = encode_cursor(keyset_column.key, getattr(items[-1], keyset_column.key), items[-1].id) \
+        if len(rows) > per_page else None
+    
+    return result
@@ -0,0 +1,129 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.exceptions import TooManyRequests, ServiceUnavailable
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class PasswordHasherBusy(TooManyRequests):
+    """Raised when too many password hashes are already queued"""
+    description = "Too many sign-in requests in progress, please retry shortly"
+
+class PasswordHasherTimeout(ServiceUnavailable):
+    """Raised when a queued password hash doesn't finish within the timeout"""
+    description = "Sign-in is taking too long, please retry shortly"
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification on a bounded process pool
+    
+    PBKDF2 is deliberately CPU-heavy; running it in separate processes
+    keeps login bursts from occupying the request workers and the GIL.
+    At most workers + queue_depth calls may be in flight; beyond that
+    calls fail fast with a 429 instead of piling up. A call that times
+    out fails with a 503 but keeps its slot until the worker finishes.
+    With workers set to 0 hashing runs inline on the calling thread.
+    """
+    def __init__(self):
+        self.method = 'pbkdf2:sha256:600000'
+        self.workers = 0
+        self.timeout = None
+        self._hash_prefix = None
+        self._executor = None
+        self._slots = None
+        self._executor_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+    
+    def init_app(self, app):
+        self.shutdown()
+        
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self._hash_prefix = None
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT')
+        queue_depth = app.config.get('PASSWORD_HASH_QUEUE_DEPTH', 32)
+        self._slots = threading.BoundedSemaphore(self.workers + queue_depth) if self.workers else None
+        self._reset_metrics()
+    
+    def shutdown(self):
+        """Stop the worker processes, if started"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+    
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run('hash', generate_password_hash, password, self.method)
+    
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run('verify', check_password_hash, password_hash, password)
+    
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other parameters than the configured ones"""
+        if self._hash_prefix is None:
+            # Werkzeug stores the method with its defaults filled in (e.g.
+            # 'scrypt' as 'scrypt:32768:8:1'), so compare with a real hash
+            self._hash_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._hash_prefix
+    
+    def stats(self):
+        """Call counts and timings (in milliseconds) per operation"""
+        with self._metrics_lock:
+            stats = {'rejected': self._rejected, 'workers': self.workers}
+            for operation, (count, total, slowest) in self._timings.items():
+                stats[operation] = {
+                    'count': count,
+                    'avg_ms': round(total / count * 1000, 2) if count else 0,
+                    'max_ms': round(slowest * 1000, 2)
+                }
+            return stats
+    
+    def _reset_metrics(self):
+        self._rejected = 0
+        self._timings = {'hash': (0, 0.0, 0.0), 'verify': (0, 0.0, 0.0)}
+    
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # Spawned rather than forked: forking a threaded web worker
+                # can copy held locks into the children
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+    
+    def _run(self, operation, func, *args):
+        started = time.perf_counter()
+        
+        if self._slots is None:
+            result = func(*args)
+        else:
+            if not self._slots.acquire(blocking=False):
+                with self._metrics_lock:
+                    self._rejected += 1
+                raise PasswordHasherBusy()
+            try:
+                future = self._get_executor().submit(func, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is held until the worker is done, even if we stop waiting
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                raise PasswordHasherTimeout()
+        
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            count, total, slowest = self._timings[operation]
+            self._timings[operation] = (count + 1, total + elapsed, max(slowest, elapsed))
+        
+        return result
+
+# Shared instance, configured by create_app()
+password_hasher = PasswordHasher()
@@ -0,0 +1,253 @@
+import atexit
+import json
+import os
+import socket
+import threading
+import uuid
+from collections import deque
+
+# Largest message the unix socket transport will carry
+MAX_DATAGRAM_SIZE = 65536
+
+class Subscription:
+    """
+    One live connection's feed of a user's notifications
+    
+    Messages wait in a bounded buffer. When a slow client lets it fill,
+    the oldest message is dropped and counted rather than letting the
+    buffer grow without limit.
+    """
+    def __init__(self, hub, user_id, buffer_size):
+        self.hub = hub
+        self.user_id = user_id
+        self.buffer_size = buffer_size
+        self.dropped = 0
+        self.closed = False
+        self._buffer = deque()
+        self._ready = threading.Condition()
+    
+    def put(self, message):
+        """Buffer a message, returning False if an older one was dropped to make room"""
+        with self._ready:
+            overflow = len(self._buffer) >= self.buffer_size
+            if overflow:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(message)
+            self._ready.notify()
+        return not overflow
+    
+    def get(self, timeout):
+        """
+        Wait up to timeout seconds for messages
+        
+        Returns every buffered message, or an empty list if none arrived
+        (or the subscription was closed) in time.
+        """
+        with self._ready:
+            if not self._buffer and not self.closed:
+                self._ready.wait(timeout)
+            messages = list(self._buffer)
+            self._buffer.clear()
+        return messages
+    
+    def close(self):
+        """Stop receiving messages; safe to call more than once"""
+        self.hub.unsubscribe(self)
+    
+    def _wake(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+class UnixSocketTransport:
+    """
+    Fan-out between worker processes on one host over unix datagram sockets
+    
+    Each process binds a socket in a shared directory and publishes by
+    sending a datagram to every other socket there; a receiver thread hands
+    incoming messages to the local hub. Sends never block: a peer whose
+    socket buffer is full misses the message, which is counted. Sockets
+    left behind by exited processes are removed when a send is refused.
+    """
+    def __init__(self, directory, deliver):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.deliver = deliver
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self.sent = 0
+        self.received = 0
+        self.send_failures = 0
+        
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.path)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        atexit.register(self.close)
+        
+        self._thread = threading.Thread(target=self._receive, name='notification-hub', daemon=True)
+        self._thread.start()
+    
+    def send(self, message):
+        data = json.dumps(message).encode()
+        if len(data) > MAX_DATAGRAM_SIZE:
+            self.send_failures += 1
+            return
+        
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.path or not name.endswith('.sock'):
+                continue
+            try:
+                self._sender.sendto(data, socket.MSG_DONTWAIT, path)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is listening any more
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                self.send_failures += 1
+    
+    def _receive(self):
+        while True:
+            try:
+                data = self._receiver.recv(MAX_DATAGRAM_SIZE)
+            except OSError:
+                return  # Socket closed
+            self.received += 1
+            try:
+                message = json.loads(data)
+                self.deliver(message['user_id'], message['payload'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    
+    def close(self):
+        for sock in (self._receiver, self._sender):
+            try:
+                sock.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+    
+    def stats(self):
+        return {
+            'socket': self.path,
+            'sent': self.sent,
+            'received': self.received,
+            'send_failures': self.send_failures
+        }
+
+class NotificationHub:
+    """
+    Routes real-time notifications to live SSE connections
+    
+    A user may hold any number of subscriptions (one per open tab), each
+    with its own bounded buffer. Publishing delivers to this process's
+    subscriptions and, with the 'unix' transport, to every other worker
+    process on the host. The transport is created lazily in the process
+    that first uses it, so each forked worker gets its own socket.
+    """
+    def __init__(self):
+        self.buffer_size = 100
+        self.transport_name = 'local'
+        self.socket_dir = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._transport = None
+        self._transport_pid = None
+    
+    def init_app(self, app):
+        self.close()
+        self.buffer_size = app.config.get('NOTIFICATION_STREAM_BUFFER', 100)
+        self.transport_name = app.config.get('NOTIFICATION_HUB_TRANSPORT', 'local')
+        self.socket_dir = app.config.get('NOTIFICATION_HUB_SOCKET_DIR')
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+    
+    def subscribe(self, user_id):
+        """Open a subscription to a user's notifications"""
+        self._ensure_transport()
+        subscription = Subscription(self, user_id, self.buffer_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+        subscription._wake()
+    
+    def publish(self, user_id, payload):
+        """Send a message to all of a user's subscriptions, in every process"""
+        self.published += 1
+        self._deliver(user_id, payload)
+        
+        transport = self._ensure_transport()
+        if transport is not None:
+            transport.send({'user_id': user_id, 'payload': payload})
+    
+    def _deliver(self, user_id, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        
+        for subscription in subscriptions:
+            self.delivered += 1
+            if not subscription.put(payload):
+                self.dropped += 1
+    
+    def _ensure_transport(self):
+        if self.transport_name != 'unix':
+            return None
+        
+        with self._lock:
+            if self._transport is None or self._transport_pid != os.getpid():
+                # A transport inherited over fork belongs to the parent
+                self._transport = UnixSocketTransport(self.socket_dir, self._deliver)
+                self._transport_pid = os.getpid()
+            return self._transport
+    
+    def close(self):
+        """Close every subscription and the transport"""
+        with self._lock:
+            subscriptions = [s for user_subs in self._subscriptions.values() for s in user_subs]
+            self._subscriptions = {}
+            transport = self._transport if self._transport_pid == os.getpid() else None
+            self._transport = None
+            self._transport_pid = None
+        
+        for subscription in subscriptions:
+            subscription._wake()
+        if transport is not None:
+            transport.close()
+    
+    def stats(self):
+        """Connection, delivery and drop counters for this process"""
+        with self._lock:
+            connections = sum(len(subs) for subs in self._subscriptions.values())
+            users = len(self._subscriptions)
+            transport = self._transport
+        
+        return {
+            'transport': self.transport_name,
+            'connections': connections,
+            'users': users,
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'peers': transport.stats() if transport is not None else None
+        }
+
+# Shared instance, configured by create_app()
+notification_hub = NotificationHub()
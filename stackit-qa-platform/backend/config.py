@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -13,9 +14,131 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     
+    # Password hashing, run on a pool of worker processes. Changing the
+    # method rehashes each user's password on their next login. The pool
+    # is per process: every web server worker (e.g. each Gunicorn worker)
+    # starts its own, so keep web workers x PASSWORD_HASH_WORKERS within
+    # the CPU count.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE_DEPTH = 32
+    PASSWORD_HASH_TIMEOUT = 10
+    
+    # Seconds a worker may reuse a user's cached role and ban status. A ban
+    # or role change reaches every worker at once only with a shared
+    # CACHE_BACKEND ('redis'); with the default per-process 'memory'
+    # backend, other workers keep the old status for up to this long.
+    AUTH_USER_CACHE_TTL = 30
+    
     # Application settings
     DEBUG = os.environ.get('FLASK_ENV') == 'development'
     
     # Pagination defaults
     DEFAULT_PAGE_SIZE = 10
-    MAX_PAGE_SIZE = 100
\ No newline at end of file
+    MAX_PAGE_SIZE = 100
+    
+    # Outgoing email. Messages are queued in email_messages and delivered by
+    # worker threads over pooled SMTP sessions, retrying failures with
+    # exponential backoff starting at MAIL_RETRY_BACKOFF seconds.
+    MAIL_SERVER = os.environ.get('MAIL_SERVER')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
+    MAIL_USE_TLS = (os.environ.get('MAIL_USE_TLS') or '').lower() == 'true'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@stackit.com'
+    MAIL_QUEUE_WORKERS = 2
+    MAIL_QUEUE_BATCH_SIZE = 20
+    MAIL_QUEUE_POLL_INTERVAL = 10
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BACKOFF = 30
+    MAIL_CLAIM_TIMEOUT = 300
+    MAIL_SMTP_TIMEOUT = 30
+    MAIL_CONNECTION_MAX_IDLE = 60
+    
+    # Notification digest emails (`flask send-digests`): users per chunk and
+    # notifications listed per email. Links point at the frontend.
+    DIGEST_CHUNK_SIZE = 500
+    DIGEST_MAX_ITEMS = 20
+    FRONTEND_URL = os.environ.get('FRONTEND_URL') or 'http://localhost:3000'
+    
+    # Image uploads: read in chunks up to IMAGE_MAX_UPLOAD_SIZE bytes, rejected
+    # beyond IMAGE_MAX_PIXELS (decompression bombs), then downscaled to
+    # IMAGE_MAX_WIDTH on a bounded pool of worker threads
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'uploads'
+    )
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH') or 6 * 1024 * 1024)
+    IMAGE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+    IMAGE_MAX_PIXELS = 40_000_000
+    IMAGE_MAX_WIDTH = 1200
+    IMAGE_PROCESSING_WORKERS = 2
+    IMAGE_PROCESSING_QUEUE_DEPTH = 16
+    # Disk quota for on-demand renditions (thumb, medium, webp), shared by
+    # all workers and evicted LRU
+    IMAGE_RENDITION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    # Seconds between sweeps measuring the cache on disk and evicting
+    IMAGE_RENDITION_SWEEP_INTERVAL = 60
+    
+    # Response cache for public read endpoints: 'memory', 'redis' or 'none'.
+    # 'memory' is per process, so invalidations (including bans, see
+    # AUTH_USER_CACHE_TTL) only reach other workers through 'redis'.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TTL = 60
+    CACHE_MAX_ENTRIES = 2048
+    
+    # Transactional outbox for notifications: a background thread per
+    # process drains it, woken on each write and polling as a fallback
+    OUTBOX_DISPATCHER_ENABLED = True
+    OUTBOX_POLL_INTERVAL = 5
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_MAX_ATTEMPTS = 5
+    
+    # Vote counters of hot answers: when enabled, counter increments are
+    # summed in memory and written in batches every VOTE_BUFFER_FLUSH_INTERVAL
+    # seconds (or once VOTE_BUFFER_MAX_ANSWERS answers are pending)
+    VOTE_BUFFER_ENABLED = (os.environ.get('VOTE_BUFFER_ENABLED') or '').lower() == 'true'
+    VOTE_BUFFER_FLUSH_INTERVAL = 1
+    VOTE_BUFFER_MAX_ANSWERS = 500
+    
+    # Tag autocomplete, served from a per-process index of tag names that
+    # reloads from the database every TAG_SUGGEST_REFRESH_INTERVAL seconds
+    TAG_SUGGEST_MAX_RESULTS = 10
+    TAG_SUGGEST_REFRESH_INTERVAL = 300
+    
+    # Real-time notification streams (SSE). Each connection buffers at most
+    # NOTIFICATION_STREAM_BUFFER messages; 'unix' fans out to the other
+    # worker processes on this host through sockets in the given directory.
+    NOTIFICATION_STREAM_BUFFER = 100
+    NOTIFICATION_STREAM_HEARTBEAT = 30
+    # Most notifications replayed to a reconnecting stream before it is
+    # told to resync instead
+    NOTIFICATION_REPLAY_LIMIT = 100
+    # Seconds a worker may serve a user's cached unread count
+    NOTIFICATION_COUNT_CACHE_TTL = 10
+    # Read notifications older than this move to notifications_archive when
+    # `flask archive-notifications` runs, this many rows per transaction
+    NOTIFICATION_ARCHIVE_AFTER_DAYS = 30
+    NOTIFICATION_ARCHIVE_CHUNK_SIZE = 500
+    NOTIFICATION_HUB_TRANSPORT = os.environ.get('NOTIFICATION_HUB_TRANSPORT') or 'unix'
+    NOTIFICATION_HUB_SOCKET_DIR = os.environ.get('NOTIFICATION_HUB_SOCKET_DIR') or os.path.join(
+        tempfile.gettempdir(), 'stackit-notifications'
+    )
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_BACKEND = 'none'
+    PASSWORD_HASH_WORKERS = 0
+    OUTBOX_DISPATCHER_ENABLED = False
+    NOTIFICATION_HUB_TRANSPORT = 'local'
+    MAIL_SERVER = None
+    MAIL_QUEUE_WORKERS = 0
+    UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'stackit-test-uploads')
+    IMAGE_PROCESSING_WORKERS = 0
+
+# Named configurations, so create_app('testing') works
+config = {
+    'default': Config,
+    'testing': TestingConfig
+}
\ No newline at end of file
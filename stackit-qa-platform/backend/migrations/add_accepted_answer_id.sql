@@ -0,0 +1,10 @@
+-- Record each question's accepted answer on the question itself
+-- Where several answers were marked accepted, the latest one is kept
+
+ALTER TABLE questions ADD COLUMN accepted_answer_id INTEGER REFERENCES answers(id) ON DELETE SET NULL;
+UPDATE questions SET accepted_answer_id = (
+    SELECT MAX(id) FROM answers WHERE answers.question_id = questions.id AND answers.accepted = 1
+);
+UPDATE answers SET accepted = 0
+WHERE accepted = 1 AND id NOT IN (SELECT accepted_answer_id FROM questions WHERE accepted_answer_id IS NOT NULL);
+CREATE UNIQUE INDEX idx_questions_accepted_answer ON questions(accepted_answer_id);
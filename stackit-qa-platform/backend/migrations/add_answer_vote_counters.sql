@@ -0,0 +1,6 @@
+-- Add denormalized vote counters to existing answers tables
+-- Run `flask reconcile-votes` afterwards to backfill them from votes
+
+ALTER TABLE answers ADD COLUMN upvotes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE answers ADD COLUMN downvotes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE answers ADD COLUMN score INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,23 @@
+-- Add coalescing columns to existing notifications tables and create the archive table
+-- Existing rows keep a NULL group_key, so they are never coalesced into
+
+ALTER TABLE notifications ADD COLUMN group_key VARCHAR(100);
+ALTER TABLE notifications ADD COLUMN count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE notifications ADD COLUMN updated_at TIMESTAMP;
+UPDATE notifications SET updated_at = created_at;
+CREATE INDEX idx_notifications_user_group ON notifications(user_id, group_key);
+
+CREATE TABLE notifications_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    source_id INTEGER NOT NULL,
+    read BOOLEAN NOT NULL DEFAULT 1,
+    created_at TIMESTAMP,
+    group_key VARCHAR(100),
+    count INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX idx_notifications_archive_user_created ON notifications_archive(user_id, created_at);
@@ -0,0 +1,16 @@
+-- Denormalize answer counts, scores and last activity onto questions
+-- for the newest/active/votes/unanswered listing orders
+
+ALTER TABLE questions ADD COLUMN answer_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE questions ADD COLUMN score INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE questions ADD COLUMN last_activity_at TIMESTAMP;
+UPDATE questions SET
+    answer_count = (SELECT COUNT(*) FROM answers WHERE answers.question_id = questions.id),
+    score = (SELECT COALESCE(SUM(score), 0) FROM answers WHERE answers.question_id = questions.id),
+    last_activity_at = COALESCE(
+        (SELECT MAX(created_at) FROM answers WHERE answers.question_id = questions.id),
+        created_at
+    );
+CREATE INDEX idx_questions_last_activity ON questions(last_activity_at);
+CREATE INDEX idx_questions_score ON questions(score);
+CREATE INDEX idx_questions_unanswered ON questions(answer_count, created_at);
@@ -0,0 +1,5 @@
+-- Store each question's plain text and listing excerpt next to its HTML
+-- Fill them in afterwards with: flask rebuild-question-text
+
+ALTER TABLE questions ADD COLUMN body_text TEXT;
+ALTER TABLE questions ADD COLUMN excerpt VARCHAR(255);
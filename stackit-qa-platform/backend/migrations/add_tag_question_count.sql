@@ -0,0 +1,8 @@
+-- Store each tag's number of questions instead of counting on every read
+-- `flask reconcile-tag-counts` repeats the backfill if counts drift
+
+ALTER TABLE tags ADD COLUMN question_count INTEGER NOT NULL DEFAULT 0;
+UPDATE tags SET question_count = (
+    SELECT COUNT(*) FROM question_tags WHERE question_tags.tag_id = tags.id
+);
+CREATE INDEX idx_tags_question_count ON tags(question_count);
@@ -0,0 +1,4 @@
+-- Add the denormalized unread notification counter to existing users tables
+-- Run `flask reconcile-notification-counts` afterwards to backfill it
+
+ALTER TABLE users ADD COLUMN unread_notification_count INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,3 @@
+-- Track when each user last got a notification digest email
+
+ALTER TABLE users ADD COLUMN last_digest_at TIMESTAMP NULL;
@@ -8,7 +8,9 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(10) NOT NULL DEFAULT 'user' CHECK (role IN ('user', 'admin')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    banned BOOLEAN DEFAULT 0
+    banned BOOLEAN DEFAULT 0,
+    unread_notification_count INTEGER NOT NULL DEFAULT 0,
+    last_digest_at TIMESTAMP NULL
 );
 
 -- Questions Table
@@ -17,15 +19,23 @@ CREATE TABLE IF NOT EXISTS questions (
     user_id INTEGER NOT NULL,
     title VARCHAR(255) NOT NULL,
     description TEXT NOT NULL,
+    body_text TEXT,
+    excerpt VARCHAR(255),
+    accepted_answer_id INTEGER UNIQUE,
+    answer_count INTEGER NOT NULL DEFAULT 0,
+    score INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    last_activity_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (accepted_answer_id) REFERENCES answers(id) ON DELETE SET NULL
 );
 
 -- Tags Table
 CREATE TABLE IF NOT EXISTS tags (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name VARCHAR(50) UNIQUE NOT NULL
+    name VARCHAR(50) UNIQUE NOT NULL,
+    question_count INTEGER NOT NULL DEFAULT 0
 );
 
 -- Question Tags Table (Many-to-Many)
@@ -44,6 +54,9 @@ CREATE TABLE IF NOT EXISTS answers (
     user_id INTEGER NOT NULL,
     content TEXT NOT NULL,
     accepted BOOLEAN DEFAULT 0,
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    score INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
@@ -81,9 +94,53 @@ CREATE TABLE IF NOT EXISTS notifications (
     source_id INTEGER NOT NULL,
     read BOOLEAN DEFAULT 0 NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    group_key VARCHAR(100),
+    count INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Read notifications moved out of the hot table by `flask archive-notifications`
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type VARCHAR(10) NOT NULL CHECK (type IN ('answer', 'comment', 'mention')),
+    source_id INTEGER NOT NULL,
+    read BOOLEAN DEFAULT 1 NOT NULL,
+    created_at TIMESTAMP,
+    group_key VARCHAR(100),
+    count INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Outbox of side effects (notifications) committed with the content that caused them
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSON NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP NULL
+);
+
+-- Outgoing email queue, delivered by the mail workers
+CREATE TABLE IF NOT EXISTS email_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient VARCHAR(100) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    html_body TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    claim_token VARCHAR(32),
+    claimed_at TIMESTAMP NULL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL
+);
+
 -- Create initial admin user (password: admin123)
 INSERT INTO users (username, email, password_hash, role) 
 VALUES ('admin', 'admin@stackit.com', '$2b$12$1jsTJ0tZ1BKRCpKWWQEJKOwG0YbZ1uEEcIFbQlNbESLODHXnjaB1i', 'admin');
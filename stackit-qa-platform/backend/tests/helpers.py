@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+
+@contextmanager
+def recorded_statements():
+    """
+    Record the SQL statements run on the app's engine inside the block
+    
+    Yields:
+        list: The statements, in order, filled in as they run
+    """
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
@@ -1,7 +1,11 @@
 import unittest
 import json
 from app import create_app, db
-from app.models import User, Question, Answer, Vote
+from helpers import recorded_statements
+from unittest.mock import Mock, patch
+from app.models import User, Question, Answer, Vote, Notification, OutboxEvent
+from app.services.answer_service import create_answer, vote_on_answer, vote_buffer, mark_accepted
+from app.services.outbox_service import EVENT_HANDLERS, dispatch_pending
 
 class AnswersTestCase(unittest.TestCase):
     """Test case for answers endpoints"""
@@ -136,6 +140,7 @@ class AnswersTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(response.status_code, 200)
         self.assertTrue(data['accepted'])
+        self.assertTrue(Answer.query.get(self.answer.id).accepted)
         
         # User2 attempting to accept their own answer (should fail)
         response = self.client.put(
@@ -145,6 +150,39 @@ class AnswersTestCase(unittest.TestCase):
         
         self.assertEqual(response.status_code, 403)
     
+    def test_accepting_moves_acceptance_in_two_updates(self):
+        """Accepting another answer moves the acceptance without reading anything"""
+        other = Answer(question_id=self.question.id, user_id=self.user.id,
+                       content='Another answer with enough characters to be valid.')
+        db.session.add(other)
+        db.session.commit()
+        user_id, first_id, other_id, question_id = self.user.id, self.answer.id, other.id, self.question.id
+        
+        self.assertEqual(mark_accepted(user_id, first_id), question_id)
+        
+        with recorded_statements() as statements:
+            self.assertEqual(mark_accepted(user_id, other_id), question_id)
+        
+        self.assertEqual([s.split()[0].upper() for s in statements], ['UPDATE', 'UPDATE'])
+        self.assertEqual(db.session.get(Question, question_id).accepted_answer_id, other_id)
+        self.assertEqual([a.id for a in Answer.query.filter_by(accepted=True)], [other_id])
+        
+        # Someone else's question, or a missing answer, matches nothing
+        self.assertIsNone(mark_accepted(self.user2.id, first_id))
+        self.assertIsNone(mark_accepted(user_id, 9999))
+        self.assertEqual(db.session.get(Question, question_id).accepted_answer_id, other_id)
+        
+        data = json.loads(self.client.get('/api/questions/').data)
+        self.assertEqual(data['questions'][0]['accepted_answer_id'], other_id)
+        
+        # Deleting the accepted answer leaves the question unsolved
+        response = self.client.delete(
+            f'/api/answers/{other_id}',
+            headers={'Authorization': f'Bearer {self.auth_token}'}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(db.session.get(Question, question_id).accepted_answer_id)
+    
     def test_vote_answer(self):
         """Test voting on an answer"""
         # User1 upvoting User2's answer
@@ -190,4 +228,171 @@ class AnswersTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['upvotes'], 0)
-        self.assertEqual(data['downvotes'], 0)
\ No newline at end of file
+        self.assertEqual(data['downvotes'], 0)
+        self.assertIsNone(data['user_vote'])
+    
+    def test_reconcile_vote_counts(self):
+        """Test rebuilding answer vote counters from the votes table"""
+        from app.services.answer_service import reconcile_vote_counts
+        
+        # Votes written directly bypass the counters
+        db.session.add(Vote(answer_id=self.answer.id, user_id=self.user.id, vote_type='up'))
+        db.session.add(Vote(answer_id=self.answer.id, user_id=self.user2.id, vote_type='up'))
+        db.session.commit()
+        self.assertEqual(Answer.query.get(self.answer.id).upvotes, 0)
+        
+        updated = reconcile_vote_counts()
+        
+        answer = Answer.query.get(self.answer.id)
+        self.assertEqual(updated, 1)
+        self.assertEqual(answer.upvotes, 2)
+        self.assertEqual(answer.downvotes, 0)
+        self.assertEqual(answer.score, 2)
+        
+        # Nothing left to fix on a second run
+        self.assertEqual(reconcile_vote_counts(), 0)
+    
+    def test_vote_is_written_without_reading_first(self):
+        """Casting, switching and taking back a vote never SELECTs the vote or reloads the answer"""
+        user_id, answer_id = self.user.id, self.answer.id
+        def verbs(statements):
+            taken, statements[:] = [s.split()[0].upper() for s in statements], []
+            return taken
+        
+        with recorded_statements() as statements:
+            cast = vote_on_answer(user_id, answer_id, 'up')
+            cast_statements = verbs(statements)
+            switched = vote_on_answer(user_id, answer_id, 'down')
+            switched_statements = verbs(statements)
+            taken_back = vote_on_answer(user_id, answer_id, 'down')
+        
+        self.assertEqual(cast, {'upvotes': 1, 'downvotes': 0, 'score': 1, 'user_vote': 'up'})
+        self.assertEqual(switched, {'upvotes': 0, 'downvotes': 1, 'score': -1, 'user_vote': 'down'})
+        self.assertEqual(taken_back, {'upvotes': 0, 'downvotes': 0, 'score': 0, 'user_vote': None})
+        
+        # The vote, then the question's score and the answer's counters
+        self.assertEqual(cast_statements, ['DELETE', 'INSERT', 'UPDATE', 'UPDATE'])
+        self.assertEqual(switched_statements, ['DELETE', 'INSERT', 'UPDATE', 'UPDATE'])
+        self.assertEqual(verbs(statements), ['DELETE', 'UPDATE', 'UPDATE'])
+        self.assertEqual(Vote.query.count(), 0)
+    
+    def test_concurrent_vote_by_the_same_user_is_taken_over(self):
+        """A vote that lands between taking and inserting is taken too, keeping counters exact"""
+        from app.services import answer_service
+        user_id, answer_id = self.user.id, self.answer.id
+        take_vote = answer_service.take_vote
+        raced = []
+        
+        def racing_take_vote(*args):
+            previous_type = take_vote(*args)
+            if not raced:
+                # The user's other request casts and counts the same vote meanwhile
+                raced.append(True)
+                db.session.add(Vote(user_id=user_id, answer_id=answer_id, vote_type='up'))
+                db.session.flush()
+                answer_service.adjust_vote_counts(answer_id, 1, 0)
+            return previous_type
+        
+        with patch.object(answer_service, 'take_vote', side_effect=racing_take_vote):
+            counts = vote_on_answer(user_id, answer_id, 'up')
+        
+        # Two "up"s in a row take the vote back, as they would one after the other
+        self.assertEqual(counts, {'upvotes': 0, 'downvotes': 0, 'score': 0, 'user_vote': None})
+        self.assertEqual(Vote.query.count(), 0)
+        self.assertEqual(db.session.get(Question, self.question.id).score, 0)
+    
+    def test_buffered_votes_are_coalesced(self):
+        """With the vote buffer, counter updates are summed and written in one batch"""
+        vote_buffer.enabled = True
+        vote_buffer.interval = 3600
+        
+        self.assertEqual(vote_on_answer(self.user.id, self.answer.id, 'up')['upvotes'], 1)
+        self.assertEqual(vote_on_answer(self.user2.id, self.answer.id, 'up')['upvotes'], 2)
+        self.assertEqual(vote_on_answer(self.user2.id, self.answer.id, 'down')['score'], 0)
+        
+        # Votes are stored at once, the counters wait for the flush
+        self.assertEqual(Vote.query.count(), 2)
+        self.assertEqual(db.session.get(Answer, self.answer.id).upvotes, 0)
+        
+        self.assertEqual(vote_buffer.flush(), 1)
+        answer = db.session.get(Answer, self.answer.id)
+        db.session.refresh(answer)
+        self.assertEqual((answer.upvotes, answer.downvotes, answer.score), (1, 1, 0))
+        self.assertEqual(vote_buffer.pending(self.answer.id), (0, 0))
+        self.assertEqual(vote_buffer.flush(), 0)
+    
+    def test_post_answer_notifies_mentions_in_one_batch(self):
+        """Test mentions are resolved and notified with one query and one insert"""
+        user3 = User(username='testuser3', email='test3@example.com', password_hash='x')
+        db.session.add(user3)
+        db.session.commit()
+        
+        response = self.client.post(
+            '/api/answers',
+            data=json.dumps({
+                'question_id': self.question.id,
+                'content': 'Thanks @testuser and @testuser3, also @testuser2 and @nobody.'
+            }),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.auth_token2}'}
+        )
+        self.assertEqual(response.status_code, 201)
+        answer_id = json.loads(response.data)['id']
+        
+        # Notifications are sent by the outbox dispatcher, not the request
+        self.assertEqual(Notification.query.count(), 0)
+        self.assertEqual(OutboxEvent.query.filter_by(processed_at=None).count(), 1)
+        
+        with recorded_statements() as statements:
+            self.assertEqual(dispatch_pending(), 1)
+        
+        notified = sorted(
+            (n.user_id, n.type) for n in Notification.query.filter_by(source_id=answer_id)
+        )
+        # The author (testuser2) is not notified of their own mention
+        self.assertEqual(notified, [(1, 'answer'), (1, 'mention'), (user3.id, 'mention')])
+        
+        self.assertEqual(len([s for s in statements if s.startswith('INSERT INTO notifications')]), 1)
+        self.assertEqual(len([s for s in statements if 'FROM users' in s and ' IN ' in s]), 1)
+        
+        # Processed events are not dispatched again
+        self.assertEqual(dispatch_pending(), 0)
+        self.assertEqual(Notification.query.count(), 3)
+    
+    def test_bad_outbox_event_does_not_hold_up_the_batch(self):
+        """Test only the event that fails is retried; the rest of its batch goes through"""
+        answers = [create_answer(self.user2.id, self.question.id, f'Answer number {n} for the question') for n in range(3)]
+        bad_id = answers[1].id
+        handler = EVENT_HANDLERS['answer_created']
+        
+        def failing_handler(payloads):
+            if any(payload['answer_id'] == bad_id for payload in payloads):
+                raise RuntimeError('boom')
+            return handler(payloads)
+        
+        with patch.dict(EVENT_HANDLERS, {'answer_created': failing_handler}):
+            self.assertEqual(dispatch_pending(), 2)
+        
+        # The two good answers coalesce into the question author's notification
+        notification = Notification.query.one()
+        self.assertEqual((notification.count, notification.source_id), (2, answers[2].id))
+        attempts = {e.payload['answer_id']: (e.attempts, e.processed_at is not None) for e in OutboxEvent.query}
+        self.assertEqual(attempts, {answers[0].id: (0, True), bad_id: (1, False), answers[2].id: (0, True)})
+    
+    def test_failed_outbox_dispatch_is_retried(self):
+        """Test a failing dispatch leaves no notifications and retries later"""
+        answer = create_answer(self.user2.id, self.question.id, 'An answer for @testuser')
+        
+        with patch.dict(EVENT_HANDLERS, {'answer_created': Mock(side_effect=RuntimeError('boom'))}):
+            self.assertEqual(dispatch_pending(), 0)
+        
+        self.assertEqual(Notification.query.count(), 0)
+        outbox_event = OutboxEvent.query.one()
+        self.assertEqual(outbox_event.attempts, 1)
+        self.assertIsNone(outbox_event.processed_at)
+        
+        self.assertEqual(dispatch_pending(), 1)
+        self.assertEqual(
+            sorted(n.type for n in Notification.query.filter_by(source_id=answer.id)),
+            ['answer', 'mention']
+        )
@@ -1,7 +1,12 @@
 import unittest
 import json
 from app import create_app, db
+from werkzeug.security import generate_password_hash
+from config import TestingConfig
 from app.models import User
+from app.utils.passwords import password_hasher
+from app.services.auth_service import UserCache, invalidate_user_principal
+from app.utils.cache import cache, MemoryBackend
 
 class AuthTestCase(unittest.TestCase):
     """Test case for authentication endpoints"""
@@ -117,4 +122,198 @@ class AuthTestCase(unittest.TestCase):
             content_type='application/json'
         )
         
-        self.assertEqual(response.status_code, 401)
\ No newline at end of file
+        self.assertEqual(response.status_code, 401)
+    
+    def login(self, username):
+        """Log in with the test password and return the token"""
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({
+                'username': username,
+                'password': 'Password123'
+            }),
+            content_type='application/json'
+        )
+        return json.loads(response.data)['token']
+    
+    def test_ban_applies_immediately(self):
+        """Test a ban takes effect on the next request despite the user cache"""
+        admin = User(username='admin', email='admin@example.com', role='admin')
+        admin.set_password('Password123')
+        db.session.add(admin)
+        db.session.commit()
+        
+        user_token = self.login('testuser')
+        admin_token = self.login('admin')
+        
+        # Warm the cache with the user's unbanned state
+        response = self.client.get(
+            '/api/users/profile',
+            headers={'Authorization': f'Bearer {user_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['email'], 'test@example.com')
+        
+        response = self.client.put(
+            '/api/admin/users/1/ban',
+            data=json.dumps({'banned': True}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {admin_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.get(
+            '/api/users/profile',
+            headers={'Authorization': f'Bearer {user_token}'}
+        )
+        self.assertEqual(response.status_code, 403)
+        
+        # Non-admins are rejected by admin routes
+        response = self.client.get(
+            '/api/admin/stats',
+            headers={'Authorization': f'Bearer {user_token}'}
+        )
+        self.assertEqual(response.status_code, 403)
+    
+    def test_ban_reaches_other_workers(self):
+        """Test a ban invalidates the principal cached by another worker"""
+        # Versions live in the shared backend (Redis in production)
+        cache.backend = MemoryBackend()
+        user = User.query.filter_by(username='testuser').first()
+        other_worker = UserCache(ttl=300)
+        self.assertFalse(other_worker.get(user.id).banned)
+        
+        user.banned = True
+        db.session.commit()
+        self.assertFalse(other_worker.get(user.id).banned)
+        
+        invalidate_user_principal(user.id)
+        self.assertTrue(other_worker.get(user.id).banned)
+    
+    def test_invalid_token(self):
+        """Test protected routes reject bad tokens"""
+        response = self.client.get(
+            '/api/users/profile',
+            headers={'Authorization': 'Bearer not-a-token'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.data)['error'], 'Invalid token')
+    
+    def test_rehash_on_login(self):
+        """Test hashes made with outdated parameters are upgraded at login"""
+        user = User.query.filter_by(username='testuser').first()
+        user.password_hash = generate_password_hash('Password123', method='pbkdf2:sha256:1000')
+        db.session.commit()
+        
+        self.login('testuser')
+        
+        user = User.query.filter_by(username='testuser').first()
+        self.assertTrue(user.password_hash.startswith(self.app.config['PASSWORD_HASH_METHOD'] + '$'))
+        self.assertTrue(user.check_password('Password123'))
+
+    def test_no_rehash_for_expanded_method(self):
+        """Test a method name Werkzeug expands on storage isn't rehashed every login"""
+        password_hasher.method = 'pbkdf2:sha256'
+        password_hasher._hash_prefix = None
+        try:
+            password_hash = generate_password_hash('Password123', method='pbkdf2:sha256')
+            self.assertNotEqual(password_hash.split('$', 1)[0], 'pbkdf2:sha256')
+            self.assertFalse(password_hasher.needs_rehash(password_hash))
+            self.assertTrue(password_hasher.needs_rehash(
+                generate_password_hash('Password123', method='pbkdf2:sha256:1000')
+            ))
+        finally:
+            password_hasher.init_app(self.app)
+
+class PooledHashingConfig(TestingConfig):
+    PASSWORD_HASH_WORKERS = 1
+    PASSWORD_HASH_QUEUE_DEPTH = 0
+
+class PasswordHashingPoolTestCase(unittest.TestCase):
+    """Test case for password hashing on the worker pool"""
+    
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = create_app(PooledHashingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('Password123')
+        db.session.add(user)
+        db.session.commit()
+    
+    def tearDown(self):
+        """Clean up after test"""
+        password_hasher.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def login(self):
+        return self.client.post(
+            '/api/auth/login',
+            data=json.dumps({
+                'username': 'testuser',
+                'password': 'Password123'
+            }),
+            content_type='application/json'
+        )
+    
+    def test_login_uses_pool(self):
+        """Test login verifies through the pool and records timings"""
+        self.assertEqual(self.login().status_code, 200)
+        
+        stats = password_hasher.stats()
+        self.assertEqual(stats['hash']['count'], 1)
+        self.assertEqual(stats['verify']['count'], 1)
+    
+    def test_overload_returns_429(self):
+        """Test logins are rejected fast once the pool is saturated"""
+        # Occupy the only slot, as a login in progress would
+        password_hasher._slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            password_hasher._slots.release()
+        
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.data)['error'], 'Too Many Requests')
+        self.assertEqual(password_hasher.stats()['rejected'], 1)
+    
+    def test_password_change_overload_returns_429(self):
+        """Test a saturated pool rejects a profile password change with a 429, not a 500"""
+        token = json.loads(self.login().data)['token']
+        password_hasher._slots.acquire()
+        try:
+            response = self.client.put(
+                '/api/users/profile',
+                data=json.dumps({'password': 'NewPassword456', 'password_confirm': 'NewPassword456'}),
+                content_type='application/json',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+        finally:
+            password_hasher._slots.release()
+        
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.data)['error'], 'Too Many Requests')
+        self.assertEqual(self.login().status_code, 200)
+    
+    def test_timeout_returns_503_and_holds_slot(self):
+        """Test a timed out login fails with a 503 without freeing the busy worker's slot"""
+        password_hasher.timeout = 0.001
+        response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.data)['error'], 'Service Unavailable')
+        
+        # The worker is still hashing, so the only slot is still taken
+        self.assertEqual(self.login().status_code, 429)
+        
+        password_hasher.timeout = 30
+        for _ in range(300):
+            if password_hasher._slots.acquire(timeout=0.1):
+                password_hasher._slots.release()
+                break
+        self.assertEqual(self.login().status_code, 200)
\ No newline at end of file
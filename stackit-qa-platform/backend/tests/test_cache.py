@@ -0,0 +1,143 @@
+import unittest
+import json
+import time
+from config import TestingConfig
+from app import create_app, db
+from app.models import User, Question, Answer, Tag
+from app.utils.cache import cache, MemoryBackend
+
+class CachingConfig(TestingConfig):
+    CACHE_BACKEND = 'memory'
+
+class MemoryBackendTestCase(unittest.TestCase):
+    """Test case for the in-process LRU cache backend"""
+    
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted first"""
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1, 60)
+        backend.set('b', 2, 60)
+        backend.get('a')
+        backend.set('c', 3, 60)
+        
+        self.assertEqual(backend.get('a'), 1)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('c'), 3)
+        self.assertEqual(backend.evictions, 1)
+    
+    def test_ttl_expiry(self):
+        """Entries are not returned after their TTL"""
+        backend = MemoryBackend()
+        backend.set('a', 1, 0.01)
+        time.sleep(0.02)
+        
+        self.assertIsNone(backend.get('a'))
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Test case for caching of the public question endpoints"""
+    
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = create_app(CachingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('Password123')
+        db.session.add(self.user)
+        
+        self.question = Question(
+            user_id=1,
+            title='Test Question Title',
+            description='This is a test question description with enough characters.'
+        )
+        self.question.tags.append(Tag(name='test-tag'))
+        db.session.add(self.question)
+        
+        self.answer = Answer(
+            question_id=1,
+            user_id=1,
+            content='This is a test answer with enough characters to be valid.'
+        )
+        db.session.add(self.answer)
+        db.session.commit()
+        
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'username': 'testuser', 'password': 'Password123'}),
+            content_type='application/json'
+        )
+        self.auth_token = json.loads(response.data)['token']
+    
+    def tearDown(self):
+        """Clean up after test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_question_detail_cached_until_vote(self):
+        """Voting invalidates the cached question detail"""
+        url = f'/api/questions/{self.question.id}'
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(cache.stats()['hits'], 1)
+        
+        self.client.post(
+            f'/api/answers/{self.answer.id}/vote',
+            data=json.dumps({'vote_type': 'up'}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.auth_token}'}
+        )
+        
+        data = json.loads(self.client.get(url).data)
+        self.assertEqual(data['answers'][0]['upvotes'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+    
+    def test_listing_invalidated_by_new_question(self):
+        """Creating a question invalidates unfiltered and tag listings"""
+        from app.services.question_service import QuestionService
+        
+        self.assertEqual(len(json.loads(self.client.get('/api/questions/').data)['questions']), 1)
+        self.assertEqual(len(json.loads(self.client.get('/api/questions/?tag=test-tag').data)['questions']), 1)
+        
+        QuestionService.create_question(
+            user_id=self.user.id,
+            title='Another Question Title',
+            description='Another question description with enough characters.',
+            tags=['test-tag']
+        )
+        
+        self.assertEqual(len(json.loads(self.client.get('/api/questions/').data)['questions']), 2)
+        self.assertEqual(len(json.loads(self.client.get('/api/questions/?tag=test-tag').data)['questions']), 2)
+        self.assertEqual(cache.stats()['hits'], 0)    
+    def test_listings_invalidated_by_answer_writes(self):
+        """Answering, accepting and deleting answers refresh the listings' counters"""
+        headers = {'Authorization': f'Bearer {self.auth_token}'}
+        
+        def listed(url):
+            questions = json.loads(self.client.get(url).data)['questions']
+            return [(q['id'], q['answer_count'], q['accepted_answer_id']) for q in questions]
+        
+        question_id = self.question.id
+        self.assertEqual(listed('/api/questions/'), [(question_id, 0, None)])
+        self.assertEqual(len(listed('/api/questions/?sort=unanswered')), 1)
+        
+        response = self.client.post(
+            '/api/answers',
+            data=json.dumps({'question_id': question_id, 'content': 'A posted answer with enough characters to be valid.'}),
+            content_type='application/json',
+            headers=headers
+        )
+        answer_id = json.loads(response.data)['id']
+        self.assertEqual(listed('/api/questions/?tag=test-tag'), [(question_id, 1, None)])
+        self.assertEqual(listed('/api/questions/?sort=unanswered'), [])
+        
+        self.client.put(f'/api/answers/{answer_id}/accept', headers=headers)
+        self.assertEqual(listed('/api/questions/'), [(question_id, 1, answer_id)])
+        
+        self.client.delete(f'/api/answers/{answer_id}', headers=headers)
+        self.assertEqual(listed('/api/questions/'), [(question_id, 0, None)])
+        self.assertEqual(listed('/api/questions/?tag=test-tag'), [(question_id, 0, None)])
+        self.assertEqual(len(listed('/api/questions/?sort=unanswered')), 1)
\ No newline at end of file
@@ -0,0 +1,291 @@
+import unittest
+import socket
+import socketserver
+import threading
+from datetime import datetime
+from helpers import recorded_statements
+from config import TestingConfig
+from app import create_app, db
+from app.models import EmailMessage, User, Question, Answer
+from app.services.email_service import (enqueue_email, send_email, deliver_pending, mail_queue, send_notification_digests,
+                                        send_welcome_email, send_password_reset_email)
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server recording what it receives
+    
+    Recipients in rejected get a permanent 550, those in deferred a
+    temporary 451.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set()
+        self.deferred = set()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+    
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost fake smtp")
+        recipients = []
+        
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            
+            if command in ('EHLO', 'HELO'):
+                self.reply("250 localhost")
+            elif command == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                elif address in server.deferred:
+                    self.reply("451 Try again later")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data.rstrip('\r\n') == '.':
+                        break
+                    body.append(data)
+                server.messages.append((recipients, ''.join(body)))
+                self.reply("250 OK queued")
+            elif command in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+class MailQueueTestCase(unittest.TestCase):
+    """Test case for queued email delivery"""
+    
+    def setUp(self):
+        """Set up a fake SMTP server and an app delivering to it"""
+        self.smtp = FakeSMTPServer()
+        
+        class MailConfig(TestingConfig):
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = self.smtp.server_address[1]
+            MAIL_RETRY_BACKOFF = 60
+            MAIL_MAX_ATTEMPTS = 3
+        
+        self.app = create_app(MailConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        mail_queue.close()
+        self.smtp.shutdown()
+        self.smtp.server_close()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def queue(self, *recipients):
+        ids = [enqueue_email(recipient, 'Subject', '<p>Hello</p>').id for recipient in recipients]
+        db.session.commit()
+        return ids
+    
+    def test_batch_is_sent_over_one_reused_session(self):
+        """A batch goes over one SMTP session, which later batches reuse"""
+        self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        self.assertEqual(deliver_pending(mail_queue.pool), 3)
+        
+        self.queue('d@example.com')
+        self.assertEqual(deliver_pending(mail_queue.pool), 1)
+        
+        self.assertEqual(len(self.smtp.messages), 4)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(EmailMessage.query.filter_by(status='sent').count(), 4)
+        self.assertEqual(deliver_pending(mail_queue.pool), 0)
+    
+    def test_failures_are_retried_with_backoff(self):
+        """Temporary rejections are retried later; permanent ones fail at once"""
+        self.smtp.deferred.add('later@example.com')
+        self.smtp.rejected.add('nobody@example.com')
+        deferred_id, rejected_id, ok_id = self.queue('later@example.com', 'nobody@example.com', 'ok@example.com')
+        
+        self.assertEqual(deliver_pending(mail_queue.pool), 3)
+        
+        deferred = db.session.get(EmailMessage, deferred_id)
+        self.assertEqual(deferred.status, 'pending')
+        self.assertEqual(deferred.attempts, 1)
+        self.assertGreater(deferred.next_attempt_at, datetime.utcnow())
+        self.assertEqual(db.session.get(EmailMessage, rejected_id).status, 'failed')
+        self.assertEqual(db.session.get(EmailMessage, ok_id).status, 'sent')
+        
+        # Not due yet
+        self.assertEqual(deliver_pending(mail_queue.pool), 0)
+        
+        # Once due and accepted, it goes through
+        self.smtp.deferred.clear()
+        deferred.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.assertEqual(deliver_pending(mail_queue.pool), 1)
+        self.assertEqual(db.session.get(EmailMessage, deferred_id).status, 'sent')
+
+    def test_send_email_joins_the_callers_transaction(self):
+        """Queued mail is only kept if the caller commits"""
+        user = User(username='mailuser', email='mail@example.com')
+        self.assertIsNotNone(send_email(user.email, 'Digest', 'emails/notification_digest.html', user=user, notifications=[], more=0))
+        db.session.rollback()
+        self.assertEqual(EmailMessage.query.count(), 0)
+        
+        message_id = send_email(user.email, 'Digest', 'emails/notification_digest.html', user=user, notifications=[], more=0)
+        db.session.commit()
+        self.assertEqual(deliver_pending(mail_queue.pool), 1)
+        self.assertEqual(db.session.get(EmailMessage, message_id).status, 'sent')
+    
+    def test_account_emails_are_committed_on_their_own(self):
+        """Welcome and password reset emails are queued and committed by their helpers"""
+        user = User(username='mailuser', email='mail@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        
+        welcome_id = send_welcome_email(user)
+        reset_id = send_password_reset_email(user, 'reset/token')
+        db.session.rollback()
+        
+        self.assertEqual(deliver_pending(mail_queue.pool), 2)
+        self.assertEqual(EmailMessage.query.filter_by(status='sent').count(), 2)
+        self.assertIn('mailuser', db.session.get(EmailMessage, welcome_id).html_body)
+        self.assertIn('reset-password?token=reset/token', db.session.get(EmailMessage, reset_id).html_body)
+    
+    def test_dropped_pooled_session_is_replaced_without_an_attempt(self):
+        """A pooled session the server dropped is replaced and the message sent on the first try"""
+        self.queue('a@example.com')
+        self.assertEqual(deliver_pending(mail_queue.pool), 1)
+        
+        # The server drops the idle session
+        connection = mail_queue.pool.acquire()
+        connection.sock.shutdown(socket.SHUT_RDWR)
+        mail_queue.pool.release(connection)
+        
+        message_id, = self.queue('b@example.com')
+        self.assertEqual(deliver_pending(mail_queue.pool), 1)
+        
+        message = db.session.get(EmailMessage, message_id)
+        self.assertEqual((message.status, message.attempts), ('sent', 0))
+        self.assertEqual(self.smtp.connections, 2)
+
+class DigestConfig(TestingConfig):
+    MAIL_SERVER = '127.0.0.1'
+
+class NotificationDigestTestCase(unittest.TestCase):
+    """Test case for the notification digest job"""
+    
+    def setUp(self):
+        """Set up the app and users with notifications"""
+        self.app = create_app(DigestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        
+        self.author = User(username='author', email='author@example.com', password_hash='x')
+        db.session.add(self.author)
+        db.session.commit()
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def add_users_with_answers(self, count, answers_each=1):
+        from app.services.notification_service import create_notifications
+        
+        entries = []
+        for _ in range(count):
+            user = User(username=f'user{User.query.count()}', email=f'user{User.query.count()}@example.com',
+                        password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            question = Question(user_id=user.id, title=f'Question of {user.username}', description='Description')
+            db.session.add(question)
+            db.session.flush()
+            for _ in range(answers_each):
+                answer = Answer(question_id=question.id, user_id=self.author.id, content='Answer')
+                db.session.add(answer)
+                db.session.flush()
+                entries.append((user.id, 'answer', answer.id))
+        db.session.commit()
+        create_notifications(entries)
+    
+    def count_statements(self, **kwargs):
+        with recorded_statements() as statements:
+            stats = send_notification_digests(**kwargs)
+        return stats, len(statements)
+    
+    def test_digest_per_user_with_new_notifications(self):
+        """Each user gets one digest of their new notifications, only once"""
+        self.add_users_with_answers(3, answers_each=2)
+        
+        stats = send_notification_digests(chunk_size=2, max_items=1)
+        self.assertEqual(stats['users'], 3)
+        self.assertEqual(stats['emails'], 3)
+        
+        messages = EmailMessage.query.order_by(EmailMessage.id).all()
+        self.assertEqual([m.recipient for m in messages], ['user1@example.com', 'user2@example.com', 'user3@example.com'])
+        self.assertIn('Question of user1', messages[0].html_body)
+        self.assertIn('1 more', messages[0].html_body)
+        
+        # Nothing new since the last digest
+        self.assertEqual(send_notification_digests(chunk_size=2)['emails'], 0)
+    
+    def test_digest_queries_per_chunk_are_constant(self):
+        """The statements per chunk don't grow with the users in it"""
+        self.add_users_with_answers(2)
+        _, small = self.count_statements(chunk_size=50)
+        
+        self.add_users_with_answers(8, answers_each=3)
+        stats, large = self.count_statements(chunk_size=50)
+        
+        self.assertEqual(stats['emails'], 8)
+        self.assertEqual(small, large)
+    
+    def test_digest_wording_per_notification_type(self):
+        """Single and coalesced notifications of each type read as sentences"""
+        import re
+        from flask import render_template
+        
+        source = {'question_id': 7, 'question_title': 'Sorting a list', 'actor': {'username': 'bob'}}
+        notifications = [
+            {'type': notification_type, 'count': count, 'source': source}
+            for notification_type in ('answer', 'comment', 'mention') for count in (1, 3)
+        ]
+        html = render_template('emails/notification_digest.html', user=self.author,
+                               notifications=notifications, more=0, base_url='')
+        text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', html))
+        
+        for sentence in (
+            'bob answered your question Sorting a list',
+            '3 new answers to your question Sorting a list, most recently by bob',
+            'bob commented on your answer to Sorting a list',
+            '3 new comments on your answer to Sorting a list, most recently by bob',
+            'bob mentioned you in an answer to Sorting a list',
+            'You were mentioned in 3 answers to Sorting a list, most recently by bob',
+        ):
+            self.assertIn(sentence, text)
+        self.assertNotIn('and others', text)
@@ -0,0 +1,238 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from config import TestingConfig
+from app import create_app
+from app.utils.image_handler import save_image, find_blob, image_processor, rendition_cache, ImageTooLarge, InvalidImage
+
+def make_upload(image_format='JPEG', size=(100, 100), filename='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format=image_format)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename=filename)
+
+class ImageUploadTestCase(unittest.TestCase):
+    """Test case for the image upload pipeline"""
+    
+    config = TestingConfig
+    
+    def setUp(self):
+        self.upload_folder = tempfile.mkdtemp()
+        
+        class ImageConfig(self.config):
+            UPLOAD_FOLDER = self.upload_folder
+            IMAGE_MAX_UPLOAD_SIZE = 256 * 1024
+            IMAGE_MAX_PIXELS = 4000 * 3000
+            IMAGE_MAX_WIDTH = 1200
+        
+        self.app = create_app(ImageConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+    
+    def tearDown(self):
+        image_processor.shutdown()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+    
+    def saved_path(self, url):
+        return find_blob(self.upload_folder, url.rsplit('/', 1)[1])[0]
+    
+    def wait_for(self, url):
+        """Path of a stored image once processing has finished"""
+        deadline = time.monotonic() + 10
+        while self.saved_path(url) is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.saved_path(url)
+    
+    def wait_for_processed(self, count):
+        """Processor stats once count images have been fully processed"""
+        # The blob is in place before the worker cleans up and counts it
+        deadline = time.monotonic() + 10
+        while image_processor.stats()['processed'] < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return image_processor.stats()
+    
+    def test_large_jpeg_is_downscaled(self):
+        """A wide JPEG is stored at the configured maximum width"""
+        url = save_image(make_upload(size=(3000, 1500)))
+        
+        self.assertRegex(url, r'^/api/images/[0-9a-f]{64}$')
+        with Image.open(self.saved_path(url)) as img:
+            self.assertEqual(img.size, (1200, 600))
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(os.path.join(self.upload_folder, 'incoming')), [])
+    
+    def test_multi_picture_jpeg_is_stored_as_jpeg(self):
+        """Phone photos that Pillow identifies as MPO are accepted as JPEGs"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 1500), (200, 30, 30)).save(
+            buffer, format='MPO', save_all=True, append_images=[Image.new('RGB', (300, 150))])
+        buffer.seek(0)
+        with Image.open(buffer) as img:
+            self.assertEqual(img.format, 'MPO')
+        buffer.seek(0)
+        
+        url = save_image(FileStorage(stream=buffer, filename='IMG_0001.jpg'))
+        
+        path = self.wait_for(url)
+        self.assertTrue(path.endswith('.jpg'))
+        with Image.open(path) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (1200, 600)))
+    
+    def test_size_limit_is_enforced_while_reading(self):
+        """Uploads over the limit are rejected whatever content_length claims"""
+        payload = io.BytesIO(b'\xff\xd8' + os.urandom(300 * 1024))
+        upload = FileStorage(stream=payload, filename='big.jpg', content_length=10)
+        
+        with self.assertRaises(ImageTooLarge):
+            save_image(upload)
+        self.assertEqual(os.listdir(os.path.join(self.upload_folder, 'incoming')), [])
+    
+    def test_decompression_bomb_is_rejected(self):
+        """Images whose dimensions exceed the pixel limit are never decoded"""
+        upload = make_upload(image_format='PNG', size=(5000, 5000), filename='bomb.png')
+        
+        with self.assertRaises(InvalidImage):
+            save_image(upload)
+    
+    def test_file_that_is_not_an_image_is_rejected(self):
+        """The actual content, not the extension, decides the format"""
+        upload = FileStorage(stream=io.BytesIO(b'<script>alert(1)</script>'), filename='fake.png')
+        
+        with self.assertRaises(InvalidImage):
+            save_image(upload)
+    
+    def test_identical_uploads_are_stored_once(self):
+        """Re-uploading the same bytes returns the same address without storing again"""
+        first = save_image(make_upload(size=(300, 200)))
+        second = save_image(make_upload(size=(300, 200)))
+        other = save_image(make_upload(size=(301, 200)))
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.wait_for(first)
+        self.wait_for(other)
+        blobs = [name for _, _, names in os.walk(os.path.join(self.upload_folder, 'blobs')) for name in names]
+        self.assertEqual(len(blobs), 2)
+
+class ImageServingTestCase(unittest.TestCase):
+    """Test case for serving stored images and their renditions"""
+    
+    def setUp(self):
+        self.upload_folder = tempfile.mkdtemp()
+        
+        class ImageConfig(TestingConfig):
+            UPLOAD_FOLDER = self.upload_folder
+        
+        self.app = create_app(ImageConfig)
+        self.client = self.app.test_client()
+        with self.app.test_request_context():
+            self.url = save_image(make_upload(size=(1000, 500)))
+    
+    def tearDown(self):
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+    
+    def test_renditions_are_generated_once_and_cached_forever(self):
+        """Renditions have their own size and format, immutable caching and a strong ETag"""
+        response = self.client.get(f'{self.url}/thumb')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        with Image.open(io.BytesIO(response.data)) as img:
+            self.assertEqual(img.size, (200, 100))
+        
+        response = self.client.get(f'{self.url}/webp')
+        self.assertEqual(response.mimetype, 'image/webp')
+        
+        self.client.get(f'{self.url}/thumb')
+        self.assertEqual(rendition_cache.stats()['generated'], 2)
+        
+        etag = self.client.get(f'{self.url}/thumb').headers['ETag']
+        response = self.client.get(f'{self.url}/thumb', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+    
+    def test_range_requests(self):
+        """Byte ranges of an image can be requested"""
+        full = self.client.get(self.url).data
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, full[:10])
+    
+    def test_unknown_images_and_renditions(self):
+        """Unknown digests and rendition names are 404s"""
+        self.assertEqual(self.client.get('/api/images/' + 'a' * 64).status_code, 404)
+        self.assertEqual(self.client.get('/api/images/not-a-digest').status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}/huge').status_code, 404)
+    
+    def test_least_recently_used_renditions_are_evicted(self):
+        """Past the disk quota, the least recently served renditions are deleted"""
+        self.client.get(f'{self.url}/medium')
+        self.client.get(f'{self.url}/thumb')
+        rendition_cache.max_bytes = 1
+        
+        self.assertEqual(rendition_cache.sweep(), 2)
+        self.assertGreaterEqual(rendition_cache.stats()['evicted'], 2)
+        # Evicted renditions are regenerated on demand
+        rendition_cache.max_bytes = 512 * 1024 * 1024
+        self.assertEqual(self.client.get(f'{self.url}/medium').status_code, 200)
+    
+    def test_sweep_measures_every_workers_renditions(self):
+        """The quota covers renditions on disk, not just this process's"""
+        self.client.get(f'{self.url}/thumb')
+        rendition_cache.sweep()
+        size = rendition_cache.stats()['bytes']
+        
+        # Written by another worker
+        other = os.path.join(rendition_cache.directory, 'ff', 'f' * 64 + '-thumb.jpg')
+        os.makedirs(os.path.dirname(other), exist_ok=True)
+        with open(other, 'wb') as f:
+            f.write(b'x' * 1000)
+        os.utime(other, (0, 0))
+        
+        rendition_cache.max_bytes = size + 500
+        self.assertEqual(rendition_cache.sweep(), 1)
+        self.assertFalse(os.path.exists(other))
+        self.assertEqual(rendition_cache.stats()['bytes'], size)
+    
+    def test_rendition_evicted_before_sending_is_regenerated(self):
+        """A rendition deleted between lookup and send is generated again"""
+        lookup = rendition_cache.get
+        
+        def evicting_lookup(*args):
+            path, mimetype = lookup(*args)
+            if not evicted:
+                evicted.append(path)
+                os.unlink(path)
+            return path, mimetype
+        
+        evicted = []
+        with patch.object(rendition_cache, 'get', side_effect=evicting_lookup):
+            response = self.client.get(f'{self.url}/thumb')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(evicted[0]))
+
+class PooledImageConfig(TestingConfig):
+    IMAGE_PROCESSING_WORKERS = 1
+
+class PooledImageUploadTestCase(ImageUploadTestCase):
+    """Test case for image processing on the worker pool"""
+    
+    config = PooledImageConfig
+    
+    def test_large_jpeg_is_downscaled(self):
+        """The final path is returned at once and filled in by the pool"""
+        url = save_image(make_upload(size=(3000, 1500)))
+        
+        with Image.open(self.wait_for(url)) as img:
+            self.assertEqual(img.size, (1200, 600))
+        self.assertEqual(self.wait_for_processed(1)['processed'], 1)
+        self.assertEqual(os.listdir(os.path.join(self.upload_folder, 'incoming')), [])
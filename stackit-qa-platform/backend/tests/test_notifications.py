@@ -0,0 +1,335 @@
+import unittest
+import json
+import shutil
+import tempfile
+import threading
+import time
+from app import create_app, db
+from helpers import recorded_statements
+from app.models import User, Question, Answer, Comment
+from app.utils.streams import NotificationHub
+
+class NotificationHubTestCase(unittest.TestCase):
+    """Test case for routing notifications to live stream subscriptions"""
+    
+    def setUp(self):
+        self.hub = NotificationHub()
+    
+    def tearDown(self):
+        self.hub.close()
+    
+    def test_every_subscription_of_a_user_receives(self):
+        """Each open tab gets its own copy, and closing one leaves the others"""
+        first = self.hub.subscribe(1)
+        second = self.hub.subscribe(1)
+        other_user = self.hub.subscribe(2)
+        
+        self.hub.publish(1, {'id': 10})
+        self.assertEqual(first.get(timeout=0), [{'id': 10}])
+        self.assertEqual(second.get(timeout=0), [{'id': 10}])
+        self.assertEqual(other_user.get(timeout=0), [])
+        
+        first.close()
+        self.hub.publish(1, {'id': 11})
+        self.assertEqual(second.get(timeout=0), [{'id': 11}])
+        self.assertEqual(self.hub.stats()['connections'], 2)
+    
+    def test_full_buffer_drops_oldest(self):
+        """A slow subscriber keeps the newest messages and counts the drops"""
+        self.hub.buffer_size = 2
+        subscription = self.hub.subscribe(1)
+        
+        for notification_id in range(5):
+            self.hub.publish(1, {'id': notification_id})
+        
+        self.assertEqual(subscription.get(timeout=0), [{'id': 3}, {'id': 4}])
+        self.assertEqual(subscription.dropped, 3)
+        self.assertEqual(self.hub.stats()['dropped'], 3)
+    
+    def test_get_wakes_on_publish(self):
+        """A waiting subscriber is woken by a publish rather than polling"""
+        subscription = self.hub.subscribe(1)
+        threading.Timer(0.05, self.hub.publish, args=(1, {'id': 1})).start()
+        
+        started = time.monotonic()
+        self.assertEqual(subscription.get(timeout=5), [{'id': 1}])
+        self.assertLess(time.monotonic() - started, 1)
+    
+    def test_unix_transport_fans_out_between_hubs(self):
+        """Notifications reach subscriptions held by another hub (worker)"""
+        socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_dir, ignore_errors=True)
+        
+        other = NotificationHub()
+        self.addCleanup(other.close)
+        for hub in (self.hub, other):
+            hub.transport_name = 'unix'
+            hub.socket_dir = socket_dir
+        
+        subscription = other.subscribe(1)
+        self.hub.publish(1, {'id': 1})
+        
+        self.assertEqual(subscription.get(timeout=5), [{'id': 1}])
+        self.assertEqual(self.hub.stats()['peers']['sent'], 1)
+
+class NotificationsTestCase(unittest.TestCase):
+    """Test case for notification endpoints"""
+    
+    def setUp(self):
+        """Set up test client and database"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('Password123')
+        db.session.add(self.user)
+        db.session.commit()
+        
+        response = self.client.post(
+            '/api/auth/login',
+            data=json.dumps({'username': 'testuser', 'password': 'Password123'}),
+            content_type='application/json'
+        )
+        self.auth_token = json.loads(response.data)['token']
+    
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_stream_delivers_pushed_notifications(self):
+        """A connected stream receives notifications pushed for its user"""
+        from app.utils.streams import notification_hub
+        from app.services.notification_service import create_notification
+        
+        response = self.client.get(
+            '/api/notifications/stream',
+            headers={'Authorization': f'Bearer {self.auth_token}'},
+            buffered=False
+        )
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        
+        chunks = iter(response.response)
+        self.assertIn('event: connected', next(chunks).decode())
+        
+        notification = create_notification(self.user.id, 'answer', 1)
+        chunk = next(chunks).decode()
+        self.assertTrue(chunk.startswith(f"id: {notification.id}\n"))
+        self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['id'], notification.id)
+        
+        response.close()
+        self.assertEqual(notification_hub.stats()['connections'], 0)
+    
+    def open_stream(self, last_event_id=None):
+        headers = {'Authorization': f'Bearer {self.auth_token}'}
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = str(last_event_id)
+        response = self.client.get('/api/notifications/stream', headers=headers, buffered=False)
+        self.addCleanup(response.close)
+        chunks = iter(response.response)
+        self.assertIn('event: connected', next(chunks).decode())
+        return chunks
+    
+    def test_reconnect_replays_missed_notifications(self):
+        """Notifications after Last-Event-ID are replayed in order with their ids"""
+        from app.services.notification_service import create_notifications
+        
+        first, second, third = create_notifications([(self.user.id, 'answer', source_id) for source_id in (1, 2, 3)])
+        
+        chunks = self.open_stream(last_event_id=first['id'])
+        for expected in (second, third):
+            chunk = next(chunks).decode()
+            self.assertTrue(chunk.startswith(f"id: {expected['id']}\n"))
+            self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['source_id'], expected['source_id'])
+    
+    def test_reconnect_resyncs_when_replay_is_not_possible(self):
+        """An unknown Last-Event-ID or too large a gap sends a resync event"""
+        from app.services.notification_service import create_notifications
+        
+        self.app.config['NOTIFICATION_REPLAY_LIMIT'] = 1
+        first = create_notifications([(self.user.id, 'answer', source_id) for source_id in (1, 2, 3)])[0]
+        
+        self.assertIn('event: resync', next(self.open_stream(last_event_id=first['id'])).decode())
+        self.assertIn('event: resync', next(self.open_stream(last_event_id=999)).decode())
+    
+    def get_unread_count(self):
+        response = self.client.get(
+            '/api/notifications/unread-count',
+            headers={'Authorization': f'Bearer {self.auth_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['unread_count']
+    
+    def test_unread_count_follows_notification_changes(self):
+        """The unread counter is kept up to date by creating and reading notifications"""
+        from app.services.notification_service import create_notifications
+        
+        self.assertEqual(self.get_unread_count(), 0)
+        
+        first, second, third = create_notifications([(self.user.id, 'answer', source_id) for source_id in (1, 2, 3)])
+        self.assertEqual(self.get_unread_count(), 3)
+        
+        # Reading the same notification twice only counts once
+        for _ in range(2):
+            response = self.client.put(
+                f"/api/notifications/{first['id']}/read",
+                headers={'Authorization': f'Bearer {self.auth_token}'}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_unread_count(), 2)
+        
+        response = self.client.put(
+            '/api/notifications/read-all',
+            headers={'Authorization': f'Bearer {self.auth_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_unread_count(), 0)
+    
+    def test_reconcile_unread_counts(self):
+        """Reconciling repairs drifted counters from the notifications table"""
+        from app.services.notification_service import create_notifications, reconcile_unread_counts
+        
+        create_notifications([(self.user.id, 'answer', 1), (self.user.id, 'mention', 1)])
+        User.query.filter_by(id=self.user.id).update({'unread_notification_count': 7})
+        db.session.commit()
+        
+        self.assertEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(self.get_unread_count(), 2)
+        self.assertEqual(reconcile_unread_counts(), 0)
+    
+    def add_sources(self, count):
+        """Create count answers by another user, each with a comment, and notify testuser of both"""
+        from app.services.notification_service import create_notifications
+        
+        author = User.query.filter_by(username='author').first()
+        if author is None:
+            author = User(username='author', email='author@example.com', password_hash='x')
+            db.session.add(author)
+            db.session.flush()
+        
+        question = Question(user_id=self.user.id, title='Question title', description='Question description')
+        db.session.add(question)
+        db.session.flush()
+        
+        entries = []
+        for _ in range(count):
+            answer = Answer(question_id=question.id, user_id=author.id, content='Answer')
+            db.session.add(answer)
+            db.session.flush()
+            comment = Comment(answer_id=answer.id, user_id=author.id, content='Comment')
+            db.session.add(comment)
+            db.session.flush()
+            entries.extend([(self.user.id, 'answer', answer.id), (self.user.id, 'comment', comment.id)])
+        db.session.commit()
+        
+        create_notifications(entries)
+        return question
+    
+    def get_expanded(self):
+        with recorded_statements() as statements:
+            response = self.client.get(
+                '/api/notifications?expand=source&per_page=50',
+                headers={'Authorization': f'Bearer {self.auth_token}'}
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['notifications'], len(statements)
+    
+    def test_expand_source_describes_notifications(self):
+        """Expanded notifications carry their answer, question and actor"""
+        question = self.add_sources(1)
+        
+        notifications, _ = self.get_expanded()
+        sources = {n['type']: n['source'] for n in notifications}
+        
+        self.assertEqual(sources['answer']['question_title'], question.title)
+        self.assertEqual(sources['answer']['actor']['username'], 'author')
+        self.assertEqual(sources['comment']['question_id'], question.id)
+        self.assertEqual(sources['comment']['answer_id'], sources['answer']['answer_id'])
+        self.assertIn('comment_id', sources['comment'])
+    
+    def test_expand_source_query_count_is_constant(self):
+        """Expanding a page takes the same number of queries regardless of its size"""
+        self.add_sources(1)
+        self.get_expanded()  # Warm the auth principal cache
+        _, small = self.get_expanded()
+        
+        self.add_sources(10)
+        notifications, large = self.get_expanded()
+        
+        self.assertEqual(len(notifications), 22)
+        self.assertEqual(small, large)
+    
+    def test_grouped_notifications_coalesce_while_unread(self):
+        """Notifications with a group key fold into the unread one with that key"""
+        from app.models import Notification
+        from app.services.notification_service import create_notifications, group_key
+        
+        key = group_key('answer', 1)
+        first = create_notifications([(self.user.id, 'answer', 10, key)])[0]
+        updated = create_notifications([(self.user.id, 'answer', 11, key), (self.user.id, 'answer', 12, key)])
+        
+        # The group is replaced by a newer row, naming the one it replaces
+        self.assertEqual(len(updated), 1)
+        self.assertGreater(updated[0]['id'], first['id'])
+        self.assertEqual(updated[0]['replaces'], first['id'])
+        self.assertEqual(updated[0]['count'], 3)
+        self.assertEqual(updated[0]['source_id'], 12)
+        self.assertEqual([n.id for n in Notification.query], [updated[0]['id']])
+        self.assertEqual(self.get_unread_count(), 1)
+        
+        # Once read, new activity starts a new notification
+        self.client.put(
+            f"/api/notifications/{updated[0]['id']}/read",
+            headers={'Authorization': f'Bearer {self.auth_token}'}
+        )
+        second = create_notifications([(self.user.id, 'answer', 13, key)])[0]
+        self.assertNotIn('replaces', second)
+        self.assertEqual(second['count'], 1)
+        self.assertEqual(Notification.query.count(), 2)
+    
+    def test_reconnect_replays_coalesced_bumps(self):
+        """A group bumped after the client's last event is replayed and listed first"""
+        from app.services.notification_service import create_notifications, group_key
+        
+        key = group_key('answer', 1)
+        grouped = create_notifications([(self.user.id, 'answer', 10, key)])[0]
+        latest = create_notifications([(self.user.id, 'comment', 20)])[0]
+        bumped = create_notifications([(self.user.id, 'answer', 11, key)])[0]
+        
+        chunk = next(self.open_stream(last_event_id=latest['id'])).decode()
+        self.assertTrue(chunk.startswith(f"id: {bumped['id']}\n"))
+        replayed = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual((replayed['count'], replayed['source_id']), (2, 11))
+        
+        response = self.client.get('/api/notifications', headers={'Authorization': f'Bearer {self.auth_token}'})
+        listed = [n['id'] for n in json.loads(response.data)['notifications']]
+        self.assertEqual(listed, [bumped['id'], latest['id']])
+        self.assertNotIn(grouped['id'], listed)
+    
+    def test_archive_moves_old_read_notifications_in_chunks(self):
+        """Old read notifications move to the archive; unread and recent ones stay"""
+        from datetime import datetime, timedelta
+        from app.models import Notification, ArchivedNotification
+        from app.services.notification_service import archive_notifications
+        
+        old = datetime.utcnow() - timedelta(days=60)
+        for source_id in range(5):
+            db.session.add(Notification(user_id=self.user.id, type='answer', source_id=source_id,
+                                        read=True, created_at=old))
+        db.session.add(Notification(user_id=self.user.id, type='answer', source_id=5, read=False, created_at=old))
+        db.session.add(Notification(user_id=self.user.id, type='answer', source_id=6, read=True))
+        db.session.commit()
+        
+        self.assertEqual(archive_notifications(older_than_days=30, chunk_size=2), 5)
+        self.assertEqual(sorted(n.source_id for n in Notification.query), [5, 6])
+        self.assertEqual(ArchivedNotification.query.count(), 5)
+        self.assertEqual(archive_notifications(older_than_days=30, chunk_size=2), 0)
+        
+        # Zero days means every read notification, not the default
+        self.assertEqual(archive_notifications(older_than_days=0), 1)
+        self.assertEqual([n.source_id for n in Notification.query], [5])
@@ -1,7 +1,11 @@
 import unittest
 import json
 from app import create_app, db
-from app.models import User, Question, Tag
+from helpers import recorded_statements
+from app.models import User, Question, Answer, Tag
+from app.services.question_service import QuestionService, QUESTION_SORTS, rebuild_question_text, reconcile_question_stats
+from app.services.answer_service import create_answer, vote_on_answer, remove_answer
+from app.services.tag_service import get_popular_tags, reconcile_tag_counts, tag_suggestions
 
 class QuestionsTestCase(unittest.TestCase):
     """Test case for questions endpoints"""
@@ -134,4 +138,327 @@ class QuestionsTestCase(unittest.TestCase):
         
         # Verify question was deleted from database
         deleted_question = Question.query.get(self.question.id)
-        self.assertIsNone(deleted_question)
\ No newline at end of file
+        self.assertIsNone(deleted_question)
+    
+    def count_statements(self, url):
+        """Issue a GET request and return the number of SQL statements it ran"""
+        with recorded_statements() as statements:
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+    
+    def add_questions(self, count):
+        """Add questions, each with its own tag, author and answers"""
+        for i in range(count):
+            author = User(username=f'author{i}', email=f'author{i}@example.com', password_hash='x')
+            question = Question(
+                author=author,
+                title=f'Generated Question {i}',
+                description='A generated question description with enough characters.'
+            )
+            question.tags.append(Tag(name=f'generated-{i}'))
+            for j in range(3):
+                responder = User(username=f'responder{i}_{j}', email=f'r{i}_{j}@example.com', password_hash='x')
+                question.answers.append(Answer(
+                    author=responder,
+                    content='A generated answer with enough characters to be valid.'
+                ))
+            db.session.add(question)
+        db.session.commit()
+    
+    def test_list_questions_query_count(self):
+        """Listing questions runs a fixed number of queries regardless of page size"""
+        baseline = self.count_statements('/api/questions/?per_page=50')
+        
+        self.add_questions(10)
+        
+        self.assertEqual(self.count_statements('/api/questions/?per_page=50'), baseline)
+        self.assertLessEqual(baseline, 3)
+    
+    def test_get_question_query_count(self):
+        """Fetching a question with its answers runs a fixed number of queries"""
+        self.add_questions(1)
+        question = Question.query.filter_by(title='Generated Question 0').first()
+        few = self.count_statements(f'/api/questions/{question.id}')
+        
+        for j in range(10):
+            responder = User(username=f'extra{j}', email=f'extra{j}@example.com', password_hash='x')
+            question.answers.append(Answer(
+                author=responder,
+                content='Another generated answer with enough characters.'
+            ))
+        db.session.commit()
+        
+        self.assertEqual(self.count_statements(f'/api/questions/{question.id}'), few)
+        self.assertLessEqual(few, 3)
+    
+    def test_list_questions_cursor_pagination(self):
+        """Walking next_cursor visits every question once, newest first"""
+        self.add_questions(4)
+        expected = [q.id for q in Question.query.order_by(
+            Question.created_at.desc(), Question.id.desc()).all()]
+        
+        seen = []
+        url = '/api/questions/?per_page=2'
+        while url:
+            data = json.loads(self.client.get(url).data)
+            self.assertNotIn('total', data)
+            seen.extend(q['id'] for q in data['questions'])
+            url = f"/api/questions/?per_page=2&cursor={data['next_cursor']}" if data['next_cursor'] else None
+        
+        self.assertEqual(seen, expected)
+        
+        # Exact totals are opt-in
+        data = json.loads(self.client.get('/api/questions/?per_page=2&total=true').data)
+        self.assertEqual(data['total'], 5)
+        
+        response = self.client.get('/api/questions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+        # A cursor only seeks along the order it was issued for
+        cursor = json.loads(self.client.get('/api/questions/?per_page=2').data)['next_cursor']
+        for sort in ('votes', 'active'):
+            response = self.client.get(f'/api/questions/?sort={sort}&per_page=2&cursor={cursor}')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(f'/api/questions/?sort=unanswered&per_page=2&cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_questions(self):
+        """Test ranked full-text search with phrases, prefixes and tags"""
+        in_title = QuestionService.create_question(1, 'Deploying Flask applications',
+                                                   'How should I run my web app in production?')
+        in_body = QuestionService.create_question(1, 'Web framework choice',
+                                                  'I am <strong>comparing</strong> Django and Flask for a '
+                                                  '<a href="https://example.org/small">small project</a>.')
+        tagged = QuestionService.create_question(1, 'Packaging a Flask extension',
+                                                 'Publishing reusable blueprints to PyPI.', ['python'])
+        
+        def search(query):
+            response = self.client.get('/api/questions/', query_string={'search': query})
+            self.assertEqual(response.status_code, 200)
+            return [q['id'] for q in json.loads(response.data)['questions']]
+        
+        # Title matches rank above description-only matches
+        results = search('flask')
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[-1], in_body.id)
+        
+        self.assertEqual(search('"comparing django"'), [in_body.id])
+        self.assertEqual(search('"django comparing"'), [])
+        self.assertEqual(search('deploy*'), [in_title.id])
+        # Markup isn't indexed, only the text
+        self.assertEqual(search('strong'), [])
+        self.assertEqual(search('example'), [])
+        
+        response = self.client.get('/api/questions/', query_string={'search': 'flask', 'tag': 'python'})
+        self.assertEqual([q['id'] for q in json.loads(response.data)['questions']], [tagged.id])
+        
+        # The index follows updates and deletes
+        in_title.title = 'Hosting a WSGI application'
+        db.session.delete(tagged)
+        db.session.commit()
+        self.assertEqual(search('flask'), [in_body.id])
+        self.assertEqual(search('wsgi'), [in_title.id])
+    
+    def test_description_is_processed_on_write(self):
+        """The description is sanitized once and listings carry only its excerpt"""
+        description = '<p>Why does <b>this</b> fail?</p><script>alert(1)</script>' + ' <p>More detail.</p>' * 60
+        question = QuestionService.create_question(1, 'Processed question title', description)
+        
+        self.assertNotIn('<script>', question.description)
+        self.assertTrue(question.body_text.startswith('Why does this fail?'))
+        self.assertNotIn('<', question.excerpt)
+        self.assertTrue(question.excerpt.endswith('...'))
+        self.assertLessEqual(len(question.excerpt), 203)
+        
+        data = json.loads(self.client.get('/api/questions/').data)
+        listed = next(q for q in data['questions'] if q['id'] == question.id)
+        self.assertEqual(listed['excerpt'], question.excerpt)
+        self.assertNotIn('description', listed)
+        
+        data = json.loads(self.client.get(f'/api/questions/{question.id}').data)
+        self.assertEqual(data['description'], question.description)
+    
+    def test_rebuild_question_text(self):
+        """Existing questions get their text and excerpt filled in"""
+        updated_at = self.question.updated_at
+        
+        self.assertEqual(rebuild_question_text(chunk_size=1), 1)
+        
+        db.session.refresh(self.question)
+        self.assertEqual(self.question.excerpt, 'This is a test question description with enough characters.')
+        self.assertEqual(self.question.updated_at, updated_at)
+    
+    def test_sparse_fieldsets(self):
+        """?fields= returns only the requested fields and never selects the others' columns"""
+        self.add_questions(2)
+        with recorded_statements() as statements:
+            response = self.client.get('/api/questions/?fields=id,title')
+        
+        self.assertEqual(response.status_code, 200)
+        questions = json.loads(response.data)['questions']
+        self.assertEqual(len(questions), 3)
+        self.assertEqual(set(questions[0]), {'id', 'title'})
+        # One query: no description, no author join and no tag lookup
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('description', statements[0])
+        self.assertNotIn('users', statements[0])
+        
+        response = self.client.get('/api/users/author0/answers?fields=id,score,author')
+        answers = json.loads(response.data)['answers']
+        self.assertEqual(answers, [])
+        response = self.client.get('/api/users/responder0_0/answers?fields=id,score,author')
+        answers = json.loads(response.data)['answers']
+        self.assertEqual(set(answers[0]), {'id', 'score', 'author'})
+        self.assertEqual(answers[0]['author'], 'responder0_0')
+        
+        response = self.client.get('/api/users/testuser/questions?fields=tags')
+        self.assertEqual(json.loads(response.data)['questions'], [{'tags': ['test-tag']}])
+        
+        for url in ('/api/questions/?fields=id,password_hash', '/api/questions/?fields=',
+                    '/api/users/testuser/answers?fields=title'):
+            self.assertEqual(self.client.get(url).status_code, 400)
+    
+    def test_sort_modes(self):
+        """Listings sort by newest, activity, votes or unanswered using the stored columns"""
+        self.add_questions(3)
+        # Answers created directly left the denormalized columns behind
+        self.assertEqual(reconcile_question_stats(), 3)
+        first, second, third = [Question.query.filter_by(title=f'Generated Question {i}').one().id for i in range(3)]
+        
+        answer = create_answer(self.user.id, first, 'An answer that makes the first question active.')
+        vote_on_answer(self.user.id, answer.id, 'up')
+        vote_on_answer(User.query.filter_by(username='author1').one().id, answer.id, 'up')
+        
+        def listed(sort, per_page=50):
+            ids, url = [], f'/api/questions/?sort={sort}&per_page={per_page}&fields=id,answer_count,score'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.data)
+                ids.extend(q['id'] for q in data['questions'])
+                url = f"/api/questions/?sort={sort}&per_page={per_page}&cursor={data['next_cursor']}" \
+                    if data['next_cursor'] else None
+            return ids
+        
+        question = db.session.get(Question, first)
+        self.assertEqual((question.answer_count, question.score), (4, 2))
+        self.assertEqual(listed('active')[0], first)
+        self.assertEqual(listed('votes')[0], first)
+        self.assertEqual(listed('unanswered'), [self.question.id])
+        self.assertEqual(listed('newest'), [third, second, first, self.question.id])
+        # Keyset pages over ties in score
+        self.assertEqual(listed('votes', per_page=1), listed('votes'))
+        
+        # A downvote flushed after the answer was loaded still comes off with it
+        self.assertEqual(answer.score, 2)
+        db.session.execute(db.update(Answer).where(Answer.id == answer.id).values(
+            score=Answer.score - 1).execution_options(synchronize_session=False))
+        db.session.execute(db.update(Question).where(Question.id == first).values(
+            score=Question.score - 1).execution_options(synchronize_session=False))
+        remove_answer(answer)
+        question = db.session.get(Question, first)
+        self.assertEqual((question.answer_count, question.score), (3, 0))
+        self.assertEqual(reconcile_question_stats(), 0)
+        
+        self.assertEqual(self.client.get('/api/questions/?sort=oldest').status_code, 400)
+    
+    def test_sort_modes_use_indexes(self):
+        """No listing order needs a sort step"""
+        for sort, column in QUESTION_SORTS.items():
+            query = Question.query
+            if sort == 'unanswered':
+                query = query.filter(Question.answer_count == 0)
+            statement = query.order_by(column.desc(), Question.id.desc()).limit(11).statement
+            sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = ' '.join(row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)))
+            self.assertIn('INDEX', plan, sort)
+            self.assertNotIn('TEMP B-TREE', plan, sort)
+    
+    def test_tag_question_counts(self):
+        """Tag counts follow questions as they are created and deleted"""
+        first = QuestionService.create_question(self.user.id, 'Counted question one', 'Counted question body text.', ['python', 'flask'])
+        QuestionService.create_question(self.user.id, 'Counted question two', 'Counted question body text.', ['python'])
+        # The fixture question was tagged directly, bypassing the counter
+        self.assertEqual(reconcile_tag_counts(), 1)
+        
+        def counts():
+            return {tag.name: tag.question_count for tag in Tag.query}
+        
+        self.assertEqual(counts(), {'test-tag': 1, 'python': 2, 'flask': 1})
+        self.assertEqual([tag.name for tag in get_popular_tags(2)], ['python', 'flask'])
+        
+        def listed(per_page):
+            names, url = [], f'/api/tags/?per_page={per_page}'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.data)
+                names.extend(tag['name'] for tag in data['tags'])
+                url = f"/api/tags/?per_page={per_page}&cursor={data['next_cursor']}" \
+                    if data['next_cursor'] else None
+            return names
+        
+        self.assertEqual(listed(50), ['python', 'flask', 'test-tag'])
+        # Keyset pages over ties in question_count
+        self.assertEqual(listed(1), listed(50))
+        
+        self.assertEqual(sorted(QuestionService.delete_question(first)), ['flask', 'python'])
+        self.assertEqual(counts(), {'test-tag': 1, 'python': 1, 'flask': 0})
+        self.assertEqual(reconcile_tag_counts(), 0)
+    
+    def test_tag_suggestions(self):
+        """Suggestions rank by use, follow new questions and skip the database"""
+        for tags in (['python', 'pytest'], ['python'], ['python', 'python-3.x', 'pytest'], ['Python-Flask']):
+            QuestionService.create_question(self.user.id, 'Suggested question', 'Suggested question body.', tags)
+        
+        def suggest(prefix):
+            response = self.client.get(f'/api/tags/suggest?prefix={prefix}')
+            self.assertEqual(response.status_code, 200)
+            return [tag['name'] for tag in json.loads(response.data)['tags']]
+        
+        self.assertEqual(suggest('py'), ['python', 'pytest', 'python-3.x', 'Python-Flask'])
+        
+        with recorded_statements() as statements:
+            self.assertEqual(suggest('PYTHON-'), ['python-3.x', 'Python-Flask'])
+            self.assertEqual(suggest('test'), ['test-tag'])
+            self.assertEqual(suggest('x'), [])
+        self.assertEqual(statements, [])
+        
+        # New tags and counts are picked up without reloading
+        for _ in range(3):
+            question = QuestionService.create_question(self.user.id, 'Suggested question', 'Suggested question body.', ['pyramid'])
+        self.assertEqual(suggest('py')[0], 'pyramid')
+        self.assertEqual(suggest('pyr'), ['pyramid'])
+        
+        QuestionService.delete_question(question)
+        QuestionService.delete_question(db.session.get(Question, question.id - 1))
+        self.assertEqual(suggest('py'), ['python', 'pytest', 'pyramid', 'python-3.x', 'Python-Flask'])
+        self.assertEqual(tag_suggestions.stats()['loads'], 1)
+    
+    def test_stale_tag_suggestions_reload_once(self):
+        """A stale index keeps answering while a single request reloads it"""
+        QuestionService.create_question(self.user.id, 'Suggested question', 'Suggested question body.', ['python'])
+        
+        def suggest(prefix):
+            response = self.client.get(f'/api/tags/suggest?prefix={prefix}')
+            self.assertEqual(response.status_code, 200)
+            return [tag['name'] for tag in json.loads(response.data)['tags']]
+        
+        self.assertEqual(suggest('py'), ['python'])
+        # Another worker adds a tag this process hasn't seen
+        db.session.add(Tag(name='pyramid', question_count=5))
+        db.session.commit()
+        tag_suggestions._loaded_at -= tag_suggestions.refresh_interval + 1
+        
+        # Held as if another request were mid-reload
+        with recorded_statements() as statements, tag_suggestions._reload_lock:
+            self.assertEqual(suggest('py'), ['python'])
+            self.assertEqual(suggest('pyt'), ['python'])
+        self.assertEqual(statements, [])
+        self.assertEqual(tag_suggestions.stats()['loads'], 1)
+        
+        self.assertEqual(suggest('py'), ['pyramid', 'python'])
+        self.assertEqual(suggest('py'), ['pyramid', 'python'])
+        self.assertEqual(tag_suggestions.stats()['loads'], 2)
\ No newline at end of file
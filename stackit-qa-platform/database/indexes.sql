@@ -45,4 +45,24 @@ CREATE INDEX idx_notifications_created_at ON notifications(created_at);
 -- Composite indexes for common query patterns
 CREATE INDEX idx_questions_user_created ON questions(user_id, created_at);
 CREATE INDEX idx_answers_question_created ON answers(question_id, created_at);
-CREATE INDEX idx_notifications_user_created ON notifications(user_id, created_at);
\ No newline at end of file
+CREATE INDEX idx_answers_user_created ON answers(user_id, created_at);
+CREATE INDEX idx_notifications_user_created ON notifications(user_id, created_at);
+CREATE INDEX idx_notifications_user_group ON notifications(user_id, group_key);
+CREATE INDEX idx_notifications_archive_user_created ON notifications_archive(user_id, created_at);
+
+-- Outbox dispatcher scans unprocessed events in id order
+CREATE INDEX idx_outbox_events_pending ON outbox_events(processed_at, id);
+
+-- Mail workers claim due messages
+CREATE INDEX idx_email_messages_status_due ON email_messages(status, next_attempt_at);
+
+-- At most one question per accepted answer (questions hold at most one each)
+CREATE UNIQUE INDEX idx_questions_accepted_answer ON questions(accepted_answer_id);
+
+-- Question listing orders: most active, most votes and unanswered
+CREATE INDEX idx_questions_last_activity ON questions(last_activity_at);
+CREATE INDEX idx_questions_score ON questions(score);
+CREATE INDEX idx_questions_unanswered ON questions(answer_count, created_at);
+
+-- Popular tags and the tag directory, most used first
+CREATE INDEX idx_tags_question_count ON tags(question_count);
\ No newline at end of file
@@ -9,7 +9,9 @@ CREATE TABLE users (
     password_hash VARCHAR(255) NOT NULL,
     role ENUM('user', 'admin') DEFAULT 'user' NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    banned BOOLEAN DEFAULT FALSE
+    banned BOOLEAN DEFAULT FALSE,
+    unread_notification_count INT NOT NULL DEFAULT 0,
+    last_digest_at TIMESTAMP NULL
 );
 
 -- Questions Table
@@ -18,15 +20,22 @@ CREATE TABLE questions (
     user_id INT NOT NULL,
     title VARCHAR(255) NOT NULL,
     description TEXT NOT NULL,
+    body_text TEXT,
+    excerpt VARCHAR(255),
+    accepted_answer_id INT NULL,
+    answer_count INT NOT NULL DEFAULT 0,
+    score INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    last_activity_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
 -- Tags Table
 CREATE TABLE tags (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(50) UNIQUE NOT NULL
+    name VARCHAR(50) UNIQUE NOT NULL,
+    question_count INT NOT NULL DEFAULT 0
 );
 
 -- Question Tags Table (Many-to-Many)
@@ -45,6 +54,9 @@ CREATE TABLE answers (
     user_id INT NOT NULL,
     content TEXT NOT NULL,
     accepted BOOLEAN DEFAULT FALSE,
+    upvotes INT NOT NULL DEFAULT 0,
+    downvotes INT NOT NULL DEFAULT 0,
+    score INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
@@ -82,5 +94,53 @@ CREATE TABLE notifications (
     source_id INT NOT NULL,
     read BOOLEAN DEFAULT FALSE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    group_key VARCHAR(100),
+    count INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- Archived Notifications Table
+CREATE TABLE notifications_archive (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    type ENUM('answer', 'comment', 'mention') NOT NULL,
+    source_id INT NOT NULL,
+    read BOOLEAN DEFAULT TRUE NOT NULL,
+    created_at TIMESTAMP NULL,
+    group_key VARCHAR(100),
+    count INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Outbox Events Table
+CREATE TABLE outbox_events (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSON NOT NULL,
+    attempts INT DEFAULT 0 NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP NULL
+);
+
+-- Email Messages Table
+CREATE TABLE email_messages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    recipient VARCHAR(100) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    html_body TEXT NOT NULL,
+    status ENUM('pending', 'sending', 'sent', 'failed') DEFAULT 'pending' NOT NULL,
+    attempts INT DEFAULT 0 NOT NULL,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    claim_token VARCHAR(32),
+    claimed_at TIMESTAMP NULL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL
+);
+
+-- Accepted answer of each question (added once answers exists)
+ALTER TABLE questions ADD CONSTRAINT fk_questions_accepted_answer
+    FOREIGN KEY (accepted_answer_id) REFERENCES answers(id) ON DELETE SET NULL;
\ No newline at end of file